@@ -1,20 +1,89 @@
 import os
+import sys
+import json
+import time
+import zlib
+import uuid
+import shutil
+import subprocess
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response, stream_with_context
 from flashcard_agent import handle_flashcard_request
-from quiz_agent import generate_quiz
+from quiz_agent import generate_quiz, QUIZ_MODES
 from quiz_battle_agent import generate_battle_quiz
-from flashcard_ask import answer_flashcard_question
+from flashcard_ask import answer_flashcard_question, stream_flashcard_answer
+from tutor_sessions import sessions as tutor_sessions
+from retrieval import index_deck, check_deck_id
+from semantic_cache import cache as answer_cache
 from flashcard_agent_text import generate_flashcards_from_text
-from flashcard_agent_pdf import generate_flashcards_from_text as generate_flashcards_from_pdf
-from flashcard_agent_image import generate_flashcards_from_text as generate_flashcards_from_image
+from flashcard_agent_pdf import generate_flashcards_from_text as generate_flashcards_from_pdf, extract_text_from_pdf
+from pdf_stream import MemoryCeilingExceeded
+from pdf_focus import select_important_text
+from deck_store import Deck, get_store as get_deck_store, source_hash
+from flashcard_agent_image import generate_flashcards_from_text as generate_flashcards_from_image, extract_text_from_image
 from highlighter import main as highlight_pdf
+from flashcard_multi import generate_multi_genre_flashcards
+from batch_ingest import build_page_jobs, iter_batch_ocr
+from uploads import is_upload, upload_params, spooled_upload, UploadTooLarge
+import metrics
+from governor import governor, overload_signal
+from jobs import queue as job_queue, JOBS_PATH, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+from llm_client import get_repair_stats
+from token_budget import get_token_stats
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
 
+@app.before_request
+def start_request_timer():
+    """Tag everything that runs for this request with its route"""
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    g.metrics_token = metrics.current_route.set(route)
+    g.overload_token = overload_signal.set([])
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def report_upstream_overload(response):
+    """Turn a 500 caused by upstream throttling into a retryable 503"""
+    signal = overload_signal.get()
+    if response.status_code == 500 and signal:
+        response.status_code = 503
+        response.headers['Retry-After'] = str(max(1, round(signal[-1])))
+    return response
+
+@app.after_request
+def count_request(response):
+    """Count 5xx responses as errors; routes turn exceptions into 500 bodies themselves"""
+    metrics.increment("errors" if response.status_code >= 500 else "requests")
+    return response
+
+@app.teardown_request
+def record_request_time(error=None):
+    started = g.pop('request_started', None)
+    if started is not None:
+        metrics.observe("request", (time.perf_counter() - started) * 1000)
+    token = g.pop('metrics_token', None)
+    if token is not None:
+        metrics.current_route.reset(token)
+    token = g.pop('overload_token', None)
+    if token is not None:
+        overload_signal.reset(token)
+
+@app.route('/metrics')
+def metrics_api():
+    """Stage latency histograms and per-route LLM call/token counters"""
+    if request.args.get('format') == 'json':
+        return jsonify({
+            "routes": metrics.snapshot(),
+            "tokens": get_token_stats(),
+            "json_repairs": get_repair_stats(),
+            "semantic_cache": answer_cache.stats(),
+            "llm_governor": governor.stats()
+        })
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/')
 def health_check():
     """Health check endpoint for Render"""
@@ -27,11 +96,15 @@ def flashcards_api():
         data = request.get_json()
         transcript = data.get('transcript', '').strip()
         genre = data.get('genre', 'factual').strip().lower()
+        genres = data.get('genres')
         
         if not transcript:
             return jsonify({"error": "Transcript is required"}), 400
             
-        result = handle_flashcard_request(transcript, genre)
+        if genres:
+            result = generate_multi_genre_flashcards(transcript, genres, "transcript")
+        else:
+            result = handle_flashcard_request(transcript, genre)
         return jsonify(result)
     except Exception as e:
         return jsonify({
@@ -46,11 +119,15 @@ def flashcards_text_api():
         data = request.get_json()
         text = data.get('text', '').strip()
         genre = data.get('genre', 'factual').strip().lower()
+        genres = data.get('genres')
         
         if not text:
             return jsonify({"error": "Text is required"}), 400
             
-        result = generate_flashcards_from_text(text, genre)
+        if genres:
+            result = generate_multi_genre_flashcards(text, genres, "text")
+        else:
+            result = generate_flashcards_from_text(text, genre)
         return jsonify(result)
     except Exception as e:
         return jsonify({
@@ -60,17 +137,47 @@ def flashcards_text_api():
 
 @app.route('/api/flashcards/pdf', methods=['POST'])
 def flashcards_pdf_api():
-    """Generate flashcards from PDF file"""
+    """Generate flashcards from an uploaded PDF (multipart or raw body) or a server-side pdfPath
+
+    With mode "highlights", only the lines the highlighter rates high/medium
+    (plus context) are sent to the LLM and the response carries a
+    highlightReport of tokens saved.
+    """
     try:
-        data = request.get_json()
-        pdf_path = data.get('pdfPath', '').strip()
-        genre = data.get('genre', 'factual').strip().lower()
-        
-        if not pdf_path:
-            return jsonify({"error": "PDF path is required"}), 400
+        report = None
+        if is_upload(request):
+            params = upload_params(request)
+            genre = params.get('genre', 'factual').strip().lower()
+            genres = params.get('genres')
+            mode = params.get('mode', 'full')
+            with spooled_upload(request, '.pdf') as (pdf_path, digest):
+                if mode == 'highlights':
+                    text, report = select_important_text(pdf_path, digest)
+                else:
+                    text = extract_text_from_pdf(pdf_path)
+        else:
+            data = request.get_json()
+            pdf_path = data.get('pdfPath', '').strip()
+            genre = data.get('genre', 'factual').strip().lower()
+            genres = data.get('genres')
+            mode = data.get('mode', 'full')
             
-        result = generate_flashcards_from_pdf(pdf_path, genre)
+            if not pdf_path:
+                return jsonify({"error": "PDF file or path is required"}), 400
+                
+            if mode == 'highlights':
+                text, report = select_important_text(pdf_path)
+            else:
+                text = extract_text_from_pdf(pdf_path)
+        if genres:
+            result = generate_multi_genre_flashcards(text, genres, "pdf")
+        else:
+            result = generate_flashcards_from_pdf(text, genre)
+        if report is not None:
+            result = {**result, "highlightReport": report}
         return jsonify(result)
+    except (UploadTooLarge, MemoryCeilingExceeded) as e:
+        return jsonify({"error": str(e)}), 413
     except Exception as e:
         return jsonify({
             "error": "Failed to generate flashcards from PDF",
@@ -79,20 +186,86 @@ def flashcards_pdf_api():
 
 @app.route('/api/flashcards/image', methods=['POST'])
 def flashcards_image_api():
-    """Generate flashcards from image file"""
+    """Generate flashcards from an uploaded image (multipart or raw body) or a server-side imagePath"""
+    try:
+        if is_upload(request):
+            genre = upload_params(request).get('genre', 'factual').strip().lower()
+            genres = upload_params(request).get('genres')
+            with spooled_upload(request, '.png') as (image_path, digest):
+                text = extract_text_from_image(image_path, digest)
+        else:
+            data = request.get_json()
+            image_path = data.get('imagePath', '').strip()
+            genre = data.get('genre', 'factual').strip().lower()
+            genres = data.get('genres')
+            
+            if not image_path:
+                return jsonify({"error": "Image file or path is required"}), 400
+                
+            text = extract_text_from_image(image_path)
+        if genres:
+            result = generate_multi_genre_flashcards(text, genres, "image")
+        else:
+            result = generate_flashcards_from_image(text, genre)
+        return jsonify(result)
+    except UploadTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to generate flashcards from image",
+            "details": str(e)
+        }), 500
+
+@app.route('/api/flashcards/batch', methods=['POST'])
+def flashcards_batch_api():
+    """Generate one deck from many images or a scanned PDF"""
     try:
         data = request.get_json()
-        image_path = data.get('imagePath', '').strip()
+        image_paths = [path.strip() for path in data.get('imagePaths', []) if path and path.strip()]
+        pdf_path = data.get('pdfPath', '').strip()
         genre = data.get('genre', 'factual').strip().lower()
+        genres = data.get('genres')
+        stream = bool(data.get('stream', False))
         
-        if not image_path:
-            return jsonify({"error": "Image path is required"}), 400
+        if not image_paths and not pdf_path:
+            return jsonify({"error": "imagePaths or pdfPath is required"}), 400
             
-        result = generate_flashcards_from_image(image_path, genre)
+        jobs = build_page_jobs(image_paths, pdf_path)
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to read batch",
+            "details": str(e)
+        }), 400
+
+    def run_batch():
+        """Yield OCR progress events, then the generated deck"""
+        for event in iter_batch_ocr(jobs):
+            if event["event"] == "text":
+                if genres:
+                    result = generate_multi_genre_flashcards(event["text"], genres, "image")
+                else:
+                    result = generate_flashcards_from_image(event["text"], genre)
+                yield {"event": "result", "pages": event["pages"], **result}
+            else:
+                yield event
+
+    if stream:
+        def ndjson():
+            try:
+                for event in run_batch():
+                    yield json.dumps(event) + "\n"
+            except Exception as e:
+                yield json.dumps({"event": "error", "error": "Failed to generate flashcards from batch",
+                                  "details": str(e)}) + "\n"
+        return Response(stream_with_context(ndjson()), mimetype='application/x-ndjson')
+
+    try:
+        result = [event for event in run_batch() if event["event"] == "result"][0]
+        result.pop("event")
         return jsonify(result)
     except Exception as e:
         return jsonify({
-            "error": "Failed to generate flashcards from image",
+            "error": "Failed to generate flashcards from batch",
             "details": str(e)
         }), 500
 
@@ -102,11 +275,15 @@ def quiz_api():
     try:
         data = request.get_json()
         flashcards = data.get('flashcards', [])
+        mode = data.get('mode', 'llm').strip().lower()
+        related_flashcards = data.get('relatedFlashcards', [])
         
         if not flashcards:
             return jsonify({"error": "Flashcards are required"}), 400
+        if mode not in QUIZ_MODES:
+            return jsonify({"error": f"Mode must be one of: {', '.join(QUIZ_MODES)}"}), 400
             
-        result = generate_quiz(flashcards)
+        result = generate_quiz(flashcards, mode, related_flashcards)
         return jsonify(result)
     except Exception as e:
         return jsonify({
@@ -136,23 +313,175 @@ def battle_quiz_api():
 
 @app.route('/api/flashcard-ask', methods=['POST'])
 def flashcard_ask_api():
-    """Answer questions about flashcard content"""
+    """Answer questions about flashcard content.
+
+    With "stream": true (or Accept: text/event-stream) the answer is sent as
+    server-sent events while it is generated; a client disconnect closes the
+    generator, which cancels the upstream model call.
+    """
     try:
         data = request.get_json()
         content = data.get('content', '').strip()
         question = data.get('question', '').strip()
+        deck_id = data.get('deckId')
+        stream = bool(data.get('stream', False)) or request.accept_mimetypes.best == 'text/event-stream'
         
-        if not content or not question:
-            return jsonify({"error": "Content and question are required"}), 400
+        if not (content or deck_id) or not question:
+            return jsonify({"error": "Content (or deckId) and question are required"}), 400
+        if deck_id:
+            check_deck_id(deck_id)
             
-        result = answer_flashcard_question(content, question)
+        if stream:
+            def sse():
+                pieces = stream_flashcard_answer(content, question, deck_id)
+                try:
+                    for piece in pieces:
+                        yield f"data: {json.dumps({'text': piece})}\n\n"
+                    yield "event: done\ndata: {}\n\n"
+                except Exception as e:
+                    yield f"event: error\ndata: {json.dumps({'error': 'Failed to answer question', 'details': str(e)})}\n\n"
+                finally:
+                    pieces.close()
+
+            return Response(stream_with_context(sse()), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+        result = answer_flashcard_question(content, question, deck_id)
         return jsonify({"response": result})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({
             "error": "Failed to answer question",
             "details": str(e)
         }), 500
 
+@app.route('/api/decks/<deck_id>/index', methods=['POST'])
+def deck_index_api(deck_id):
+    """Add a deck's flashcards and source texts to its retrieval index"""
+    try:
+        data = request.get_json()
+        flashcards = data.get('flashcards', [])
+        sources = data.get('sources', [])
+        
+        if not flashcards and not sources:
+            return jsonify({"error": "Flashcards or sources are required"}), 400
+            
+        return jsonify(index_deck(deck_id, flashcards, sources))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to index deck",
+            "details": str(e)
+        }), 500
+
+@app.route('/api/decks', methods=['POST'])
+def decks_store_api():
+    """Store many generated decks at once: {"decks": [{"deckId", "kind", "sourceHash", "flashcards"|"quiz"}]}"""
+    try:
+        data = request.get_json()
+        entries = data.get('decks', []) if isinstance(data, dict) else None
+        if not entries or not isinstance(entries, list):
+            return jsonify({"error": "decks is required"}), 400
+        decks = []
+        for entry in entries:
+            if not isinstance(entry, dict) or not entry.get('deckId'):
+                return jsonify({"error": "Every deck needs a deckId"}), 400
+            kind = entry.get('kind', 'flashcards')
+            decks.append(Deck.from_result(entry['deckId'], kind, entry, source_hash=entry.get('sourceHash', ''),
+                                          genre=entry.get('genre', ''), prompt_version=entry.get('promptVersion', '')))
+        return jsonify({"stored": get_deck_store().append_many(decks)})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to store decks",
+            "details": str(e)
+        }), 500
+
+@app.route('/api/decks', methods=['GET'])
+def decks_lookup_api():
+    """Decks generated from one source: ?sourceHash=...[&kind=flashcards|quiz]"""
+    digest = request.args.get('sourceHash', '').strip()
+    if not digest:
+        return jsonify({"error": "sourceHash is required"}), 400
+    decks = get_deck_store().find_by_source(digest, request.args.get('kind'))
+    return jsonify({"decks": [deck.to_json() for deck in decks]})
+
+@app.route('/api/decks/export', methods=['GET'])
+def decks_export_api():
+    """Stream stored decks as NDJSON (?kind=...&ids=a,b); gzip-compressed when the client accepts it"""
+    ids = request.args.get('ids')
+    lines = get_deck_store().export(ids.split(',') if ids else None, request.args.get('kind'))
+    if 'gzip' not in request.headers.get('Accept-Encoding', ''):
+        return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+
+    def compressed():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for line in lines:
+            chunk = compressor.compress(line)
+            if chunk:
+                yield chunk
+        yield compressor.flush()
+
+    return Response(stream_with_context(compressed()), mimetype='application/x-ndjson',
+                    headers={"Content-Encoding": "gzip"})
+
+@app.route('/api/decks/<deck_id>', methods=['GET'])
+def deck_get_api(deck_id):
+    """One stored deck by id"""
+    deck = get_deck_store().get(deck_id)
+    if deck is None:
+        return jsonify({"error": "Deck not found"}), 404
+    return jsonify(deck.to_json())
+
+@app.route('/api/flashcard-ask/session', methods=['POST'])
+def flashcard_ask_session_create_api():
+    """Start a tutor session: the content is sent once, follow-ups only send questions"""
+    try:
+        data = request.get_json()
+        content = data.get('content', '').strip()
+        
+        if not content:
+            return jsonify({"error": "Content is required"}), 400
+            
+        session = tutor_sessions.create(content)
+        return jsonify({"sessionId": session.session_id, "idleTimeoutSeconds": tutor_sessions.idle_seconds})
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to start tutor session",
+            "details": str(e)
+        }), 500
+
+@app.route('/api/flashcard-ask/session/<session_id>', methods=['POST'])
+def flashcard_ask_session_api(session_id):
+    """Ask a follow-up question in an existing tutor session"""
+    try:
+        data = request.get_json()
+        question = data.get('question', '').strip()
+        
+        if not question:
+            return jsonify({"error": "Question is required"}), 400
+            
+        session = tutor_sessions.get(session_id)
+        if session is None:
+            return jsonify({"error": "Session not found or expired"}), 404
+            
+        return jsonify({"response": session.ask(question)})
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to answer question",
+            "details": str(e)
+        }), 500
+
+@app.route('/api/flashcard-ask/session/<session_id>', methods=['DELETE'])
+def flashcard_ask_session_close_api(session_id):
+    """End a tutor session and release its context"""
+    if not tutor_sessions.close(session_id):
+        return jsonify({"error": "Session not found or expired"}), 404
+    return jsonify({"status": "closed"})
+
 @app.route('/api/highlight-pdf', methods=['POST'])
 def highlight_pdf_api():
     """Highlight important content in PDF"""
@@ -172,6 +501,185 @@ def highlight_pdf_api():
             "details": str(e)
         }), 500
 
+# Background jobs: slow ingestion (videos, big PDFs, highlighting) runs in the
+# job worker pool and clients poll /api/jobs/<id> or get a callback.
+JOB_UPLOAD_DIR = os.path.join(os.path.dirname(JOBS_PATH), "job_uploads")
+JOB_OUTPUT_DIR = os.path.join(os.path.dirname(JOBS_PATH), "job_outputs")
+HIGHLIGHT_TIMEOUT_SECONDS = 3600
+
+def _flashcards_for(text, params, source, generate_single):
+    if params.get('genres'):
+        result = generate_multi_genre_flashcards(text, params['genres'], source)
+    else:
+        result = generate_single(text, params.get('genre', 'factual').strip().lower())
+    return _store_job_decks(params, "flashcards", result, text)
+
+def _store_job_decks(params, kind, result, source):
+    """Keep a job's result in the deck store when the client named a deckId.
+
+    The generated result is the expensive part, so a store failure
+    is logged and reported as deckStoreError instead of failing the job.
+    """
+    deck_id = params.get('deckId')
+    if not deck_id:
+        return result
+    try:
+        digest = source_hash(source)
+        if "decks" in result:
+            # Multi-genre results become one deck per genre: <deckId>-<genre>
+            decks = [Deck.from_result(f"{deck_id}-{genre}", kind, deck, source_hash=digest, genre=genre)
+                     for genre, deck in result["decks"].items()]
+        else:
+            decks = [Deck.from_result(deck_id, kind, result, source_hash=digest, genre=params.get('genre', ''))]
+        get_deck_store().append_many(decks)
+    except Exception as e:
+        print(f"Storing deck {deck_id} failed: {e}", file=sys.stderr)
+        metrics.increment("deck_store_failures")
+        return {**result, "deckStoreError": str(e)}
+    return result
+
+def _remove_job_upload(params):
+    """Delete a job's own upload; anything outside JOB_UPLOAD_DIR is left alone"""
+    path = params.get('uploadPath')
+    if not path:
+        return
+    path = os.path.realpath(path)
+    if os.path.dirname(path) != os.path.realpath(JOB_UPLOAD_DIR):
+        print(f"Refusing to remove {path}: not a job upload", file=sys.stderr)
+        return
+    if os.path.exists(path):
+        os.remove(path)
+
+def _transcript_job(params):
+    return _flashcards_for(params['transcript'], params, "transcript", handle_flashcard_request)
+
+def _text_job(params):
+    return _flashcards_for(params['text'], params, "text", generate_flashcards_from_text)
+
+def _quiz_job(params):
+    result = generate_quiz(params['flashcards'], params.get('mode', 'llm'), params.get('relatedFlashcards'))
+    return _store_job_decks(params, "quiz", result, params['flashcards'])
+
+def _pdf_job(params):
+    try:
+        pdf_path = params.get('uploadPath') or params['pdfPath']
+        if params.get('mode') == 'highlights':
+            text, report = select_important_text(pdf_path)
+            return {**_flashcards_for(text, params, "pdf", generate_flashcards_from_pdf), "highlightReport": report}
+        text = extract_text_from_pdf(pdf_path)
+        return _flashcards_for(text, params, "pdf", generate_flashcards_from_pdf)
+    finally:
+        _remove_job_upload(params)
+
+def _image_job(params):
+    try:
+        text = extract_text_from_image(params.get('uploadPath') or params['imagePath'])
+        return _flashcards_for(text, params, "image", generate_flashcards_from_image)
+    finally:
+        _remove_job_upload(params)
+
+def _batch_job(params):
+    for event in iter_batch_ocr(build_page_jobs(params.get('imagePaths'), params.get('pdfPath'))):
+        if event["event"] == "text":
+            return {"pages": event["pages"], **_flashcards_for(event["text"], params, "image", generate_flashcards_from_image)}
+
+def _youtube_job(params):
+    # Imported here so the API does not load Whisper unless a video job runs
+    from main import get_video_id, get_transcript
+    transcript = get_transcript(get_video_id(params['youtubeLink']))
+    return _flashcards_for(transcript, params, "transcript", handle_flashcard_request)
+
+def _highlight_job(params):
+    pdf_path = params['pdfPath']
+    # Output always goes to the jobs directory; clients never choose a server path
+    os.makedirs(JOB_OUTPUT_DIR, exist_ok=True)
+    output_pdf = os.path.join(JOB_OUTPUT_DIR, f"{uuid.uuid4().hex}_highlighted.pdf")
+    all_pages = bool(params.get('allPages'))
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "highlighter.py"), pdf_path, output_pdf]
+    if all_pages:
+        command.append("--all-pages")
+    # highlighter.py is a CLI script; run it in its own process
+    completed = subprocess.run(command, capture_output=True, text=True, timeout=HIGHLIGHT_TIMEOUT_SECONDS)
+    if completed.returncode != 0 or not os.path.exists(output_pdf):
+        output = (completed.stderr.strip() or completed.stdout.strip())[-500:]
+        raise RuntimeError(output or "Highlighter produced no output")
+    if all_pages:
+        return {"outputPdf": output_pdf, "linesPath": os.path.splitext(output_pdf)[0] + ".lines.jsonl"}
+    return {"outputPdf": output_pdf, "outputImage": output_pdf.replace('.pdf', '.png')}
+
+job_queue.register("transcript", _transcript_job, PRIORITY_HIGH, required=("transcript",))
+job_queue.register("text", _text_job, PRIORITY_HIGH, required=("text",))
+job_queue.register("quiz", _quiz_job, PRIORITY_HIGH, required=("flashcards",))
+job_queue.register("image", _image_job, PRIORITY_NORMAL, required=("imagePath|uploadPath",))
+job_queue.register("pdf", _pdf_job, PRIORITY_NORMAL, required=("pdfPath|uploadPath",))
+job_queue.register("batch", _batch_job, PRIORITY_NORMAL, required=("imagePaths|pdfPath",))
+job_queue.register("youtube", _youtube_job, PRIORITY_LOW, required=("youtubeLink",))
+job_queue.register("highlight", _highlight_job, PRIORITY_LOW, required=("pdfPath",))
+# Start the workers now, so jobs requeued after a restart run without a new submit
+job_queue.start()
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job_api():
+    """Queue a background job and return its id immediately.
+
+    JSON body: {"kind", "priority"?, "callbackUrl"?, ...kind-specific params}.
+    pdf and image jobs also accept a multipart/raw upload, with the other
+    fields as form fields or query parameters.
+    """
+    try:
+        if is_upload(request):
+            params = upload_params(request)
+            kind = params.get('kind', '')
+            if kind not in ('pdf', 'image'):
+                return jsonify({"error": "Only pdf and image jobs accept uploads"}), 400
+            os.makedirs(JOB_UPLOAD_DIR, exist_ok=True)
+            with spooled_upload(request, '.pdf' if kind == 'pdf' else '.png') as (path, _):
+                # One file per job: each job deletes its own upload when it finishes
+                params['uploadPath'] = os.path.join(JOB_UPLOAD_DIR, uuid.uuid4().hex + os.path.splitext(path)[1])
+                shutil.copyfile(path, params['uploadPath'])
+        else:
+            params = request.get_json()
+            kind = params.get('kind', '')
+            # Only the upload branch above may set uploadPath (jobs delete it when done)
+            params.pop('uploadPath', None)
+        
+        priority = params.pop('priority', None)
+        callback_url = params.pop('callbackUrl', None)
+        params.pop('kind', None)
+        params.pop('outputPath', None)
+        if priority is not None:
+            priority = job_queue.client_priority(kind, priority)
+        try:
+            job_id = job_queue.submit(kind, params, priority, callback_url)
+        except Exception:
+            _remove_job_upload(params)
+            raise
+        return jsonify(job_queue.get(job_id)), 202
+    except UploadTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({
+            "error": "Failed to submit job",
+            "details": str(e)
+        }), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status_api(job_id):
+    """Poll a background job's status (and result once it is done)"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job_api(job_id):
+    """Cancel a job that has not started yet"""
+    if not job_queue.cancel(job_id):
+        return jsonify({"error": "Job not found or already started"}), 409
+    return jsonify({"status": "cancelled"})
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False) 
\ No newline at end of file
@@ -0,0 +1,85 @@
+import os
+import sys
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import fitz  # PyMuPDF
+from PIL import Image
+from ocr_cache import cached_ocr_file, cached_ocr_image
+from metrics import span
+
+PAGE_WORKERS = int(os.getenv("OCR_PAGE_WORKERS", 4))
+SCAN_DPI = 300
+MIN_TEXT_LAYER_CHARS = 20
+MAX_PAGES = int(os.getenv("BATCH_MAX_PAGES", 100))
+
+
+def _ocr_pdf_page(pdf_path: str, page_number: int) -> str:
+    """Use a PDF page's text layer if it has one, otherwise rasterize and OCR it."""
+    with fitz.open(pdf_path) as doc:
+        page = doc[page_number]
+        text = page.get_text().strip()
+        if len(text) >= MIN_TEXT_LAYER_CHARS:
+            return text
+        pixmap = page.get_pixmap(dpi=SCAN_DPI, colorspace=fitz.csGRAY)
+        image = Image.frombytes("L", (pixmap.width, pixmap.height), pixmap.samples)
+        image.info["dpi"] = (SCAN_DPI, SCAN_DPI)
+    return cached_ocr_image(image, perceptual=False)
+
+
+def build_page_jobs(image_paths=None, pdf_path=None) -> list:
+    """Turn a batch request into an ordered list of zero-argument OCR jobs."""
+    jobs = []
+    for path in image_paths or []:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Image file not found: {path}")
+        jobs.append(lambda path=path: cached_ocr_file(path))
+    if pdf_path:
+        if not os.path.exists(pdf_path):
+            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+        with fitz.open(pdf_path) as doc:
+            page_count = doc.page_count
+        jobs.extend(lambda number=number: _ocr_pdf_page(pdf_path, number) for number in range(page_count))
+    if not jobs:
+        raise ValueError("At least one image or a PDF is required")
+    if len(jobs) > MAX_PAGES:
+        raise ValueError(f"Batch has {len(jobs)} pages; the limit is {MAX_PAGES}")
+    return jobs
+
+
+def iter_batch_ocr(jobs: list):
+    """OCR pages concurrently, yielding progress events as each page finishes.
+
+    Yields {"event": "page", ...} per page in completion order, then one
+    {"event": "text", "text": ...} with all page texts merged in page order.
+    """
+    texts = [""] * len(jobs)
+    with span("batch_ocr"), ThreadPoolExecutor(max_workers=min(PAGE_WORKERS, len(jobs))) as pool:
+        futures = {
+            pool.submit(contextvars.copy_context().run, job): index
+            for index, job in enumerate(jobs)
+        }
+        done = 0
+        for future in as_completed(futures):
+            index = futures[future]
+            done += 1
+            try:
+                texts[index] = future.result().strip()
+                print(f"OCR page {index + 1}/{len(jobs)}: {len(texts[index])} characters", file=sys.stderr)
+                yield {"event": "page", "page": index + 1, "done": done, "total": len(jobs),
+                       "characters": len(texts[index])}
+            except Exception as e:
+                print(f"OCR page {index + 1} failed: {e}", file=sys.stderr)
+                yield {"event": "page", "page": index + 1, "done": done, "total": len(jobs),
+                       "characters": 0, "error": str(e)}
+
+    merged = "\n\n".join(text for text in texts if text)
+    if not merged:
+        raise ValueError("No extractable text found in any page")
+    yield {"event": "text", "text": merged, "pages": len(jobs)}
+
+
+def extract_batch_text(image_paths=None, pdf_path=None) -> str:
+    """Non-streaming helper: OCR a whole batch and return the merged text."""
+    for event in iter_batch_ocr(build_page_jobs(image_paths, pdf_path)):
+        if event["event"] == "text":
+            return event["text"]
@@ -0,0 +1,198 @@
+"""Highlight tier thresholds learned from a score distribution instead of one page.
+
+calculate_adaptive_thresholds() looks at a single page's scores, so short
+pages get unstable tiers and nothing can be coloured until the whole page
+is scored. A ScoreCalibration keeps a fixed-bin histogram of line scores
+(plus count, sum and sum of squares) that can be fitted on a corpus,
+stored as JSON, merged, and updated page by page. Its thresholds use the
+same rule as the per-page version, so once it has seen enough lines every
+line can be tiered the moment it is scored.
+
+    python calibration.py fit docs/ [more.pdf ...]   # fit and store (CALIBRATION_PATH)
+    python calibration.py show
+"""
+import os
+import sys
+import json
+import argparse
+import threading
+import numpy as np
+
+CALIBRATION_PATH = os.getenv("HIGHLIGHT_CALIBRATION_PATH", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".cache", "highlight_calibration.json"))
+# Fewer lines than this and the per-page thresholds are used instead
+MIN_CALIBRATION_LINES = int(os.getenv("HIGHLIGHT_CALIBRATION_MIN_LINES", 200))
+SCORE_RANGE = (0.0, 2.5)
+BINS = 250
+
+
+class ScoreCalibration:
+    """Streaming histogram of line scores with the adaptive-threshold rule on top."""
+
+    __slots__ = ("counts", "count", "total", "total_squares")
+
+    def __init__(self):
+        self.counts = np.zeros(BINS, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= MIN_CALIBRATION_LINES
+
+    def update(self, scores):
+        scores = np.asarray(list(scores), dtype=np.float64)
+        if not scores.size:
+            return
+        low, high = SCORE_RANGE
+        clipped = np.clip(scores, low, high - 1e-9)
+        self.counts += np.bincount(((clipped - low) / (high - low) * BINS).astype(int), minlength=BINS)
+        self.count += int(scores.size)
+        self.total += float(scores.sum())
+        self.total_squares += float((scores ** 2).sum())
+
+    def merge(self, other: "ScoreCalibration"):
+        self.counts += other.counts
+        self.count += other.count
+        self.total += other.total
+        self.total_squares += other.total_squares
+
+    def quantile(self, q: float) -> float:
+        """Approximate quantile, interpolating inside the histogram bin."""
+        if not self.count:
+            return 0.0
+        low, high = SCORE_RANGE
+        width = (high - low) / BINS
+        target = q * self.count
+        cumulative = np.cumsum(self.counts)
+        index = int(np.searchsorted(cumulative, target))
+        before = cumulative[index - 1] if index else 0
+        inside = self.counts[index]
+        fraction = (target - before) / inside if inside else 0.0
+        return low + (index + fraction) * width
+
+    def thresholds(self) -> tuple:
+        """(medium, high) using the same rule as calculate_adaptive_thresholds."""
+        mean = self.total / self.count if self.count else 0.0
+        std = max(0.0, self.total_squares / self.count - mean ** 2) ** 0.5 if self.count else 0.0
+        high_threshold = max(self.quantile(0.80), mean + 0.8 * std, 0.6)
+        medium_threshold = max(self.quantile(0.50), mean + 0.3 * std, 0.3)
+        if high_threshold - medium_threshold < 0.1:
+            high_threshold = medium_threshold + 0.1
+        return medium_threshold, high_threshold
+
+    def to_dict(self) -> dict:
+        return {"range": list(SCORE_RANGE), "bins": BINS, "count": self.count, "total": self.total,
+                "totalSquares": self.total_squares, "counts": self.counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ScoreCalibration":
+        if tuple(data["range"]) != SCORE_RANGE or data["bins"] != BINS:
+            raise ValueError("Calibration was stored with a different histogram layout; refit it")
+        calibration = cls()
+        calibration.counts = np.asarray(data["counts"], dtype=np.int64)
+        calibration.count = data["count"]
+        calibration.total = data["total"]
+        calibration.total_squares = data["totalSquares"]
+        return calibration
+
+    def copy(self) -> "ScoreCalibration":
+        clone = ScoreCalibration()
+        clone.merge(self)
+        return clone
+
+
+def save_calibration(calibration: ScoreCalibration, path: str = CALIBRATION_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as handle:
+        json.dump(calibration.to_dict(), handle)
+    os.replace(temp_path, path)
+
+
+def load_calibration(path: str = CALIBRATION_PATH):
+    """The stored calibration, or None when there is none (or it cannot be read)."""
+    try:
+        with open(path) as handle:
+            return ScoreCalibration.from_dict(json.load(handle))
+    except FileNotFoundError:
+        return None
+    except (ValueError, KeyError) as e:
+        print(f"Ignoring highlight calibration at {path}: {e}", file=sys.stderr)
+        return None
+
+
+_stored = {}
+_stored_lock = threading.Lock()
+
+
+def get_calibration(path: str = CALIBRATION_PATH):
+    """Load the stored calibration once per process (None when missing)."""
+    with _stored_lock:
+        if path not in _stored:
+            _stored[path] = load_calibration(path)
+        return _stored[path]
+
+
+def fit_corpus(pdf_paths, config=None, max_pages: int = None) -> ScoreCalibration:
+    """Score every page of every PDF and collect the raw line scores."""
+    import highlighter
+    from pdf_stream import iter_pdf_pages
+
+    calibration = ScoreCalibration()
+    for path in pdf_paths:
+        pages = None
+        if max_pages:
+            from pdf_stream import page_count
+            pages = range(min(page_count(path), max_pages))
+        for number, page in iter_pdf_pages(path, pages=pages):
+            with highlighter.progress_to(None):
+                scored_page = highlighter.score_page(page, {**(config or {}), "thresholds": "page"})
+            if scored_page is not None:
+                calibration.update(scored_page["raw_scores"])
+        print(f"{os.path.basename(path)}: {calibration.count} lines so far", file=sys.stderr)
+    return calibration
+
+
+def _describe(calibration: ScoreCalibration):
+    medium, high = calibration.thresholds()
+    print(f"lines {calibration.count} ({'ready' if calibration.ready else f'needs {MIN_CALIBRATION_LINES}'})")
+    print(f"p50 {calibration.quantile(0.5):.3f}  p80 {calibration.quantile(0.8):.3f}  "
+          f"mean {calibration.total / max(1, calibration.count):.3f}")
+    print(f"medium >= {medium:.3f}  high >= {high:.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit or inspect stored highlight thresholds")
+    parser.add_argument("command", choices=("fit", "show"))
+    parser.add_argument("paths", nargs="*", help="PDF files or directories of PDFs (fit)")
+    parser.add_argument("--output", default=CALIBRATION_PATH)
+    parser.add_argument("--pages", type=int, default=0, help="max pages per PDF (default: all)")
+    parser.add_argument("--merge", action="store_true", help="add to the stored calibration instead of replacing it")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        stored = load_calibration(args.output)
+        if stored is None:
+            print(f"No calibration at {args.output}")
+            sys.exit(1)
+        _describe(stored)
+        sys.exit(0)
+
+    pdf_paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            pdf_paths.extend(sorted(os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith(".pdf")))
+        else:
+            pdf_paths.append(path)
+    if not pdf_paths:
+        parser.error("fit needs at least one PDF")
+    fitted = fit_corpus(pdf_paths, max_pages=args.pages or None)
+    if args.merge:
+        previous = load_calibration(args.output)
+        if previous is not None:
+            fitted.merge(previous)
+    save_calibration(fitted, args.output)
+    _describe(fitted)
+    print(f"Saved to {args.output}")
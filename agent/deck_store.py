@@ -0,0 +1,327 @@
+"""Compact persisted flashcard and quiz decks.
+
+Decks are slots-based records (Deck, Flashcard, QuizQuestion) that convert
+to and from the JSON dicts the agents return. On disk each deck is one
+JSONL line stored column-wise (all titles, then all contents, ...), and
+every bulk append is written as one gzip member at the end of a segment
+file. A SQLite index maps deck id and source hash to (segment, offset,
+length, line), so a lookup decompresses only the batch the deck was
+written in, and an export streams batches in storage order.
+
+    python deck_store.py 2000        # size and speed vs plain JSON for N synthetic decks
+"""
+import os
+import sys
+import json
+import gzip
+import time
+import sqlite3
+import hashlib
+import threading
+from metrics import increment
+
+STORE_DIR = os.getenv("DECK_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "decks"))
+SEGMENT_BYTES = int(os.getenv("DECK_STORE_SEGMENT_MB", 64)) * 1024 * 1024
+COMPRESSION_LEVEL = 6
+COMPACT_BATCH = 500
+KINDS = ("flashcards", "quiz")
+
+
+def source_hash(source) -> str:
+    """SHA-256 of the text (or JSON-serializable input) a deck was generated from."""
+    if not isinstance(source, (str, bytes)):
+        source = json.dumps(source, sort_keys=True, ensure_ascii=False)
+    if isinstance(source, str):
+        source = source.encode("utf-8")
+    return hashlib.sha256(source).hexdigest()
+
+
+class Flashcard:
+    __slots__ = ("id", "title", "content", "genre", "extra")
+    FIELDS = ("id", "title", "content", "genre")
+
+    def __init__(self, id=None, title="", content="", genre=None, extra=None):
+        self.id = id
+        self.title = title
+        self.content = content
+        self.genre = genre
+        self.extra = extra  # any other keys the model returned
+
+
+class QuizQuestion:
+    __slots__ = ("id", "question", "options", "correct_answer", "explanation", "extra")
+    FIELDS = ("id", "question", "options", "correct_answer", "explanation")
+
+    def __init__(self, id=None, question="", options=(), correct_answer=None, explanation=None, extra=None):
+        self.id = id
+        self.question = question
+        self.options = list(options)
+        self.correct_answer = correct_answer
+        self.explanation = explanation
+        self.extra = extra
+
+
+ITEM_TYPES = {"flashcards": Flashcard, "quiz": QuizQuestion}
+
+
+def _item_from_dict(item_type, data: dict):
+    extra = {key: value for key, value in data.items() if key not in item_type.FIELDS}
+    return item_type(**{key: data[key] for key in item_type.FIELDS if key in data}, extra=extra or None)
+
+
+def _item_to_dict(item) -> dict:
+    data = {field: getattr(item, field) for field in item.FIELDS if getattr(item, field) is not None}
+    if item.extra:
+        data.update(item.extra)
+    return data
+
+
+class Deck:
+    """One generated deck: its items plus where it came from."""
+
+    __slots__ = ("deck_id", "kind", "source_hash", "genre", "prompt_version", "created", "items")
+
+    def __init__(self, deck_id: str, kind: str, items, source_hash: str = "", genre: str = "",
+                 prompt_version: str = "", created: float = None):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown deck kind '{kind}'. Must be one of: {', '.join(KINDS)}")
+        self.deck_id = deck_id
+        self.kind = kind
+        self.items = list(items)
+        self.source_hash = source_hash
+        self.genre = genre
+        self.prompt_version = prompt_version
+        self.created = time.time() if created is None else created
+
+    @classmethod
+    def from_result(cls, deck_id: str, kind: str, result: dict, **metadata) -> "Deck":
+        """Build a deck from an agent result ({"flashcards": [...]} or {"quiz": [...]})."""
+        if kind not in ITEM_TYPES:
+            raise ValueError(f"Unknown deck kind: '{kind}'. Must be one of: {', '.join(ITEM_TYPES)}")
+        if not isinstance(result, dict) or not isinstance(result.get(kind), list):
+            raise ValueError(f"Result has no '{kind}' list")
+        if not all(isinstance(item, dict) for item in result[kind]):
+            raise ValueError(f"Every '{kind}' entry must be an object")
+        item_type = ITEM_TYPES[kind]
+        return cls(deck_id, kind, [_item_from_dict(item_type, item) for item in result[kind]], **metadata)
+
+    def to_result(self) -> dict:
+        """The deck in the shape the agents return it."""
+        return {self.kind: [_item_to_dict(item) for item in self.items]}
+
+    def to_json(self) -> dict:
+        return {"deckId": self.deck_id, "kind": self.kind, "sourceHash": self.source_hash, "genre": self.genre,
+                "promptVersion": self.prompt_version, "created": self.created, **self.to_result()}
+
+    def encode(self) -> bytes:
+        """One compact line: metadata plus one list per field (columns with no values are left out)."""
+        fields = ITEM_TYPES[self.kind].FIELDS + ("extra",)
+        columns = {}
+        for field in fields:
+            column = [getattr(item, field) for item in self.items]
+            if any(value is not None for value in column):
+                columns[field] = column
+        row = {"d": self.deck_id, "k": self.kind, "s": self.source_hash, "g": self.genre,
+               "v": self.prompt_version, "t": round(self.created, 3), "n": len(self.items), "c": columns}
+        return json.dumps(row, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+    @classmethod
+    def decode(cls, line: bytes) -> "Deck":
+        row = json.loads(line)
+        item_type = ITEM_TYPES[row["k"]]
+        columns = row["c"]
+        items = []
+        for index in range(row["n"]):
+            values = {field: column[index] for field, column in columns.items()}
+            items.append(item_type(**values))
+        return cls(row["d"], row["k"], items, row["s"], row["g"], row["v"], row["t"])
+
+
+class DeckStore:
+    """Append-only, gzip-compressed deck segments with a SQLite lookup index.
+
+    Appending a deck id again replaces it (the index points at the newest
+    copy); compact() rewrites only live decks to reclaim the space.
+    """
+
+    def __init__(self, directory: str = STORE_DIR, segment_bytes: int = SEGMENT_BYTES):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS decks (
+            deck_id TEXT PRIMARY KEY, kind TEXT NOT NULL, source_hash TEXT, segment INTEGER NOT NULL,
+            offset INTEGER NOT NULL, length INTEGER NOT NULL, line INTEGER NOT NULL, created REAL NOT NULL)""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS decks_source ON decks (source_hash)")
+        self._db.commit()
+        self._segment = max(self._segments(), default=0)
+
+    def _segments(self) -> list:
+        return sorted(int(name[8:14]) for name in os.listdir(self.directory)
+                      if name.startswith("segment-") and name.endswith(".jsonl.gz"))
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"segment-{segment:06d}.jsonl.gz")
+
+    def _write_member(self, lines: list) -> tuple:
+        """Write lines as one gzip member; returns (segment, offset, length)."""
+        member = gzip.compress(b"".join(lines), compresslevel=COMPRESSION_LEVEL)
+        path = self._segment_path(self._segment)
+        if self._segment == 0 or (os.path.exists(path) and os.path.getsize(path) + len(member) > self.segment_bytes):
+            self._segment += 1
+            path = self._segment_path(self._segment)
+        with open(path, "ab") as handle:
+            offset = handle.tell()
+            handle.write(member)
+            handle.flush()
+            os.fsync(handle.fileno())
+        return self._segment, offset, len(member)
+
+    def append_many(self, decks) -> int:
+        """Store decks in one compressed batch and one index transaction."""
+        decks = list(decks)
+        if not decks:
+            return 0
+        with self._lock:
+            segment, offset, length = self._write_member([deck.encode() for deck in decks])
+            self._db.executemany(
+                "INSERT OR REPLACE INTO decks (deck_id, kind, source_hash, segment, offset, length, line, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(deck.deck_id, deck.kind, deck.source_hash, segment, offset, length, line, deck.created)
+                 for line, deck in enumerate(decks)]
+            )
+            self._db.commit()
+        increment("decks_stored", len(decks))
+        return len(decks)
+
+    def append(self, deck: Deck):
+        self.append_many([deck])
+
+    def _read_member(self, segment: int, offset: int, length: int) -> list:
+        with open(self._segment_path(segment), "rb") as handle:
+            handle.seek(offset)
+            return gzip.decompress(handle.read(length)).splitlines()
+
+    def get(self, deck_id: str):
+        """The stored deck, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT segment, offset, length, line FROM decks WHERE deck_id = ?",
+                                   (deck_id,)).fetchone()
+        if row is None:
+            return None
+        segment, offset, length, line = row
+        return Deck.decode(self._read_member(segment, offset, length)[line])
+
+    def find_by_source(self, source_hash: str, kind: str = None) -> list:
+        """Every deck generated from the same source, newest first."""
+        query = "SELECT deck_id FROM decks WHERE source_hash = ?"
+        params = [source_hash]
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        with self._lock:
+            deck_ids = [row[0] for row in self._db.execute(query + " ORDER BY created DESC", params)]
+        return list(self.iter_decks(deck_ids))
+
+    def iter_decks(self, deck_ids=None, kind: str = None):
+        """Yield decks in storage order, decompressing each batch once."""
+        query = "SELECT deck_id, segment, offset, length, line FROM decks"
+        clauses, params = [], []
+        if deck_ids is not None:
+            deck_ids = list(deck_ids)
+            if not deck_ids:
+                return
+            clauses.append(f"deck_id IN ({','.join('?' * len(deck_ids))})")
+            params.extend(deck_ids)
+        if kind:
+            clauses.append("kind = ?")
+            params.append(kind)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY segment, offset, line", params).fetchall()
+        member_key, lines = None, None
+        for _, segment, offset, length, line in rows:
+            if (segment, offset) != member_key:
+                member_key = (segment, offset)
+                lines = self._read_member(segment, offset, length)
+            yield Deck.decode(lines[line])
+
+    def export(self, deck_ids=None, kind: str = None):
+        """Stream decks as NDJSON lines (bytes) in the agents' result shape."""
+        for deck in self.iter_decks(deck_ids, kind):
+            yield json.dumps(deck.to_json(), ensure_ascii=False).encode("utf-8") + b"\n"
+
+    def compact(self):
+        """Rewrite live decks into fresh segments and delete the old ones.
+
+        Maintenance only: run it while nothing else is appending.
+        """
+        old_segments = self._segments()
+        live = list(self.iter_decks())
+        with self._lock:
+            self._segment = max(old_segments, default=0) + 1
+        for start in range(0, len(live), COMPACT_BATCH):
+            self.append_many(live[start:start + COMPACT_BATCH])
+        for segment in old_segments:
+            os.remove(self._segment_path(segment))
+
+    def stats(self) -> dict:
+        with self._lock:
+            decks, = self._db.execute("SELECT COUNT(*) FROM decks").fetchone()
+        segments = self._segments()
+        return {"decks": decks, "segments": len(segments),
+                "bytes": sum(os.path.getsize(self._segment_path(segment)) for segment in segments)}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> DeckStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DeckStore()
+        return _store
+
+
+def _synthetic_decks(count: int) -> list:
+    from fake_gemini import _fake_output
+    import random
+
+    rng = random.Random(7)
+    decks = []
+    for index in range(count):
+        kind = "quiz" if index % 4 == 3 else "flashcards"
+        result = json.loads(_fake_output('"quiz"' if kind == "quiz" else "", True, rng, 6))
+        decks.append(Deck.from_result(f"deck-{index}", kind, result, source_hash=source_hash(str(index // 2)),
+                                      genre="factual"))
+    return decks
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    decks = _synthetic_decks(count)
+    plain = sum(len(json.dumps(deck.to_json())) for deck in decks)
+    with tempfile.TemporaryDirectory(prefix="mindsnap_decks_") as directory:
+        store = DeckStore(directory)
+        started = time.perf_counter()
+        for start in range(0, count, 100):
+            store.append_many(decks[start:start + 100])
+        append_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        for index in range(0, count, max(1, count // 200)):
+            store.get(f"deck-{index}")
+        lookups = len(range(0, count, max(1, count // 200)))
+        lookup_ms = (time.perf_counter() - started) * 1000 / lookups
+        started = time.perf_counter()
+        exported = sum(len(line) for line in store.export())
+        export_ms = (time.perf_counter() - started) * 1000
+        stored = store.stats()["bytes"]
+    print(f"{count} decks: plain JSON {plain / 1024:.0f} KB, stored {stored / 1024:.0f} KB ({stored / plain:.0%})")
+    print(f"bulk append {append_ms:.0f} ms, lookup {lookup_ms:.2f} ms/deck, export {export_ms:.0f} ms "
+          f"({exported / 1024:.0f} KB NDJSON)")
@@ -0,0 +1,26 @@
+import numpy as np
+from sentence_transformers import SentenceTransformer
+from metrics import span
+from inference import SENTENCE_MODEL_NAME, load_model
+
+EMBEDDING_DIMENSION = 384
+
+
+def get_sentence_model(backend: str = "fp32") -> SentenceTransformer:
+    """Load the MiniLM sentence model once per backend and share it across callers.
+
+    Retrieval indexes are built with the fp32 model; other backends are for
+    the highlighter (see inference.py).
+    """
+    return load_model("sentence", backend)
+
+
+def embed(texts) -> np.ndarray:
+    """Unit-length float32 embeddings, one row per text, so dot product = cosine."""
+    texts = list(texts)
+    if not texts:
+        return np.zeros((0, EMBEDDING_DIMENSION), dtype=np.float32)
+    with span("embed"):
+        vectors = get_sentence_model().encode(texts, batch_size=32, convert_to_numpy=True,
+                                              normalize_embeddings=True)
+    return vectors.astype(np.float32)
@@ -0,0 +1,202 @@
+"""Fast proper-noun / entity extraction for the highlighter.
+
+One pass of compiled regular expressions over the whole document finds
+capitalized name sequences ("Napoleon Bonaparte", "Storming of the
+Bastille"), acronyms ("ATP") and gazetteer terms, and maps every match
+back to the line it came from. Sentence-initial capitals are only kept
+when the word never appears in lower case elsewhere in the document, which
+stands in for the POS tagger's judgement at a fraction of the cost.
+Optionally, NLTK's tagger can add NNP tokens in one batched call.
+
+    python entities.py doc.pdf [more.pdf ...]   # speed and overlap vs NLTK pos_tag + ne_chunk
+"""
+import os
+import re
+import sys
+import time
+from bisect import bisect_right
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+GAZETTEER_PATH = os.getenv("ENTITY_GAZETTEER_PATH", "")
+# Lower-case connectors allowed inside a multi-word name
+NAME_CONNECTORS = ("of", "the", "de", "du", "la", "le", "von", "van", "der", "da", "di", "and", "&")
+
+_WORD = r"[A-Z][A-Za-z'’\-]*[A-Za-z]"
+NAME_PATTERN = re.compile(
+    rf"\b{_WORD}(?:[ \t]+(?:(?:{'|'.join(re.escape(c) for c in NAME_CONNECTORS)})[ \t]+)*{_WORD})*"
+)
+ACRONYM_PATTERN = re.compile(r"\b[A-Z][A-Z0-9]{1,}s?\b")
+SENTENCE_START = re.compile(r"(?:^|[.!?:;]\s+|[\"'(\[]\s*)$")
+LOWER_WORD = re.compile(r"\b[a-z][a-z'\-]*\b")
+
+_gazetteer = set()
+_gazetteer_pattern = None
+
+
+def register_terms(terms):
+    """Add known entity names (case-insensitive) to the gazetteer."""
+    global _gazetteer_pattern
+    _gazetteer.update(term.strip() for term in terms if term.strip())
+    if _gazetteer:
+        alternatives = sorted(_gazetteer, key=len, reverse=True)
+        _gazetteer_pattern = re.compile(r"\b(?:" + "|".join(re.escape(t) for t in alternatives) + r")\b", re.IGNORECASE)
+
+
+def load_gazetteer(path: str):
+    """Read one term per line; blank lines and #comments are skipped."""
+    with open(path, encoding="utf-8") as handle:
+        register_terms(line for line in handle if not line.lstrip().startswith("#"))
+
+
+if GAZETTEER_PATH:
+    try:
+        load_gazetteer(GAZETTEER_PATH)
+    except OSError as e:
+        print(f"Entity gazetteer not loaded: {e}", file=sys.stderr)
+
+
+def _trim_name(text: str, start: int):
+    """Drop leading/trailing stop words ("The French Revolution" -> "French Revolution")."""
+    words = [w for w in re.finditer(r"\S+", text)]
+    while words and words[0].group().lower() in ENGLISH_STOP_WORDS:
+        words.pop(0)
+    while words and words[-1].group().lower() in ENGLISH_STOP_WORDS:
+        words.pop()
+    if not words:
+        return None
+    name = text[words[0].start():words[-1].end()]
+    if name.endswith(("'s", "’s")):
+        name = name[:-2]
+    return start + words[0].start(), name
+
+
+def extract_entities(lines, tagger=None) -> list:
+    """Entity spans per line: [[(start, end, text, kind), ...], ...].
+
+    kind is "name", "acronym", "gazetteer" or "tagged". Offsets are
+    relative to each line. tagger="nltk" adds proper nouns from one batched
+    NLTK pos_tag call over all lines.
+    """
+    lines = list(lines)
+    document = "\n".join(lines)
+    starts = []
+    position = 0
+    for line in lines:
+        starts.append(position)
+        position += len(line) + 1
+    lower_words = set(LOWER_WORD.findall(document))
+    spans = [dict() for _ in lines]
+
+    def add(start, end, text, kind):
+        index = bisect_right(starts, start) - 1
+        local = start - starts[index]
+        spans[index].setdefault((local, local + len(text)), (local, local + len(text), text, kind))
+
+    if _gazetteer_pattern is not None:
+        for match in _gazetteer_pattern.finditer(document):
+            add(match.start(), match.end(), match.group(), "gazetteer")
+
+    for match in ACRONYM_PATTERN.finditer(document):
+        add(match.start(), match.end(), match.group(), "acronym")
+
+    for match in NAME_PATTERN.finditer(document):
+        trimmed = _trim_name(match.group(), match.start())
+        if trimmed is None:
+            continue
+        start, name = trimmed
+        if " " not in name:
+            if len(name) < 3 or name.isupper():
+                continue
+            # A lone capitalized word that starts a sentence is only a name if
+            # the document never uses it in lower case
+            at_sentence_start = SENTENCE_START.search(document, max(0, start - 3), start) is not None
+            if at_sentence_start and name.lower() in lower_words:
+                continue
+        add(start, start + len(name), name, "name")
+
+    if tagger == "nltk":
+        from nltk import pos_tag_sents
+        tokenized = [line.split() for line in lines]
+        for index, tags in enumerate(pos_tag_sents(tokenized)):
+            cursor = 0
+            for token, tag in tags:
+                cursor = lines[index].index(token, cursor)
+                word = token.strip(".,;:!?()[]\"'")
+                if tag in ("NNP", "NNPS") and len(word) > 2 and word[:1].isupper():
+                    local = lines[index].index(word, cursor)
+                    spans[index].setdefault((local, local + len(word)), (local, local + len(word), word, "tagged"))
+                cursor += len(token)
+
+    return [_drop_nested(sorted(line_spans.values())) for line_spans in spans]
+
+
+def _drop_nested(spans: list) -> list:
+    """Keep the longest span where matches overlap."""
+    kept = []
+    for span in sorted(spans, key=lambda s: (s[0], -(s[1] - s[0]))):
+        if kept and span[0] < kept[-1][1]:
+            continue
+        kept.append(span)
+    return kept
+
+
+def document_entities(line_spans) -> list:
+    """Unique entity strings across all lines, in first-seen order."""
+    seen = {}
+    for spans in line_spans:
+        for _, _, text, _ in spans:
+            seen.setdefault(text, None)
+    return list(seen)
+
+
+def _overlap(fast: set, reference: set) -> tuple:
+    """(recall of reference terms, precision vs reference), matching on word containment."""
+    fast_lower = {term.lower() for term in fast}
+    reference_lower = {term.lower() for term in reference}
+
+    def covered(term, pool):
+        return any(term in other or other in term for other in pool)
+
+    recall = sum(covered(term, fast_lower) for term in reference_lower) / len(reference_lower) if reference_lower else 1.0
+    precision = sum(covered(term, reference_lower) for term in fast_lower) / len(fast_lower) if fast_lower else 1.0
+    return recall, precision
+
+
+def benchmark(pdf_paths):
+    """Time document + per-line extraction against NLTK and report term overlap."""
+    import fitz  # PyMuPDF
+    import highlighter
+
+    for path in pdf_paths:
+        with fitz.open(path) as doc:
+            lines = [line for page in doc for line, _ in highlighter.extract_lines_with_boxes(page)]
+        full_text = " ".join(highlighter.clean_text(line) for line in lines)
+
+        started = time.perf_counter()
+        reference_global = set(highlighter.extract_proper_nouns_and_entities(full_text))
+        reference_lines = [highlighter.extract_proper_nouns_and_entities(line) for line in lines]
+        nltk_ms = (time.perf_counter() - started) * 1000
+
+        results = {}
+        for label, tagger in (("fast", None), ("fast+nltk", "nltk")):
+            started = time.perf_counter()
+            line_spans = extract_entities(lines, tagger)
+            elapsed = (time.perf_counter() - started) * 1000
+            line_recall = [
+                _overlap({s[2] for s in spans}, set(reference))[0]
+                for spans, reference in zip(line_spans, reference_lines) if reference
+            ]
+            recall, precision = _overlap(set(document_entities(line_spans)), reference_global)
+            results[label] = (elapsed, recall, precision, sum(line_recall) / len(line_recall) if line_recall else 1.0)
+
+        print(f"{os.path.basename(path)}: {len(lines)} lines, NLTK {nltk_ms:.0f} ms, {len(reference_global)} terms")
+        for label, (elapsed, recall, precision, line_recall) in results.items():
+            print(f"  {label:10s} {elapsed:8.1f} ms ({nltk_ms / max(elapsed, 0.001):5.0f}x)  "
+                  f"document recall {recall:.3f}  precision {precision:.3f}  per-line recall {line_recall:.3f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python entities.py <file.pdf> [more.pdf ...]")
+        sys.exit(1)
+    benchmark(sys.argv[1:])
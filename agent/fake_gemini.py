@@ -0,0 +1,177 @@
+"""Local stand-in for the Gemini REST API, for load tests and throttling tests.
+
+Point the agent at it with GEMINI_API_ENDPOINT=http://127.0.0.1:<port>.
+Responses are schema-valid for every endpoint (flashcards, multi-genre
+decks, quizzes, plain text, streaming), arrive after a configurable
+latency, and can be throttled (HTTP 429) at random or above a
+requests-per-minute quota.
+
+    python fake_gemini.py --port 8089 --latency-ms 800 --jitter-ms 200 --throttle-rate 0.05 --rpm 600
+"""
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("cell energy membrane protein enzyme reaction structure process function system "
+         "history revolution empire trade river culture theory model force motion").split()
+
+
+class FakeGeminiConfig:
+    __slots__ = ("latency_ms", "jitter_ms", "throttle_rate", "error_rate", "rpm", "cards", "seed")
+
+    def __init__(self, latency_ms=500.0, jitter_ms=100.0, throttle_rate=0.0, error_rate=0.0, rpm=0, cards=5, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.rpm = rpm
+        self.cards = cards
+        self.seed = seed
+
+
+def _sentence(rng, words=12) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _fake_output(prompt: str, json_mode: bool, rng, cards: int) -> str:
+    """Build an answer shaped like what the real prompt asks for."""
+    if not json_mode:
+        return " ".join(_sentence(rng) for _ in range(4))
+    if '"quiz"' in prompt:
+        count = re.search(r"(\d+)\s+multiple-choice", prompt)
+        count = int(count.group(1)) if count else 5
+        return json.dumps({"quiz": [
+            {"id": i, "question": _sentence(rng, 8)[:-1] + "?", "options": [_sentence(rng, 3) for _ in range(4)],
+             "correct_answer": rng.randrange(4), "explanation": _sentence(rng)}
+            for i in range(1, count + 1)
+        ]})
+    genres = re.findall(r'STYLE "(\w+)"', prompt)
+    items = []
+    for genre in genres or [None]:
+        for _ in range(cards):
+            card = {"id": len(items) + 1, "title": " ".join(rng.choice(WORDS) for _ in range(2)).title(),
+                    "content": " ".join(_sentence(rng) for _ in range(2))}
+            if genre:
+                card["genre"] = genre
+            items.append(card)
+    return json.dumps({"flashcards": items})
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = FakeGeminiConfig()
+    _recent = deque()
+    _lock = threading.Lock()
+    _rng = random.Random()
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _throttled(self) -> bool:
+        config = self.config
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            if config.rpm and len(self._recent) >= config.rpm:
+                return True
+            if self._rng.random() < config.throttle_rate:
+                return True
+            self._recent.append(now)
+            return False
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        match = re.search(r"models/[^:]+:(generateContent|streamGenerateContent)", self.path)
+        if not match:
+            return self._send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+
+        config = self.config
+        if self._throttled():
+            return self._send_json(429, {"error": {"code": 429, "message": "Resource has been exhausted (e.g. check quota).",
+                                                   "status": "RESOURCE_EXHAUSTED"}})
+        with self._lock:
+            failed = self._rng.random() < config.error_rate
+            delay = max(0.0, config.latency_ms + self._rng.uniform(-config.jitter_ms, config.jitter_ms)) / 1000
+            rng = random.Random(self._rng.random())
+        time.sleep(delay)
+        if failed:
+            return self._send_json(503, {"error": {"code": 503, "message": "The model is overloaded.", "status": "UNAVAILABLE"}})
+
+        prompt = "\n".join(part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", []))
+        json_mode = body.get("generationConfig", {}).get("responseMimeType") == "application/json"
+        text = _fake_output(prompt, json_mode, rng, config.cards)
+        usage = {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(text) // 4,
+                 "totalTokenCount": (len(prompt) + len(text)) // 4}
+
+        if match.group(1) == "generateContent":
+            return self._send_json(200, {
+                "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP", "index": 0}],
+                "usageMetadata": usage,
+            })
+
+        # Streaming: a JSON array of chunks, written piece by piece
+        pieces = [text[i:i + 40] for i in range(0, len(text), 40)] or [""]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for index, piece in enumerate(pieces):
+            chunk = {"candidates": [{"content": {"parts": [{"text": piece}], "role": "model"}, "index": 0}]}
+            if index == len(pieces) - 1:
+                chunk["candidates"][0]["finishReason"] = "STOP"
+                chunk["usageMetadata"] = usage
+            data = ("[" if index == 0 else ",") + json.dumps(chunk) + ("]" if index == len(pieces) - 1 else "")
+            try:
+                self.wfile.write(f"{len(data.encode()):x}\r\n{data}\r\n".encode())
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            time.sleep(delay / len(pieces) / 4)
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def start_fake_gemini(config: FakeGeminiConfig = None, port: int = 0) -> ThreadingHTTPServer:
+    """Start the fake API on a background thread; returns the server (see server_address)."""
+    handler = type("ConfiguredFakeGeminiHandler", (FakeGeminiHandler,), {
+        "config": config or FakeGeminiConfig(), "_recent": deque(), "_lock": threading.Lock(),
+        "_rng": random.Random((config or FakeGeminiConfig()).seed),
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Gemini REST API")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--rpm", type=int, default=0, help="429 above this many requests per minute (0 = no quota)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    server = start_fake_gemini(FakeGeminiConfig(args.latency_ms, args.jitter_ms, args.throttle_rate,
+                                                args.error_rate, args.rpm, seed=args.seed), args.port)
+    print(f"Fake Gemini listening on http://127.0.0.1:{server.server_address[1]}", file=sys.stderr)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -3,46 +3,33 @@
 import os
 import json
 import sys
-import re
 from dotenv import load_dotenv
-import google.generativeai as genai
+from llm_client import generate_json_chunked
+from prompts import get_flashcard_template
+from metrics import timed
+from pdf_stream import STREAM_MIN_PAGES, MemoryCeilingExceeded, extract_text_streaming, page_count
 import PyPDF2
 
 # Load API key from .env
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
-GENRE_INSTRUCTIONS = {
-    "factual": """Write 4-6 flashcards that focus on direct, concrete facts, dates, names, and specific information.
-- Be clear, concise, and objective.
-- Avoid speculation or narrative.
-- Each card should deliver a standalone fact or data point.""",
-    "conceptual": """Write 4-6 flashcards that explain scientific, technical, or theoretical concepts in depth.
-- Focus on principles, mechanisms, relationships, and "how/why" explanations.
--Do NOT use bold text or headings (using "**Concept:**" or "**Explanation:**" is not allowed).
-- Use analogies or diagrams if helpful.
-- Cards should help the learner understand the underlying ideas, not just memorize facts.""",
-    "genz": """Write 4-6 flashcards in a Gen-Z style:
-- Use memes, slang, and pop culture references (but do NOT use emojis).
-- Make it funny, relatable, and surprising.
-- Each card should have a playful, energetic vibe and spark curiosity.
-- Think TikTok, not textbook.
-- Do NOT use emojis.""",
-    "story": """Write 4-6 flashcards that present the content as a vivid, engaging story or narrative.
-- Use storytelling techniques: characters, conflict, suspense, or a journey.
-- Each card should feel like a scene or plot point.
-- End with a cliffhanger or emotional beat (except the last card, which should conclude the story)."""
-}
-
-def get_genre_prompt(genre):
-    if genre not in GENRE_INSTRUCTIONS:
-        raise ValueError(f"Unknown genre: '{genre}'. Must be one of: {', '.join(GENRE_INSTRUCTIONS.keys())}")
-    return GENRE_INSTRUCTIONS[genre]
-
+@timed("pdf_extract")
 def extract_text_from_pdf(pdf_path: str) -> str:
-    """Extract text from PDF file with error handling."""
+    """Extract text from PDF file with error handling.
+
+    Large PDFs (over PDF_STREAM_MIN_PAGES pages) are read a window of pages
+    at a time under the memory ceiling instead of all at once.
+    """
     text = ""
     try:
+        if not os.path.exists(pdf_path):
+            raise FileNotFoundError(pdf_path)
+        if page_count(pdf_path) > STREAM_MIN_PAGES:
+            text = extract_text_streaming(pdf_path)
+            if not text.strip():
+                raise ValueError("PDF appears to be empty or contains no extractable text")
+            return text
         with open(pdf_path, "rb") as file:
             reader = PyPDF2.PdfReader(file)
             for page in reader.pages:
@@ -51,65 +38,20 @@ def extract_text_from_pdf(pdf_path: str) -> str:
                 raise ValueError("PDF appears to be empty or contains no extractable text")
     except FileNotFoundError:
         raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+    except MemoryCeilingExceeded:
+        raise
     except Exception as e:
         raise RuntimeError(f"Error reading PDF file: {str(e)}")
     return text
 
 def generate_flashcards_from_text(transcript: str, genre: str) -> dict:
     genre = genre.strip().lower()
-    genre_instructions = get_genre_prompt(genre)
-
-    print("Configuring Gemini API...", file=sys.stderr)
-    genai.configure(api_key=GOOGLE_API_KEY)
-    model = genai.GenerativeModel('gemini-1.5-flash')
+    template = get_flashcard_template(genre, "pdf")
 
-    prompt = f"""
-IMPORTANT: You must write the flashcards in the **{genre.upper()}** style ONLY. Do NOT mix with other styles. Follow the instructions for this style exactly.
-
-GENRE INSTRUCTION:
-{genre_instructions}
-
----
-Transcript:
-{transcript}
-
----
-Return your output in the following JSON format. For each flashcard, you must provide a "title" that is a 2-3 word catchy phrase summarizing the card's content, and the "content" of the flashcard.
-{{
-  "flashcards": [
-    {{
-      "id": 1,
-      "title": "A Catchy Title",
-      "content": "..."
-    }},
-    ...
-  ]
-}}
-"""
-
-    print(f"Generating flashcards with Gemini in '{genre}' mode...", file=sys.stderr)
-    response = model.generate_content(prompt)
-    response_text = response.text.strip()
-    print("Received response from Gemini", file=sys.stderr)
-
-    try:
-        flashcards_data = json.loads(response_text)
-        if not isinstance(flashcards_data, dict) or 'flashcards' not in flashcards_data:
-            raise ValueError("Invalid response format")
-        print(f"Successfully generated {len(flashcards_data['flashcards'])} flashcards", file=sys.stderr)
-        return flashcards_data
-    except json.JSONDecodeError:
-        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-        if json_match:
-            try:
-                flashcards_data = json.loads(json_match.group())
-                if not isinstance(flashcards_data, dict) or 'flashcards' not in flashcards_data:
-                    raise ValueError("Invalid response format")
-                print(f"Successfully generated {len(flashcards_data['flashcards'])} flashcards", file=sys.stderr)
-                return flashcards_data
-            except json.JSONDecodeError:
-                raise ValueError("Could not parse JSON from response")
-        raise ValueError("No JSON found in response")
+    print(f"Generating flashcards with Gemini in '{genre}' mode ({template.version})...", file=sys.stderr)
+    flashcards_data = generate_json_chunked(template.render, transcript, "flashcards", "flashcards_pdf")
+    print(f"Successfully generated {len(flashcards_data['flashcards'])} flashcards", file=sys.stderr)
+    return flashcards_data
 
 if __name__ == "__main__":
     try:
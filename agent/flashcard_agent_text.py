@@ -5,39 +5,15 @@ import json
 import sys
 import re
 from dotenv import load_dotenv
-import google.generativeai as genai
+from llm_client import generate_json_chunked
+from prompts import get_flashcard_template
+from metrics import timed
 
 # Load API key from .env
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
-GENRE_INSTRUCTIONS = {
-    "factual": """Write 4-6 flashcards that focus on direct, concrete facts, dates, names, and specific information.
-- Be clear, concise, and objective.
-- Avoid speculation or narrative.
-- Each card should deliver a standalone fact or data point.""",
-    "conceptual": """Write 4-6 flashcards that explain scientific, technical, or theoretical concepts in depth.
-- Focus on principles, mechanisms, relationships, and "how/why" explanations.
--Do NOT use bold text or headings (using "**Concept:**" or "**Explanation:**" is not allowed).
-- Use analogies or diagrams if helpful.
-- Cards should help the learner understand the underlying ideas, not just memorize facts.""",
-    "genz": """Write 4-6 flashcards in a Gen-Z style:
-- Use memes, slang, and pop culture references (but do NOT use emojis).
-- Make it funny, relatable, and surprising.
-- Each card should have a playful, energetic vibe and spark curiosity.
-- Think TikTok, not textbook.
-- Do NOT use emojis.""",
-    "story": """Write 4-6 flashcards that present the content as a vivid, engaging story or narrative.
-- Use storytelling techniques: characters, conflict, suspense, or a journey.
-- Each card should feel like a scene or plot point.
-- End with a cliffhanger or emotional beat (except the last card, which should conclude the story)."""
-}
-
-def get_genre_prompt(genre):
-    if genre not in GENRE_INSTRUCTIONS:
-        raise ValueError(f"Unknown genre: '{genre}'. Must be one of: {', '.join(GENRE_INSTRUCTIONS.keys())}")
-    return GENRE_INSTRUCTIONS[genre]
-
+@timed("post_filter")
 def filter_conceptual_flashcards(flashcards):
     filtered = []
     for card in flashcards:
@@ -58,61 +34,14 @@ def filter_conceptual_flashcards(flashcards):
 def generate_flashcards_from_text(transcript: str, genre: str) -> dict:
     """Generate flashcards from text using Gemini, with genre support."""
     genre = genre.strip().lower()
-    genre_instructions = get_genre_prompt(genre)
-
-    print(f"Configuring Gemini API...", file=sys.stderr)
-    genai.configure(api_key=GOOGLE_API_KEY)
-    model = genai.GenerativeModel('gemini-1.5-flash')
-
-    prompt = f"""
-IMPORTANT: You must write the flashcards in the **{genre.upper()}** style ONLY. Do NOT mix with other styles. Follow the instructions for this style exactly.
-
-GENRE INSTRUCTION:
-{genre_instructions}
-
----
-Input Text:
-{transcript}
-
----
-Return your output in the following JSON format. For each flashcard, you must provide a "title" that is a 2-3 word catchy phrase summarizing the card's content, and the "content" of the flashcard.
-{{
-  "flashcards": [
-    {{
-      "id": 1,
-      "title": "A Catchy Title",
-      "content": "..."
-    }},
-    ...
-  ]
-}}
-"""
-
-    print(f"Generating flashcards with Gemini in '{genre}' mode...", file=sys.stderr)
-    response = model.generate_content(prompt)
-    response_text = response.text.strip()
-    print("Received response from Gemini", file=sys.stderr)
-
-    try:
-        flashcards_data = json.loads(response_text)
-        if not isinstance(flashcards_data, dict) or 'flashcards' not in flashcards_data:
-            raise ValueError("Invalid response format")
-        if genre == "conceptual":
-            flashcards_data["flashcards"] = filter_conceptual_flashcards(flashcards_data["flashcards"])
-        print(f"Successfully generated {len(flashcards_data['flashcards'])} flashcards", file=sys.stderr)
-        return flashcards_data
-    except json.JSONDecodeError:
-        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-        if json_match:
-            try:
-                flashcards_data = json.loads(json_match.group())
-                if not isinstance(flashcards_data, dict) or 'flashcards' not in flashcards_data:
-                    raise ValueError("Invalid response format")
-                print(f"Successfully generated {len(flashcards_data['flashcards'])} flashcards", file=sys.stderr)
-                return flashcards_data
-            except json.JSONDecodeError:
-                raise ValueError("Could not parse JSON from response")
-        raise ValueError("No JSON found in response")
+    template = get_flashcard_template(genre, "text")
+
+    print(f"Generating flashcards with Gemini in '{genre}' mode ({template.version})...", file=sys.stderr)
+    flashcards_data = generate_json_chunked(template.render, transcript, "flashcards", "flashcards_text")
+    if genre == "conceptual":
+        flashcards_data["flashcards"] = filter_conceptual_flashcards(flashcards_data["flashcards"])
+    print(f"Successfully generated {len(flashcards_data['flashcards'])} flashcards", file=sys.stderr)
+    return flashcards_data
 
 if __name__ == "__main__":
     try:
@@ -2,17 +2,15 @@ import os
 import sys
 import json
 from dotenv import load_dotenv
-import google.generativeai as genai
+from llm_client import generate_text, stream_text
+from token_budget import trim_to_budget
+from retrieval import index_version, retrieve
+from semantic_cache import cache as answer_cache, content_key
 
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
-def answer_flashcard_question(content: str, question: str) -> str:
-    """Use Gemini to answer a user question about a flashcard's content."""
-    genai.configure(api_key=GOOGLE_API_KEY)
-    model = genai.GenerativeModel('gemini-1.5-flash')
-    prompt = f"""
-You are a helpful and multilingual AI tutor designed to assist students with flashcard content.
+TUTOR_INSTRUCTIONS = """You are a helpful and multilingual AI tutor designed to assist students with flashcard content.
 
 Your goals:
 - Answer the user's question based **only** on the flashcard content provided.
@@ -28,7 +26,19 @@ Important Rules:
 - If the question is **unrelated** to the content, respond:  
   "This question is not directly related to the content provided."
 - Be concise, educational, and student-friendly.
-- If a language is requested, **reply fully in that language and script**.
+- If a language is requested, **reply fully in that language and script**."""
+
+def build_ask_prompt(content: str, question: str, deck_id: str = None) -> str:
+    if deck_id:
+        # Ground the answer in the most relevant passages of the whole deck
+        passages = "\n\n".join(passage["text"] for passage in retrieve(deck_id, question))
+        if passages:
+            content = f"{content}\n\nRelated passages from the deck:\n{passages}" if content else passages
+    if not content:
+        raise ValueError("No content found for this question")
+    content = trim_to_budget(content, "flashcard_ask")
+    return f"""
+{TUTOR_INSTRUCTIONS}
 
 Flashcard Content:
 \"\"\"
@@ -43,8 +53,42 @@ User's Question or Request:
 Your Response:
 """
 
-    response = model.generate_content(prompt)
-    return response.text.strip()
+def _cache_key(content: str, deck_id: str = None) -> str:
+    # Answers grounded in a deck go stale once new passages are indexed for it
+    return content_key(content, deck_id, index_version(deck_id) if deck_id else 0)
+
+def answer_flashcard_question(content: str, question: str, deck_id: str = None) -> str:
+    """Use Gemini to answer a user question about a flashcard's content.
+
+    With a deck_id, the top passages retrieved from that deck's index are
+    added to the content. Rephrasings of a question already answered for the
+    same content (and language) are served from the semantic cache.
+    """
+    key = _cache_key(content, deck_id)
+    answer, vector = answer_cache.lookup(key, question)
+    if answer is not None:
+        return answer
+    answer = generate_text(build_ask_prompt(content, question, deck_id), "flashcard_ask")
+    answer_cache.store(key, question, answer, vector)
+    return answer
+
+def stream_flashcard_answer(content: str, question: str, deck_id: str = None):
+    """Like answer_flashcard_question, but yields the answer in pieces as it is generated."""
+    key = _cache_key(content, deck_id)
+    answer, vector = answer_cache.lookup(key, question)
+    if answer is not None:
+        yield answer
+        return
+    pieces = []
+    stream = stream_text(build_ask_prompt(content, question, deck_id), "flashcard_ask")
+    try:
+        for piece in stream:
+            pieces.append(piece)
+            yield piece
+    finally:
+        stream.close()
+    # Only complete answers are cached; a cancelled stream never gets here
+    answer_cache.store(key, question, "".join(pieces).strip(), vector)
 
 if __name__ == "__main__":
     try:
@@ -52,9 +96,10 @@ if __name__ == "__main__":
         data = json.loads(input_data)
         content = data.get("content", "")
         question = data.get("question", "")
-        if not content or not question:
+        deck_id = data.get("deckId")
+        if not (content or deck_id) or not question:
             raise ValueError("Missing content or question")
-        answer = answer_flashcard_question(content, question)
+        answer = answer_flashcard_question(content, question, deck_id)
         print(json.dumps({"response": answer}))
     except Exception as e:
         print(json.dumps({"error": str(e)}))
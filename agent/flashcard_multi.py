@@ -0,0 +1,101 @@
+import os
+import re
+import sys
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from llm_client import generate_json_chunked
+from prompts import get_flashcard_template, get_multi_genre_template, get_genre_prompt
+from flashcard_agent_text import filter_conceptual_flashcards
+
+# More genres than this per call make the output long enough to risk
+# truncation, so larger requests are split into a few calls.
+MAX_GENRES_PER_CALL = int(os.getenv("MAX_GENRES_PER_CALL", 3))
+
+# Token budget endpoint used for each kind of source
+SOURCE_ENDPOINTS = {
+    "transcript": "flashcards",
+    "text": "flashcards_text",
+    "pdf": "flashcards_pdf",
+    "image": "flashcards_image",
+}
+
+
+def parse_genres(value) -> list:
+    """Accept a list or a comma-separated string; lowercase, dedupe and validate."""
+    if isinstance(value, str):
+        value = value.split(",")
+    genres = []
+    for genre in value or []:
+        genre = str(genre).strip().lower()
+        if genre and genre not in genres:
+            get_genre_prompt(genre)  # raises ValueError for unknown genres
+            genres.append(genre)
+    if not genres:
+        raise ValueError("At least one genre is required")
+    return genres
+
+
+def _genre_key(value) -> str:
+    return re.sub(r"[^a-z0-9]", "", str(value).lower())
+
+
+def _generate_group(text: str, genres: list, source: str) -> dict:
+    """One generation for a group of genres; returns {genre: [cards]}."""
+    if len(genres) == 1:
+        template = get_flashcard_template(genres[0], source)
+        data = generate_json_chunked(template.render, text, "flashcards", SOURCE_ENDPOINTS[source])
+        return {genres[0]: data["flashcards"]}
+
+    template = get_multi_genre_template(genres, source)
+    print(f"Generating {len(genres)} decks in one pass ({template.version})...", file=sys.stderr)
+    data = generate_json_chunked(template.render, text, "flashcards", SOURCE_ENDPOINTS[source])
+    by_key = {_genre_key(genre): genre for genre in genres}
+    decks = {genre: [] for genre in genres}
+    for card in data["flashcards"]:
+        genre = by_key.get(_genre_key(card.pop("genre", "")))
+        if genre is not None:
+            decks[genre].append(card)
+    return decks
+
+
+def generate_multi_genre_flashcards(text: str, genres, source: str = "text") -> dict:
+    """Generate one deck per genre from a single ingested input.
+
+    Genres are written together in as few calls as possible (up to
+    MAX_GENRES_PER_CALL per call), so the input is sent once per group
+    instead of once per genre. A genre the model skipped is regenerated
+    on its own. Returns {"decks": {genre: {"flashcards": [...]}}}.
+    """
+    if source not in SOURCE_ENDPOINTS:
+        raise ValueError(f"Unknown source type: '{source}'. Must be one of: {', '.join(SOURCE_ENDPOINTS)}")
+    genres = parse_genres(genres)
+    groups = [genres[i:i + MAX_GENRES_PER_CALL] for i in range(0, len(genres), MAX_GENRES_PER_CALL)]
+
+    if len(groups) == 1:
+        results = [_generate_group(text, groups[0], source)]
+    else:
+        contexts = [contextvars.copy_context() for _ in groups]
+        with ThreadPoolExecutor(max_workers=len(groups)) as pool:
+            results = list(pool.map(
+                lambda pair: pair[0].run(_generate_group, text, pair[1], source),
+                zip(contexts, groups)
+            ))
+
+    decks = {}
+    for result in results:
+        decks.update(result)
+    for genre in genres:
+        if not decks.get(genre):
+            print(f"No '{genre}' cards in the combined output; generating that deck on its own", file=sys.stderr)
+            decks.update(_generate_group(text, [genre], source))
+
+    output = {}
+    for genre in genres:
+        cards = decks[genre]
+        for index, card in enumerate(cards, start=1):
+            card["id"] = index
+        if genre == "conceptual" and source == "text":
+            cards = filter_conceptual_flashcards(cards)
+        output[genre] = {"flashcards": cards}
+        print(f"Generated {len(cards)} '{genre}' flashcards", file=sys.stderr)
+    return {"decks": output}
@@ -0,0 +1,270 @@
+import os
+import sys
+import time
+import heapq
+import random
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from metrics import observe, increment
+
+LLM_RPM = int(os.getenv("LLM_RPM", 300))
+LLM_TPM = int(os.getenv("LLM_TPM", 1000000))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+LLM_MIN_CONCURRENCY = 1
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 4))
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Priority lanes: lower is served first
+LANE_INTERACTIVE = 0
+LANE_FLASHCARDS = 1
+LANE_BATCH = 2
+ENDPOINT_LANES = {
+    "flashcard_ask": LANE_INTERACTIVE,
+    "flashcard_ask_session": LANE_INTERACTIVE,
+    "quiz": LANE_BATCH,
+    "battle_quiz": LANE_BATCH,
+}
+LANE_NAMES = {LANE_INTERACTIVE: "interactive", LANE_FLASHCARDS: "flashcards", LANE_BATCH: "batch"}
+
+# Set per request (to a list) so routes can tell that a failure was upstream overload
+overload_signal = contextvars.ContextVar("overload_signal", default=None)
+
+
+class LLMOverloaded(RuntimeError):
+    """The upstream model kept throttling or failing after all retries."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def error_status(error: Exception):
+    """HTTP status of an upstream API error, if it carries one."""
+    code = getattr(error, "code", None)
+    return int(code) if isinstance(code, int) else None
+
+
+class TokenBucket:
+    """Refills at per_minute / 60 units per second up to capacity.
+
+    The default capacity is six seconds' worth, so a burst cannot spend a
+    whole minute's quota at once.
+
+    take() may drive the balance negative (e.g. when the real token count
+    turns out larger than the estimate); later callers then wait it off.
+    """
+
+    def __init__(self, per_minute: float, capacity: float = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or max(1.0, per_minute / 10)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.tokens -= amount
+
+
+class Governor:
+    """Shared gate in front of every upstream LLM call.
+
+    A call waits for its turn by lane (interactive before flashcards before
+    batch, FIFO within a lane), for a free concurrency slot, and for both
+    the requests-per-minute and tokens-per-minute buckets. The concurrency
+    limit adapts AIMD-style: +1 after a window of successes, halved on a
+    429 or 5xx, and throttled calls are retried with jittered exponential
+    backoff.
+    """
+
+    def __init__(self, rpm: int = LLM_RPM, tpm: int = LLM_TPM, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 max_retries: int = MAX_RETRIES):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.limit = float(max_concurrency)
+        self.active = 0
+        self._successes = 0
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+
+    def acquire(self, endpoint: str, tokens: int = 0):
+        """Wait for this call's turn and take a concurrency slot plus rate budget."""
+        lane = ENDPOINT_LANES.get(endpoint, LANE_FLASHCARDS)
+        ticket = (lane, next(self._sequence))
+        started = time.perf_counter()
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    if self._waiting[0] == ticket and self.active < int(self.limit):
+                        delay = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                        if not delay:
+                            break
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait(1.0)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.active += 1
+        observe(f"llm_queue_wait_{LANE_NAMES[lane]}", (time.perf_counter() - started) * 1000)
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, endpoint: str, tokens: int = 0):
+        """Hold one concurrency slot (and rate budget) for the duration of a call."""
+        self.acquire(endpoint, tokens)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def charge_tokens(self, amount: int):
+        """Debit tokens that were only known after the call (e.g. output tokens)."""
+        with self._cond:
+            self.tokens.take(amount)
+
+    def record_success(self):
+        with self._cond:
+            self._successes += 1
+            if self._successes >= int(self.limit):
+                self._successes = 0
+                if self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self._cond.notify_all()
+
+    def record_throttle(self, status: int):
+        with self._cond:
+            self._successes = 0
+            self.limit = max(LLM_MIN_CONCURRENCY, self.limit / 2)
+            # Pause new requests until the bucket refills a little
+            self.requests.tokens = min(self.requests.tokens, 0)
+        increment("llm_throttled")
+        print(f"Upstream returned {status}; concurrency limit now {int(self.limit)}", file=sys.stderr)
+
+    def backoff(self, attempt: int) -> float:
+        return min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+    def call(self, endpoint: str, tokens: int, fn, hold: bool = False):
+        """Run fn() inside a slot, retrying throttled/5xx failures with backoff.
+
+        With hold=True the slot stays taken after a successful call (for
+        streams that keep the connection busy); the caller must release().
+        """
+        for attempt in range(self.max_retries + 1):
+            self.acquire(endpoint, tokens)
+            try:
+                result = fn()
+            except Exception as e:
+                self.release()
+                status = error_status(e)
+                if status not in RETRYABLE_STATUS:
+                    raise
+                self.record_throttle(status)
+                if attempt == self.max_retries:
+                    retry_after = self.backoff(attempt)
+                    signal = overload_signal.get()
+                    if signal is not None:
+                        signal.append(retry_after)
+                    raise LLMOverloaded(f"Model is overloaded ({status}) after {attempt + 1} attempts: {e}",
+                                        retry_after) from e
+                increment("llm_retries")
+                time.sleep(self.backoff(attempt))
+                continue
+            if not hold:
+                self.release()
+            self.record_success()
+            return result
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "concurrency_limit": int(self.limit),
+                "active": self.active,
+                "waiting": len(self._waiting),
+                "request_tokens": round(self.requests.tokens, 1),
+                "llm_tokens": round(self.tokens.tokens),
+            }
+
+
+governor = Governor()
+
+
+def _simulate(calls: int, throttle_rate: float, rpm: int, latency_ms: float):
+    """Fire a burst of mixed-lane calls at a throttling fake Gemini and report."""
+    from concurrent.futures import ThreadPoolExecutor
+    from fake_gemini import start_fake_gemini, FakeGeminiConfig
+    import metrics
+
+    server = start_fake_gemini(FakeGeminiConfig(latency_ms=latency_ms, jitter_ms=latency_ms / 4,
+                                                throttle_rate=throttle_rate, rpm=rpm, seed=1))
+    os.environ["GEMINI_API_ENDPOINT"] = f"http://127.0.0.1:{server.server_address[1]}"
+    import llm_client
+    # Under "python governor.py" this file is __main__; use the instance llm_client uses
+    import governor as shared
+
+    endpoints = ["flashcard_ask", "flashcards_text", "quiz"]
+    outcomes = {name: [0, 0] for name in endpoints}
+
+    def one(index):
+        endpoint = endpoints[index % len(endpoints)]
+        started = time.perf_counter()
+        try:
+            llm_client.generate_text(f"Question {index}", endpoint)
+            outcomes[endpoint][0] += 1
+        except shared.LLMOverloaded:
+            outcomes[endpoint][1] += 1
+        return endpoint, time.perf_counter() - started
+
+    metrics.current_route.set("simulation")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=calls) as pool:
+        contexts = [contextvars.copy_context() for _ in range(calls)]
+        results = list(pool.map(lambda i: contexts[i].run(one, i), range(calls)))
+    elapsed = time.perf_counter() - started
+
+    print(f"{calls} calls in {elapsed:.1f}s against fake Gemini (throttle {throttle_rate:.0%}, quota {rpm or 'none'} rpm)")
+    for endpoint in endpoints:
+        latencies = sorted(seconds for name, seconds in results if name == endpoint)
+        lane = LANE_NAMES[ENDPOINT_LANES.get(endpoint, LANE_FLASHCARDS)]
+        print(f"  {lane:12s} ok {outcomes[endpoint][0]:4d}  overloaded {outcomes[endpoint][1]:4d}  "
+              f"p50 {latencies[len(latencies) // 2]:6.2f}s  max {latencies[-1]:6.2f}s")
+    snapshot = metrics.snapshot().get("simulation", {})
+    counters = snapshot.get("counters", {})
+    print(f"  throttled {counters.get('llm_throttled', 0)}, retries {counters.get('llm_retries', 0)}, "
+          f"final concurrency limit {shared.governor.stats()['concurrency_limit']}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Burst test of the LLM governor against fake_gemini.py")
+    parser.add_argument("--calls", type=int, default=60)
+    parser.add_argument("--throttle-rate", type=float, default=0.2)
+    parser.add_argument("--rpm", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    args = parser.parse_args()
+    _simulate(args.calls, args.throttle_rate, args.rpm, args.latency_ms)
@@ -0,0 +1,198 @@
+"""Micro-benchmark of the PDF highlighter, stage by stage.
+
+Runs score_page + render over a corpus of PDFs for one or more pipeline
+configurations and reports, per configuration, the time spent in each
+stage (line extraction, keywords, NER, summary, embeddings, TF-IDF,
+features, thresholds, render), wall time per page, peak RSS, and how
+often each line lands in the same tier as under the first configuration.
+With --profile a cProfile dump is written per configuration; open it with
+snakeviz or turn it into a flamegraph with flameprof.
+
+    python highlight_bench.py docs/                       # every *.pdf in docs/
+    python highlight_bench.py --synthetic 3               # generated sample PDFs
+    python highlight_bench.py docs/ --config default \\
+        --config summarizer=extractive --config similarity=batched,batch_size=64
+    python highlight_bench.py docs/ --profile .cache/profiles
+"""
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import argparse
+import tempfile
+import contextlib
+from datetime import datetime, timezone
+import fitz  # PyMuPDF
+import metrics
+from memory import PeakRSS, format_bytes
+from tests.fixtures import make_sample_pdfs
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "highlight_bench")
+STAGES = ["hl_extract_lines", "hl_keywords", "hl_ner", "hl_summary", "hl_embedding",
+          "hl_tfidf_similarity", "hl_features", "hl_thresholds", "hl_render"]
+PROFILE_TOP = 15
+
+
+def parse_config(spec: str, defaults: dict) -> dict:
+    """"key=value,key=value" overrides of HIGHLIGHT_CONFIG ("default" for none)."""
+    config = dict(defaults)
+    if spec in ("", "default"):
+        return config
+    for pair in spec.split(","):
+        key, _, value = pair.partition("=")
+        key = key.strip()
+        if key not in defaults:
+            raise ValueError(f"Unknown highlighter setting {key!r}; expected one of {', '.join(defaults)}")
+        config[key] = type(defaults[key])(value.strip())
+    return config
+
+
+def _tiers(scored_page) -> list:
+    medium, high = scored_page["medium_threshold"], scored_page["high_threshold"]
+    return ["high" if score >= high else "medium" if score >= medium else "low"
+            for _, _, score in scored_page["scored_lines"]]
+
+
+def run_config(label: str, config: dict, pdf_paths: list, max_pages: int, profile_dir: str = None,
+               verbose: bool = False) -> dict:
+    """Highlight every page of the corpus under one configuration."""
+    import highlighter
+
+    route = f"highlight_bench:{label}"
+    token = metrics.current_route.set(route)
+    profiler = cProfile.Profile() if profile_dir else None
+    tiers = {}
+    pages = 0
+    quiet = contextlib.nullcontext() if verbose else highlighter.progress_to(None)
+    try:
+        with quiet, PeakRSS() as rss:
+            started = time.perf_counter()
+            if profiler:
+                profiler.enable()
+            for path in pdf_paths:
+                with fitz.open(path) as doc:
+                    for number in range(min(doc.page_count, max_pages)):
+                        scored_page = highlighter.score_page(doc[number], config)
+                        if scored_page is None:
+                            continue
+                        with metrics.span("hl_render"):
+                            highlighter.render_highlights(path, number, scored_page, config["render_dpi"])
+                        tiers[(path, number)] = _tiers(scored_page)
+                        pages += 1
+            if profiler:
+                profiler.disable()
+            elapsed = time.perf_counter() - started
+    finally:
+        metrics.current_route.reset(token)
+
+    stages = metrics.snapshot().get(route, {}).get("stages", {})
+    result = {
+        "label": label,
+        "config": config,
+        "pages": pages,
+        "wall_ms": round(elapsed * 1000, 1),
+        "ms_per_page": round(elapsed * 1000 / pages, 1) if pages else 0.0,
+        "peak_rss_bytes": rss.peak,
+        "rss_growth_bytes": rss.growth,
+        "stages_ms": {stage: round(stages[stage]["count"] * stages[stage]["mean_ms"], 1)
+                      for stage in STAGES if stage in stages},
+    }
+    if profiler:
+        os.makedirs(profile_dir, exist_ok=True)
+        result["profile"] = os.path.join(profile_dir, f"{label.replace('/', '_').replace(',', '_')}.prof")
+        profiler.dump_stats(result["profile"])
+    return result, tiers
+
+
+def tier_agreement(reference: dict, tiers: dict) -> float:
+    """Fraction of lines assigned the same tier as in the reference run."""
+    same = total = 0
+    for key, reference_tiers in reference.items():
+        other = tiers.get(key)
+        if other is None or len(other) != len(reference_tiers):
+            continue
+        same += sum(a == b for a, b in zip(reference_tiers, other))
+        total += len(reference_tiers)
+    return round(same / total, 3) if total else 0.0
+
+
+def print_report(results: list):
+    header = f"{'stage':22s}" + "".join(f"{result['label'][:18]:>20s}" for result in results)
+    print(header)
+    print("-" * len(header))
+    for stage in STAGES:
+        print(f"{stage:22s}" + "".join(f"{result['stages_ms'].get(stage, 0.0):18.1f}ms" for result in results))
+    print("-" * len(header))
+    rows = [
+        ("pages", lambda r: f"{r['pages']:20d}"),
+        ("ms / page", lambda r: f"{r['ms_per_page']:18.1f}ms"),
+        ("peak RSS", lambda r: f"{format_bytes(r['peak_rss_bytes']):>20s}"),
+        ("RSS growth", lambda r: f"{format_bytes(r['rss_growth_bytes']):>20s}"),
+        ("tier agreement", lambda r: f"{r['tier_agreement']:20.3f}"),
+    ]
+    for name, cell in rows:
+        print(f"{name:22s}" + "".join(cell(result) for result in results))
+
+    for result in results:
+        if "profile" in result:
+            print(f"\n{result['label']}: top {PROFILE_TOP} by cumulative time ({result['profile']})")
+            pstats.Stats(result["profile"]).sort_stats("cumulative").print_stats(PROFILE_TOP)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the PDF highlighter stage by stage")
+    parser.add_argument("paths", nargs="*", help="PDF files or directories of PDFs")
+    parser.add_argument("--synthetic", type=int, default=0, help="also generate this many sample PDFs")
+    parser.add_argument("--config", action="append", default=[],
+                        help='configuration to compare, e.g. "summarizer=extractive,num_beams=2" (repeatable)')
+    parser.add_argument("--pages", type=int, default=1, help="max pages per PDF")
+    parser.add_argument("--warmup", action="store_true", help="score the first page once before timing (model loads)")
+    parser.add_argument("--profile", metavar="DIR", help="write a cProfile dump per configuration to DIR")
+    parser.add_argument("--verbose", action="store_true", help="show the highlighter's own output")
+    args = parser.parse_args()
+
+    import highlighter
+
+    pdf_paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            pdf_paths.extend(sorted(os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith(".pdf")))
+        else:
+            pdf_paths.append(path)
+    workdir = tempfile.TemporaryDirectory(prefix="mindsnap_hlbench_")
+    if args.synthetic:
+        pdf_paths.extend(make_sample_pdfs(workdir.name, args.synthetic))
+    if not pdf_paths:
+        parser.error("no PDFs given; pass paths or --synthetic N")
+
+    specs = args.config or ["default"]
+    configs = [(spec, parse_config(spec, highlighter.HIGHLIGHT_CONFIG)) for spec in specs]
+
+    if args.warmup:
+        with fitz.open(pdf_paths[0]) as doc, highlighter.progress_to(None):
+            highlighter.score_page(doc[0], configs[0][1])
+
+    results = []
+    reference = None
+    for label, config in configs:
+        print(f"Running {label} over {len(pdf_paths)} PDF(s)...", file=sys.stderr)
+        result, tiers = run_config(label, config, pdf_paths, args.pages, args.profile, args.verbose)
+        reference = tiers if reference is None else reference
+        result["tier_agreement"] = tier_agreement(reference, tiers)
+        results.append(result)
+    workdir.cleanup()
+
+    print_report(results)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    output = os.path.join(RESULTS_DIR, f"{stamp}.json")
+    with open(output, "w") as handle:
+        json.dump({"created": stamp, "pdfs": pdf_paths, "results": results}, handle, indent=2)
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
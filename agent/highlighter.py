@@ -8,13 +8,23 @@ from nltk.corpus import stopwords
 #from nltk.chunk import tree2conlltags
 from pdf2image import convert_from_path
 from PIL import Image, ImageDraw
-from transformers import BartTokenizer, BartForConditionalGeneration
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import util
+from embeddings import get_sentence_model
+from inference import load_model
+from entities import extract_entities, document_entities
+from calibration import ScoreCalibration, get_calibration
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 from collections import Counter
 import statistics
 import sys
+import os
+import json
+import contextlib
+import contextvars
+from metrics import span
+from memory import PeakRSS, format_bytes
+from pdf_stream import WINDOW_PAGES, MEMORY_CEILING_BYTES, iter_pdf_pages
 
 nltk.download("punkt")
 nltk.download("averaged_perceptron_tagger")
@@ -22,6 +32,37 @@ nltk.download("stopwords")
 nltk.download("maxent_ne_chunker")
 nltk.download("words")
 
+# Pipeline knobs; the highlight benchmark overrides these per configuration.
+HIGHLIGHT_CONFIG = {
+    "summarizer": os.getenv("HIGHLIGHT_SUMMARIZER", "bart"),        # "bart" or "extractive"
+    "num_beams": int(os.getenv("HIGHLIGHT_NUM_BEAMS", 6)),
+    "similarity": os.getenv("HIGHLIGHT_SIMILARITY", "per_line"),    # "per_line" or "batched"
+    "batch_size": int(os.getenv("HIGHLIGHT_BATCH_SIZE", 32)),
+    "render_dpi": int(os.getenv("HIGHLIGHT_RENDER_DPI", 200)),
+    "backend": os.getenv("HIGHLIGHT_BACKEND", "fp32"),              # "fp32", "int8" or "onnx"
+    "ner": os.getenv("HIGHLIGHT_NER", "fast"),                      # "fast", "fast+nltk" or "nltk"
+    "thresholds": os.getenv("HIGHLIGHT_THRESHOLDS", "page"),        # "page", "calibrated" or "document"
+}
+
+# Where progress messages go in this context: None means stdout (the CLI),
+# False silences them. Set per request with progress_to() rather than
+# swapping sys.stdout, which would affect every thread.
+_progress_stream = contextvars.ContextVar("highlight_progress", default=None)
+
+def log(message=""):
+    stream = _progress_stream.get()
+    if stream is not False:
+        print(message, file=stream or sys.stdout)
+
+@contextlib.contextmanager
+def progress_to(stream):
+    """Send progress messages to stream (None silences them) for this context only"""
+    token = _progress_stream.set(False if stream is None else stream)
+    try:
+        yield
+    finally:
+        _progress_stream.reset(token)
+
 def clean_text(text):
     """Enhanced text cleaning with better preprocessing"""
     # Remove extra whitespace and normalize
@@ -32,35 +73,36 @@ def clean_text(text):
     return text
 
 def extract_proper_nouns_and_entities(text):
-    """Extract proper nouns and named entities from text"""
+    """Extract proper nouns and named entities from text with NLTK (slow; see entities.py)"""
     try:
         # Tokenize and POS tag
         tokens = word_tokenize(text)
         pos_tags = pos_tag(tokens)
-        
-        # Extract proper nouns (NNP, NNPS)
-        proper_nouns = [word for word, tag in pos_tags if tag in ['NNP', 'NNPS']]
-        
-        # Extract named entities using NLTK's NER
-        entities = []
-        try:
-            chunks = ne_chunk(pos_tags, binary=False)
-            for chunk in chunks:
-                if hasattr(chunk, 'label'):
-                    entity = ' '.join([token for token, pos in chunk.leaves()])
-                    entities.append(entity)
-        except:
-            pass
-        
-        # Extract capitalized words (potential proper nouns missed by POS tagger)
-        capitalized_words = [word for word in tokens if word[0].isupper() and len(word) > 2 and word.isalpha()]
-        
-        # Combine and deduplicate
-        all_proper_terms = list(set(proper_nouns + entities + capitalized_words))
-        
-        return all_proper_terms
-    except:
+    except LookupError as e:
+        print(f"NLTK tagger unavailable: {e}", file=sys.stderr)
         return []
+    
+    # Extract proper nouns (NNP, NNPS)
+    proper_nouns = [word for word, tag in pos_tags if tag in ['NNP', 'NNPS']]
+    
+    # Extract named entities using NLTK's NER
+    entities = []
+    try:
+        chunks = ne_chunk(pos_tags, binary=False)
+        for chunk in chunks:
+            if hasattr(chunk, 'label'):
+                entity = ' '.join([token for token, pos in chunk.leaves()])
+                entities.append(entity)
+    except LookupError as e:
+        print(f"NLTK chunker unavailable: {e}", file=sys.stderr)
+    
+    # Extract capitalized words (potential proper nouns missed by POS tagger)
+    capitalized_words = [word for word in tokens if word[0].isupper() and len(word) > 2 and word.isalpha()]
+    
+    # Combine and deduplicate
+    all_proper_terms = list(set(proper_nouns + entities + capitalized_words))
+    
+    return all_proper_terms
 
 def extract_topic_keywords(full_text, top_n=20):
     """Extract topic-specific keywords using TF-IDF"""
@@ -90,11 +132,16 @@ def extract_topic_keywords(full_text, top_n=20):
         topic_keywords = [feature_names[i] for i in top_indices if mean_scores[i] > 0.1]
         
         return topic_keywords
-    except:
+    except ValueError:
+        # Too few distinct terms left after min_df/max_df filtering
         return []
 
-def calculate_text_features(text, proper_nouns_global, topic_keywords_global):
-    """Calculate additional text features for importance scoring"""
+def calculate_text_features(text, proper_nouns_global, topic_keywords_global, line_proper_nouns=None):
+    """Calculate additional text features for importance scoring
+
+    line_proper_nouns are the line's entities when already extracted for
+    the whole document (entities.py); otherwise NLTK tags the line.
+    """
     words = word_tokenize(text.lower())
     original_words = word_tokenize(text)  # Keep original case
     stop_words = set(stopwords.words('english'))
@@ -119,7 +166,8 @@ def calculate_text_features(text, proper_nouns_global, topic_keywords_global):
     has_dates = bool(re.search(r'\b\d{4}\b|\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b', text))
     
     # NEW: Check for proper nouns and topic keywords in this line
-    line_proper_nouns = extract_proper_nouns_and_entities(text)
+    if line_proper_nouns is None:
+        line_proper_nouns = extract_proper_nouns_and_entities(text)
     
     # Count matches with global proper nouns (case-insensitive)
     proper_noun_matches = 0
@@ -188,11 +236,29 @@ def extract_lines_with_boxes(page):
     
     return lines_with_boxes
 
-def generate_enhanced_summary(text, max_tokens=150):
+def get_summarizer(backend="fp32"):
+    """Load the BART tokenizer and model once per process and backend"""
+    return load_model("summarizer", backend)
+
+def extractive_summary(text, sentence_count=3):
+    """Pick the sentences with the highest TF-IDF weight, kept in document order"""
+    sentences = sent_tokenize(text)
+    if len(sentences) <= sentence_count:
+        return ' '.join(sentences)
+    try:
+        tfidf_matrix = TfidfVectorizer(stop_words='english').fit_transform(sentences)
+    except ValueError:
+        return ' '.join(sentences[:sentence_count])
+    weights = np.asarray(tfidf_matrix.sum(axis=1)).ravel()
+    top = sorted(np.argsort(weights)[::-1][:sentence_count])
+    return ' '.join(sentences[i] for i in top)
+
+def generate_enhanced_summary(text, max_tokens=150, num_beams=6, backend="bart", inference_backend="fp32"):
     """Enhanced summary generation with better parameters"""
+    if backend == "extractive":
+        return extractive_summary(text)
     try:
-        tokenizer = BartTokenizer.from_pretrained("facebook/bart-large-cnn")
-        model = BartForConditionalGeneration.from_pretrained("facebook/bart-large-cnn")
+        tokenizer, model = get_summarizer(inference_backend)
         
         # Better tokenization with overlap handling
         inputs = tokenizer(
@@ -208,7 +274,7 @@ def generate_enhanced_summary(text, max_tokens=150):
             inputs["input_ids"],
             max_length=max_tokens,
             min_length=30,  # Ensure minimum summary length
-            num_beams=6,    # More beams for better quality
+            num_beams=num_beams,    # More beams for better quality
             length_penalty=1.2,  # Balanced length penalty
             early_stopping=True,
             no_repeat_ngram_size=3,  # Avoid repetition
@@ -218,7 +284,7 @@ def generate_enhanced_summary(text, max_tokens=150):
         summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
         return summary
     except Exception as e:
-        print(f"Summary generation error: {e}")
+        log(f"Summary generation error: {e}")
         # Fallback to extractive summary
         sentences = sent_tokenize(text)
         return '. '.join(sentences[:3]) + '.'
@@ -231,26 +297,29 @@ def calculate_multi_similarity_score(line_text, summary_sentences, sentence_mode
     if not line_sentences:
         return 0.0
         
-    line_embeddings = sentence_model.encode([clean_text(s) for s in line_sentences], convert_to_tensor=True)
-    summary_embeddings = sentence_model.encode(summary_sentences, convert_to_tensor=True)
-    
-    # Get max similarity across all sentence pairs
-    cosine_scores = util.cos_sim(line_embeddings, summary_embeddings)
-    semantic_score = float(cosine_scores.max())
+    with span("hl_embedding"):
+        line_embeddings = sentence_model.encode([clean_text(s) for s in line_sentences], convert_to_tensor=True)
+        summary_embeddings = sentence_model.encode(summary_sentences, convert_to_tensor=True)
+        
+        # Get max similarity across all sentence pairs
+        cosine_scores = util.cos_sim(line_embeddings, summary_embeddings)
+        semantic_score = float(cosine_scores.max())
     
     # Method 2: TF-IDF similarity for keyword matching
     try:
-        tfidf_vectorizer = TfidfVectorizer(stop_words='english', max_features=1000)
-        all_texts = [line_text] + summary_sentences
-        tfidf_matrix = tfidf_vectorizer.fit_transform(all_texts)
-        
-        # Calculate similarity between line and each summary sentence
-        line_tfidf = tfidf_matrix[0]
-        summary_tfidf = tfidf_matrix[1:]
-        
-        tfidf_similarities = cosine_similarity(line_tfidf, summary_tfidf)[0]
-        tfidf_score = float(np.max(tfidf_similarities))
-    except:
+        with span("hl_tfidf_similarity"):
+            tfidf_vectorizer = TfidfVectorizer(stop_words='english', max_features=1000)
+            all_texts = [line_text] + summary_sentences
+            tfidf_matrix = tfidf_vectorizer.fit_transform(all_texts)
+            
+            # Calculate similarity between line and each summary sentence
+            line_tfidf = tfidf_matrix[0]
+            summary_tfidf = tfidf_matrix[1:]
+            
+            tfidf_similarities = cosine_similarity(line_tfidf, summary_tfidf)[0]
+            tfidf_score = float(np.max(tfidf_similarities))
+    except ValueError:
+        # Only stop words on the line or in the summary
         tfidf_score = 0.0
     
     # Method 3: Keyword overlap score
@@ -278,6 +347,59 @@ def calculate_multi_similarity_score(line_text, summary_sentences, sentence_mode
     
     return combined_score
 
+def calculate_batched_similarity_scores(line_texts, summary_sentences, sentence_model, batch_size=32):
+    """Score all lines at once: one embedding pass in batches and one shared TF-IDF fit.
+
+    Same weighting as calculate_multi_similarity_score, but the summary is
+    encoded once and TF-IDF weights come from the whole page, so scores
+    differ slightly from the per-line path.
+    """
+    if not line_texts:
+        return []
+    line_sentences = [sent_tokenize(line_text) for line_text in line_texts]
+    flat = [clean_text(s) for sentences in line_sentences for s in sentences]
+
+    with span("hl_embedding"):
+        semantic_scores = [0.0] * len(line_texts)
+        if flat:
+            line_embeddings = sentence_model.encode(flat, batch_size=batch_size, convert_to_tensor=True)
+            summary_embeddings = sentence_model.encode(summary_sentences, batch_size=batch_size, convert_to_tensor=True)
+            cosine_scores = util.cos_sim(line_embeddings, summary_embeddings)
+            best_per_sentence = [float(row.max()) for row in cosine_scores]
+            offset = 0
+            for idx, sentences in enumerate(line_sentences):
+                if sentences:
+                    semantic_scores[idx] = max(best_per_sentence[offset:offset + len(sentences)])
+                offset += len(sentences)
+
+    with span("hl_tfidf_similarity"):
+        try:
+            tfidf_matrix = TfidfVectorizer(stop_words='english', max_features=1000).fit_transform(
+                list(line_texts) + list(summary_sentences)
+            )
+            tfidf_scores = cosine_similarity(tfidf_matrix[:len(line_texts)], tfidf_matrix[len(line_texts):]).max(axis=1)
+        except ValueError:
+            tfidf_scores = np.zeros(len(line_texts))
+
+    stop_words = set(stopwords.words('english'))
+    summary_words = set()
+    for sent in summary_sentences:
+        summary_words.update(word_tokenize(sent.lower()))
+    summary_words -= stop_words
+
+    scores = []
+    for idx, line_text in enumerate(line_texts):
+        if not line_sentences[idx]:
+            scores.append(0.0)
+            continue
+        line_words = set(word_tokenize(line_text.lower())) - stop_words
+        if line_words and summary_words:
+            overlap_score = len(line_words & summary_words) / len(line_words | summary_words)
+        else:
+            overlap_score = 0.0
+        scores.append(0.5 * semantic_scores[idx] + 0.3 * float(tfidf_scores[idx]) + 0.2 * overlap_score)
+    return scores
+
 def calculate_adaptive_thresholds(scores, features_list):
     """Calculate adaptive thresholds based on score distribution and content features"""
     scores = np.array(scores)
@@ -437,6 +559,23 @@ def calculate_content_boost(features):
         
     return boost
 
+def apply_proper_noun_rule(score, features, medium_threshold):
+    """Lift one line with proper nouns/topic keywords to medium; returns (score, adjusted, blocked)"""
+    # If line has proper nouns or topic keywords but score is below medium threshold
+    if (features['has_proper_nouns'] or features['has_topic_keywords']) and score < medium_threshold:
+        # Check if it's irrelevant content - if so, don't boost
+        if features['is_irrelevant']:
+            # Keep original low score for irrelevant content
+            return score, False, True
+        # Boost to at least medium threshold + small margin
+        score = max(score, medium_threshold + 0.05)
+        
+        # Additional boost if it has both proper nouns AND topic keywords
+        if features['has_proper_nouns'] and features['has_topic_keywords']:
+            score += 0.05
+        return score, True, False
+    return score, False, False
+
 def enforce_proper_noun_rule(scored_lines, features_list, medium_threshold):
     """Enforce rule: lines with proper nouns/topic keywords cannot be low importance"""
     adjusted_lines = []
@@ -444,29 +583,301 @@ def enforce_proper_noun_rule(scored_lines, features_list, medium_threshold):
     irrelevant_blocked = 0
     
     for i, (text, bbox, score) in enumerate(scored_lines):
-        features = features_list[i]
-        original_score = score
-        
-        # If line has proper nouns or topic keywords but score is below medium threshold
-        if (features['has_proper_nouns'] or features['has_topic_keywords']) and score < medium_threshold:
-            # Check if it's irrelevant content - if so, don't boost
-            if features['is_irrelevant']:
-                irrelevant_blocked += 1
-                # Keep original low score for irrelevant content
-            else:
-                # Boost to at least medium threshold + small margin
-                score = max(score, medium_threshold + 0.05)
-                adjustments_made += 1
-                
-                # Additional boost if it has both proper nouns AND topic keywords
-                if features['has_proper_nouns'] and features['has_topic_keywords']:
-                    score += 0.05
-        
+        score, adjusted, blocked = apply_proper_noun_rule(score, features_list[i], medium_threshold)
+        adjustments_made += adjusted
+        irrelevant_blocked += blocked
         adjusted_lines.append((text, bbox, score))
     
     return adjusted_lines, adjustments_made, irrelevant_blocked
 
+def score_tier(score, medium_threshold, high_threshold):
+    return "high" if score >= high_threshold else "medium" if score >= medium_threshold else "low"
+
+def score_page(page, config=None, calibration=None, on_line=None):
+    """Score every text line of a PDF page; returns None when there is too little text.
+
+    The result holds the scored lines (text, bbox, score), the raw scores
+    before the proper noun rule, their features, the thresholds and the
+    summary/keywords used to score them.
+
+    With a ready ScoreCalibration (passed in, or the stored one when
+    config["thresholds"] is "calibrated") the thresholds are known up
+    front, so each line is tiered as soon as it is scored and reported to
+    on_line(index, text, bbox, score, tier). Otherwise thresholds come from
+    this page's own scores.
+    """
+    config = {**HIGHLIGHT_CONFIG, **(config or {})}
+    if calibration is None and config["thresholds"] == "calibrated":
+        calibration = get_calibration()
+    fixed_thresholds = calibration.thresholds() if calibration is not None and calibration.ready else None
+    with span("hl_extract_lines"):
+        lines_with_boxes = extract_lines_with_boxes(page)
+    
+    if not lines_with_boxes:
+        log("No text lines found in PDF")
+        return None
+        
+    log(f"Extracted {len(lines_with_boxes)} text lines")
+    
+    # Clean and prepare text
+    line_texts = [clean_text(line) for line, _ in lines_with_boxes]
+    full_text = " ".join(line_texts)
+    
+    if len(full_text) < 100:
+        log("Insufficient text content for analysis")
+        return None
+
+    log("Extracting proper nouns and topic keywords...")
+    # Extract proper nouns and entities from the entire document
+    with span("hl_ner"):
+        if config["ner"] == "nltk":
+            entity_spans = None
+            proper_nouns_global = extract_proper_nouns_and_entities(full_text)
+        else:
+            # One pass over every line; per-line entities come from the same spans
+            entity_spans = extract_entities(
+                [line_text for line_text, _ in lines_with_boxes], tagger="nltk" if config["ner"] == "fast+nltk" else None
+            )
+            proper_nouns_global = document_entities(entity_spans)
+    with span("hl_keywords"):
+        topic_keywords_global = extract_topic_keywords(full_text)
+    
+    log(f"Found {len(proper_nouns_global)} proper nouns/entities")
+    log(f"Found {len(topic_keywords_global)} topic keywords")
+    
+    # Show some examples
+    if proper_nouns_global:
+        log(f"Proper nouns sample: {', '.join(proper_nouns_global[:5])}")
+    if topic_keywords_global:
+        log(f"Topic keywords sample: {', '.join(topic_keywords_global[:5])}")
+
+    log("Generating enhanced summary...")
+    with span("hl_summary"):
+        summary = generate_enhanced_summary(
+            full_text, num_beams=config["num_beams"], backend=config["summarizer"], inference_backend=config["backend"]
+        )
+    summary_sentences = sent_tokenize(summary)
+    log(f"Summary ready: {len(summary_sentences)} sentences")
+    log(f"Summary preview: {summary[:100]}...")
+
+    log("Computing multi-modal similarity scores...")
+    sentence_model = get_sentence_model(config["backend"])
+    if config["similarity"] == "batched":
+        similarity_scores = calculate_batched_similarity_scores(
+            [line_text for line_text, _ in lines_with_boxes], summary_sentences, sentence_model, config["batch_size"]
+        )
+    
+    scored_lines = []
+    features_list = []
+    raw_scores = []
+    adjustments_made = irrelevant_blocked = 0
+    
+    for idx, (line_text, bbox) in enumerate(lines_with_boxes):
+        # Calculate similarity score
+        if config["similarity"] == "batched":
+            similarity_score = similarity_scores[idx]
+        else:
+            similarity_score = calculate_multi_similarity_score(
+                line_text, summary_sentences, sentence_model
+            )
+        
+        # Calculate content features (now includes proper noun analysis)
+        with span("hl_features"):
+            line_proper_nouns = None if entity_spans is None else [span_text for _, _, span_text, _ in entity_spans[idx]]
+            features = calculate_text_features(line_text, proper_nouns_global, topic_keywords_global, line_proper_nouns)
+        features_list.append(features)
+        
+        # Apply content-based boost (now includes proper noun boost)
+        content_boost = calculate_content_boost(features)
+        final_score = similarity_score + content_boost
+        raw_scores.append(final_score)
+
+        if fixed_thresholds is not None:
+            # Calibrated thresholds: the proper noun rule and the tier apply right away
+            final_score, adjusted, blocked = apply_proper_noun_rule(final_score, features, fixed_thresholds[0])
+            adjustments_made += adjusted
+            irrelevant_blocked += blocked
+            if on_line is not None:
+                on_line(idx, line_text, bbox, final_score, score_tier(final_score, *fixed_thresholds))
+        
+        scored_lines.append((line_text, bbox, final_score))
+        
+        if idx % 10 == 0:
+            log(f"  Processed {idx+1}/{len(lines_with_boxes)} lines...")
+
+    if fixed_thresholds is not None:
+        medium_threshold, high_threshold = fixed_thresholds
+        log(f"\nCalibrated Thresholds ({calibration.count} lines):")
+        log(f"  High importance (Green): >= {high_threshold:.3f}")
+        log(f"  Medium importance (Yellow): >= {medium_threshold:.3f}")
+        log(f"  Low importance: < {medium_threshold:.3f}")
+    else:
+        # Calculate adaptive thresholds
+        with span("hl_thresholds"):
+            medium_threshold, high_threshold = calculate_adaptive_thresholds(raw_scores, features_list)
+        
+        log(f"\nInitial Adaptive Thresholds:")
+        log(f"  High importance (Green): >= {high_threshold:.3f}")
+        log(f"  Medium importance (Yellow): >= {medium_threshold:.3f}")
+        log(f"  Low importance: < {medium_threshold:.3f}")
+
+        # NEW: Enforce proper noun rule with irrelevance filtering
+        log("Enforcing proper noun/topic keyword rule with irrelevance filtering...")
+        with span("hl_thresholds"):
+            scored_lines, adjustments_made, irrelevant_blocked = enforce_proper_noun_rule(scored_lines, features_list, medium_threshold)
+        if on_line is not None:
+            for idx, (line_text, bbox, score) in enumerate(scored_lines):
+                on_line(idx, line_text, bbox, score, score_tier(score, medium_threshold, high_threshold))
+    log(f"Adjusted {adjustments_made} lines with proper nouns/topic keywords")
+    log(f"Blocked {irrelevant_blocked} irrelevant lines from higher importance")
+
+    return {
+        "scored_lines": scored_lines,
+        "raw_scores": raw_scores,
+        "features_list": features_list,
+        "medium_threshold": medium_threshold,
+        "high_threshold": high_threshold,
+        "summary": summary,
+        "proper_nouns": proper_nouns_global,
+        "entity_spans": entity_spans,
+        "topic_keywords": topic_keywords_global,
+    }
+
+def render_highlights(pdf_path, page_number, scored_page, dpi=200, page=None):
+    """Rasterize a page and paint each scored line with its importance colour
+
+    Pass the already-open page to rasterize it with PyMuPDF instead of
+    having pdf2image re-open the whole document.
+    """
+    scored_lines = scored_page["scored_lines"]
+    features_list = scored_page["features_list"]
+    medium_threshold = scored_page["medium_threshold"]
+    high_threshold = scored_page["high_threshold"]
+
+    if page is not None:
+        pixmap = page.get_pixmap(dpi=dpi)
+        img = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+        del pixmap
+    else:
+        img = convert_from_path(pdf_path, dpi=dpi, first_page=page_number + 1, last_page=page_number + 1)[0]
+    draw = ImageDraw.Draw(img, "RGBA")
+    scale = dpi / 72
+
+    highlight_counts = {'high': 0, 'medium': 0, 'low': 0}
+    proper_noun_highlights = {'high': 0, 'medium': 0}
+    irrelevant_count = 0
+    
+    for i, (text, bbox, score) in enumerate(scored_lines):
+        features = features_list[i]
+        x0, y0, x1, y1 = bbox
+        rect = [x0 * scale, y0 * scale, x1 * scale, y1 * scale]
+        
+        # Track irrelevant content
+        if features['is_irrelevant']:
+            irrelevant_count += 1
+        
+        if score >= high_threshold:
+            draw.rectangle(rect, fill=(0, 255, 0, 100))      # Green (high importance)
+            highlight_counts['high'] += 1
+            if features['has_proper_nouns'] or features['has_topic_keywords']:
+                proper_noun_highlights['high'] += 1
+        elif score >= medium_threshold:
+            draw.rectangle(rect, fill=(255, 255, 0, 80))     # Yellow (medium importance)
+            highlight_counts['medium'] += 1
+            if features['has_proper_nouns'] or features['has_topic_keywords']:
+                proper_noun_highlights['medium'] += 1
+        else:
+            highlight_counts['low'] += 1
+            # Optional: light red tint for irrelevant content
+            if features['is_irrelevant']:
+                draw.rectangle(rect, fill=(255, 200, 200, 40))  # Light red for irrelevant
+
+    return img, highlight_counts, proper_noun_highlights, irrelevant_count
+
+def highlight_pdf(pdf_path, output_pdf, config=None, window=None, ceiling=None):
+    """Highlight every page of a PDF with bounded memory.
+
+    Pages are scored and rendered one at a time through pdf_stream, each
+    highlighted page is appended to output_pdf on disk as soon as it is
+    drawn, and the scored lines are spilled to a JSONL file next to it
+    (one record per page) instead of being kept for the whole document.
+    With config["thresholds"] set to "document", thresholds come from the
+    stored calibration plus the pages already scored, so tiers stay
+    consistent across the document. Returns totals for the run.
+    """
+    config = {**HIGHLIGHT_CONFIG, **(config or {})}
+    calibration = None
+    if config["thresholds"] in ("calibrated", "document"):
+        stored = get_calibration()
+        calibration = stored.copy() if stored is not None else None
+    if config["thresholds"] == "document" and calibration is None:
+        calibration = ScoreCalibration()
+    window = window or WINDOW_PAGES
+    ceiling = MEMORY_CEILING_BYTES if ceiling is None else ceiling
+    lines_path = os.path.splitext(output_pdf)[0] + ".lines.jsonl"
+    stats = {"pages": 0, "skipped_pages": 0, "high": 0, "medium": 0, "low": 0, "irrelevant": 0,
+             "linesPath": lines_path, "outputPdf": output_pdf}
+    if os.path.exists(output_pdf):
+        os.remove(output_pdf)
+
+    with PeakRSS() as rss, open(lines_path, "w") as lines_file:
+        for page_number, page in iter_pdf_pages(pdf_path, window, ceiling):
+            log(f"Page {page_number + 1}...")
+            scored_page = score_page(page, config, calibration)
+            if scored_page is None:
+                stats["skipped_pages"] += 1
+                continue
+            if config["thresholds"] == "document":
+                calibration.update(scored_page["raw_scores"])
+            with span("hl_render"):
+                img, highlight_counts, _, irrelevant_count = render_highlights(
+                    pdf_path, page_number, scored_page, config["render_dpi"], page
+                )
+                img.save(output_pdf, "PDF", resolution=float(config["render_dpi"]), append=stats["pages"] > 0)
+                img.close()
+            del img
+
+            medium, high = scored_page["medium_threshold"], scored_page["high_threshold"]
+            lines_file.write(json.dumps({
+                "page": page_number,
+                "mediumThreshold": round(medium, 4),
+                "highThreshold": round(high, 4),
+                "lines": [
+                    {"text": text, "bbox": [round(v, 1) for v in bbox], "score": round(score, 4),
+                     "tier": score_tier(score, medium, high)}
+                    for text, bbox, score in scored_page["scored_lines"]
+                ],
+            }) + "\n")
+            stats["pages"] += 1
+            stats["irrelevant"] += irrelevant_count
+            for tier, count in highlight_counts.items():
+                stats[tier] += count
+            del scored_page
+    stats["peakRssBytes"] = rss.peak
+    return stats
+
 def main():
+    """Run the CLI; returns the process exit code (nonzero when nothing was written)"""
+    if "--all-pages" in sys.argv:
+        # Streaming mode: every page, bounded memory, output written as it goes
+        sys.argv.remove("--all-pages")
+        if len(sys.argv) < 3:
+            print("Usage: python highlighter.py <input.pdf> <output.pdf> --all-pages")
+            return 2
+        if not os.path.exists(sys.argv[1]):
+            print(f"Error: PDF file '{sys.argv[1]}' not found", file=sys.stderr)
+            return 1
+        stats = highlight_pdf(sys.argv[1], sys.argv[2])
+        if not stats["pages"]:
+            print("Error: no page had enough text to highlight", file=sys.stderr)
+            return 1
+        print(f"\nHighlighted {stats['pages']} pages ({stats['skipped_pages']} without enough text)")
+        print(f"  High: {stats['high']}  Medium: {stats['medium']}  Low: {stats['low']}  Irrelevant: {stats['irrelevant']}")
+        print(f"  Peak RSS: {format_bytes(stats['peakRssBytes'])}")
+        print(f"PDF with highlights saved as {stats['outputPdf']}")
+        print(f"Scored lines saved as {stats['linesPath']}")
+        return 0
+
     if len(sys.argv) >= 3:
         PDF_FILE = sys.argv[1]
         OUTPUT_PDF = sys.argv[2]
@@ -480,116 +891,21 @@ def main():
         print("Opening PDF and extracting content...")
         doc = fitz.open(PDF_FILE)
         page = doc[0]
-        lines_with_boxes = extract_lines_with_boxes(page)
-        
-        if not lines_with_boxes:
-            print("No text lines found in PDF")
-            return
-            
-        print(f"Extracted {len(lines_with_boxes)} text lines")
-        
-        # Clean and prepare text
-        line_texts = [clean_text(line) for line, _ in lines_with_boxes]
-        full_text = " ".join(line_texts)
-        
-        if len(full_text) < 100:
-            print("Insufficient text content for analysis")
-            return
-
-        print("Extracting proper nouns and topic keywords...")
-        # Extract proper nouns and entities from the entire document
-        proper_nouns_global = extract_proper_nouns_and_entities(full_text)
-        topic_keywords_global = extract_topic_keywords(full_text)
-        
-        print(f"Found {len(proper_nouns_global)} proper nouns/entities")
-        print(f"Found {len(topic_keywords_global)} topic keywords")
-        
-        # Show some examples
-        if proper_nouns_global:
-            print(f"Proper nouns sample: {', '.join(proper_nouns_global[:5])}")
-        if topic_keywords_global:
-            print(f"Topic keywords sample: {', '.join(topic_keywords_global[:5])}")
-
-        print("Generating enhanced summary...")
-        summary = generate_enhanced_summary(full_text)
-        summary_sentences = sent_tokenize(summary)
-        print(f"Summary ready: {len(summary_sentences)} sentences")
-        print(f"Summary preview: {summary[:100]}...")
-
-        print("Computing multi-modal similarity scores...")
-        sentence_model = SentenceTransformer("all-MiniLM-L6-v2")
-        
-        scored_lines = []
-        features_list = []
-        
-        for idx, (line_text, bbox) in enumerate(lines_with_boxes):
-            # Calculate similarity score
-            similarity_score = calculate_multi_similarity_score(
-                line_text, summary_sentences, sentence_model
-            )
-            
-            # Calculate content features (now includes proper noun analysis)
-            features = calculate_text_features(line_text, proper_nouns_global, topic_keywords_global)
-            features_list.append(features)
-            
-            # Apply content-based boost (now includes proper noun boost)
-            content_boost = calculate_content_boost(features)
-            final_score = similarity_score + content_boost
-            
-            scored_lines.append((line_text, bbox, final_score))
-            
-            if idx % 10 == 0:
-                print(f"  Processed {idx+1}/{len(lines_with_boxes)} lines...")
-
-        # Calculate adaptive thresholds
-        scores = [score for _, _, score in scored_lines]
-        medium_threshold, high_threshold = calculate_adaptive_thresholds(scores, features_list)
-        
-        print(f"\nInitial Adaptive Thresholds:")
-        print(f"  High importance (Green): >= {high_threshold:.3f}")
-        print(f"  Medium importance (Yellow): >= {medium_threshold:.3f}")
-        print(f"  Low importance: < {medium_threshold:.3f}")
-
-        # NEW: Enforce proper noun rule with irrelevance filtering
-        print("Enforcing proper noun/topic keyword rule with irrelevance filtering...")
-        scored_lines, adjustments_made, irrelevant_blocked = enforce_proper_noun_rule(scored_lines, features_list, medium_threshold)
-        print(f"Adjusted {adjustments_made} lines with proper nouns/topic keywords")
-        print(f"Blocked {irrelevant_blocked} irrelevant lines from higher importance")
+        scored_page = score_page(page)
+        if scored_page is None:
+            print("Error: the first page has too little text to highlight", file=sys.stderr)
+            return 1
+        scored_lines = scored_page["scored_lines"]
+        features_list = scored_page["features_list"]
+        medium_threshold = scored_page["medium_threshold"]
+        high_threshold = scored_page["high_threshold"]
 
         # Generate highlighted image
         print("Creating highlighted PDF image...")
-        img = convert_from_path(PDF_FILE, dpi=200, first_page=1, last_page=1)[0]
-        draw = ImageDraw.Draw(img, "RGBA")
-        scale = 200 / 72
-
-        highlight_counts = {'high': 0, 'medium': 0, 'low': 0}
-        proper_noun_highlights = {'high': 0, 'medium': 0}
-        irrelevant_count = 0
-        
-        for i, (text, bbox, score) in enumerate(scored_lines):
-            features = features_list[i]
-            x0, y0, x1, y1 = bbox
-            rect = [x0 * scale, y0 * scale, x1 * scale, y1 * scale]
-            
-            # Track irrelevant content
-            if features['is_irrelevant']:
-                irrelevant_count += 1
-            
-            if score >= high_threshold:
-                draw.rectangle(rect, fill=(0, 255, 0, 100))      # Green (high importance)
-                highlight_counts['high'] += 1
-                if features['has_proper_nouns'] or features['has_topic_keywords']:
-                    proper_noun_highlights['high'] += 1
-            elif score >= medium_threshold:
-                draw.rectangle(rect, fill=(255, 255, 0, 80))     # Yellow (medium importance)
-                highlight_counts['medium'] += 1
-                if features['has_proper_nouns'] or features['has_topic_keywords']:
-                    proper_noun_highlights['medium'] += 1
-            else:
-                highlight_counts['low'] += 1
-                # Optional: light red tint for irrelevant content
-                if features['is_irrelevant']:
-                    draw.rectangle(rect, fill=(255, 200, 200, 40))  # Light red for irrelevant
+        with span("hl_render"):
+            img, highlight_counts, proper_noun_highlights, irrelevant_count = render_highlights(
+                PDF_FILE, 0, scored_page, HIGHLIGHT_CONFIG["render_dpi"]
+            )
 
         img.save(OUTPUT_IMAGE)
         print(f"\nEnhanced output image saved as {OUTPUT_IMAGE}")
@@ -653,11 +969,14 @@ def main():
             print(f"  {i+1}. (R:{relevance:.2f}) {preview}")
 
     except FileNotFoundError:
-        print(f"Error: PDF file '{PDF_FILE}' not found")
+        print(f"Error: PDF file '{PDF_FILE}' not found", file=sys.stderr)
+        return 1
     except Exception as e:
-        print(f"Error: {str(e)}")
+        print(f"Error: {str(e)}", file=sys.stderr)
         import traceback
         traceback.print_exc()
+        return 1
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
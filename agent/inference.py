@@ -0,0 +1,188 @@
+"""CPU inference backends for the highlighter's BART summarizer and MiniLM encoder.
+
+    fp32   plain PyTorch weights (the original behaviour)
+    int8   PyTorch dynamic quantization of every Linear layer
+    onnx   ONNX Runtime export (needs optimum[onnxruntime]; MiniLM also
+           needs sentence-transformers >= 3.2)
+
+Quantized and exported models are built once and cached under
+MODEL_CACHE_DIR, so only the first load pays for the conversion. Thread
+count comes from INFERENCE_THREADS (0 leaves the library default). When a
+backend's optional packages are missing, loading falls back to fp32.
+
+    python inference.py export --backend onnx     # build the cache ahead of time
+    python inference.py bench                     # latency and agreement vs fp32
+
+Highlight-tier agreement on real documents comes from the highlight
+benchmark: python highlight_bench.py docs/ --config backend=fp32 --config backend=int8
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+from metrics import increment
+
+BACKENDS = ("fp32", "int8", "onnx")
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "models"))
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", 0))
+SUMMARIZER_MODEL_NAME = "facebook/bart-large-cnn"
+SENTENCE_MODEL_NAME = "all-MiniLM-L6-v2"
+
+_loaded = {}
+_load_lock = threading.Lock()
+
+
+def _cache_path(backend: str, model_name: str) -> str:
+    return os.path.join(MODEL_CACHE_DIR, backend, model_name.replace("/", "--"))
+
+
+def _set_torch_threads():
+    if INFERENCE_THREADS:
+        import torch
+        torch.set_num_threads(INFERENCE_THREADS)
+
+
+def _session_options():
+    import onnxruntime
+    options = onnxruntime.SessionOptions()
+    if INFERENCE_THREADS:
+        options.intra_op_num_threads = INFERENCE_THREADS
+        options.inter_op_num_threads = 1
+    return options
+
+
+def _quantize(model):
+    import torch
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _load_quantized(model_name: str, build):
+    """Quantize once and pickle the whole module; later loads skip the fp32 weights."""
+    import torch
+    path = os.path.join(_cache_path("int8", model_name), "model.pt")
+    if os.path.exists(path):
+        return torch.load(path, weights_only=False)
+    print(f"Quantizing {model_name} to int8 (one-time)...", file=sys.stderr)
+    model = _quantize(build())
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    torch.save(model, path)
+    return model
+
+
+def _summarizer(backend: str):
+    from transformers import BartTokenizer, BartForConditionalGeneration
+
+    tokenizer = BartTokenizer.from_pretrained(SUMMARIZER_MODEL_NAME)
+    if backend == "onnx":
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        path = _cache_path("onnx", SUMMARIZER_MODEL_NAME)
+        if not os.path.exists(os.path.join(path, "config.json")):
+            print(f"Exporting {SUMMARIZER_MODEL_NAME} to ONNX (one-time)...", file=sys.stderr)
+            ORTModelForSeq2SeqLM.from_pretrained(SUMMARIZER_MODEL_NAME, export=True).save_pretrained(path)
+        return tokenizer, ORTModelForSeq2SeqLM.from_pretrained(path, session_options=_session_options())
+
+    _set_torch_threads()
+    if backend == "int8":
+        model = _load_quantized(SUMMARIZER_MODEL_NAME, lambda: BartForConditionalGeneration.from_pretrained(SUMMARIZER_MODEL_NAME))
+    else:
+        model = BartForConditionalGeneration.from_pretrained(SUMMARIZER_MODEL_NAME)
+    return tokenizer, model.eval()
+
+
+def _sentence_model(backend: str):
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "onnx":
+        path = _cache_path("onnx", SENTENCE_MODEL_NAME)
+        model_kwargs = {"session_options": _session_options(), "provider": "CPUExecutionProvider"}
+        if not os.path.exists(os.path.join(path, "modules.json")):
+            print(f"Exporting {SENTENCE_MODEL_NAME} to ONNX (one-time)...", file=sys.stderr)
+            SentenceTransformer(SENTENCE_MODEL_NAME, backend="onnx").save(path)
+        return SentenceTransformer(path, backend="onnx", model_kwargs=model_kwargs)
+
+    _set_torch_threads()
+    if backend == "int8":
+        return _load_quantized(SENTENCE_MODEL_NAME, lambda: SentenceTransformer(SENTENCE_MODEL_NAME, device="cpu"))
+    return SentenceTransformer(SENTENCE_MODEL_NAME)
+
+
+_LOADERS = {"summarizer": _summarizer, "sentence": _sentence_model}
+
+
+def load_model(kind: str, backend: str = "fp32"):
+    """Load (once per process) the summarizer or sentence model for a backend.
+
+    kind is "summarizer" (returns (tokenizer, model)) or "sentence". A
+    backend whose optional packages are missing falls back to fp32.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+    with _load_lock:
+        key = (kind, backend)
+        if key not in _loaded:
+            try:
+                _loaded[key] = _LOADERS[kind](backend)
+            except (ImportError, TypeError) as e:
+                if backend == "fp32":
+                    raise
+                print(f"{backend} backend unavailable for {kind} ({e}); using fp32", file=sys.stderr)
+                increment("inference_backend_fallbacks")
+                _loaded[key] = _loaded.get((kind, "fp32")) or _LOADERS[kind]("fp32")
+                _loaded[(kind, "fp32")] = _loaded[key]
+        return _loaded[key]
+
+
+def export(backends):
+    """Build the int8/ONNX caches for both models ahead of time."""
+    for backend in backends:
+        for kind in _LOADERS:
+            started = time.perf_counter()
+            load_model(kind, backend)
+            print(f"{backend:5s} {kind:10s} ready in {time.perf_counter() - started:6.1f}s")
+
+
+def benchmark(backends, repeats: int = 3):
+    """Latency per backend, plus embedding cosine and summary overlap against fp32."""
+    import numpy as np
+    from tests.fixtures import SAMPLE_PARAGRAPHS
+
+    text = " ".join(SAMPLE_PARAGRAPHS)
+    lines = [sentence.strip() for paragraph in SAMPLE_PARAGRAPHS for sentence in paragraph.split(". ") if sentence.strip()]
+    reference = {}
+    for backend in ("fp32",) + tuple(b for b in backends if b != "fp32"):
+        tokenizer, summarizer = load_model("summarizer", backend)
+        encoder = load_model("sentence", backend)
+        inputs = tokenizer(text, return_tensors="pt", max_length=1024, truncation=True)
+
+        summary_ms, encode_ms = [], []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            ids = summarizer.generate(inputs["input_ids"], max_length=150, min_length=30, num_beams=6,
+                                      length_penalty=1.2, early_stopping=True, no_repeat_ngram_size=3)
+            summary_ms.append((time.perf_counter() - started) * 1000)
+            started = time.perf_counter()
+            vectors = encoder.encode(lines, convert_to_numpy=True, normalize_embeddings=True)
+            encode_ms.append((time.perf_counter() - started) * 1000)
+        summary = tokenizer.decode(ids[0], skip_special_tokens=True)
+
+        if backend == "fp32":
+            reference = {"vectors": vectors, "words": set(summary.lower().split())}
+        words = set(summary.lower().split())
+        cosine = float(np.mean(np.sum(vectors * reference["vectors"], axis=1)))
+        overlap = len(words & reference["words"]) / max(1, len(words | reference["words"]))
+        print(f"{backend:5s} summary {np.median(summary_ms):8.0f} ms  encode {np.median(encode_ms):7.1f} ms  "
+              f"embedding cosine vs fp32 {cosine:.4f}  summary word overlap {overlap:.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and compare CPU inference backends")
+    parser.add_argument("command", choices=("export", "bench"))
+    parser.add_argument("--backend", default="int8,onnx", help="comma-separated backends (default: int8,onnx)")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    selected = [name.strip() for name in args.backend.split(",") if name.strip()]
+    if args.command == "export":
+        export(selected)
+    else:
+        benchmark(selected, args.repeats)
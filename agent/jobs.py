@@ -0,0 +1,246 @@
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import ipaddress
+import threading
+import contextvars
+import urllib.request
+from urllib.parse import urlparse
+from metrics import current_route, increment, observe
+
+JOBS_PATH = os.getenv("JOBS_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_HOURS", 24)) * 3600
+CALLBACK_RETRIES = 3
+CALLBACK_TIMEOUT_SECONDS = 10
+POLL_SECONDS = 5
+# Comma-separated hosts callbacks may target; when empty, any public host is allowed
+CALLBACK_HOSTS = {host.strip().lower() for host in os.getenv("JOB_CALLBACK_HOSTS", "").split(",") if host.strip()}
+
+# Lower runs first; short interactive work should never wait behind videos
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 10
+
+
+def check_callback_url(url: str):
+    """Raise ValueError unless url is http(s) and resolves only to public addresses.
+
+    Keeps callbacks from reaching loopback, private, link-local (cloud
+    metadata) or other reserved addresses from inside the server.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError("callbackUrl must be an http(s) URL")
+    host = parsed.hostname.lower()
+    if CALLBACK_HOSTS and host not in CALLBACK_HOSTS:
+        raise ValueError(f"callbackUrl host '{host}' is not allowed")
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parsed.port or None, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError) as e:
+        raise ValueError(f"callbackUrl host '{host}' does not resolve: {e}")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%")[0])
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError(f"callbackUrl host '{host}' resolves to a non-public address")
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # A redirect could point the callback at an internal address
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_callback_opener = urllib.request.build_opener(_NoRedirect)
+
+
+class JobQueue:
+    """Persistent priority queue of background jobs run by a local worker pool.
+
+    Jobs are rows in SQLite, so queued work survives a restart (jobs that
+    were running when the process died are queued again). Workers claim
+    the lowest priority number first, oldest first within a priority. With
+    more than one worker, the first only takes PRIORITY_HIGH jobs, so short
+    requests never wait behind long videos occupying every worker.
+    """
+
+    def __init__(self, path: str = JOBS_PATH, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._threads = []
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY, kind TEXT NOT NULL, params TEXT NOT NULL, priority INTEGER NOT NULL,
+            status TEXT NOT NULL, result TEXT, error TEXT, callback_url TEXT,
+            created REAL NOT NULL, started REAL, finished REAL)""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority, created)")
+        self._db.execute("UPDATE jobs SET status = 'queued', started = NULL WHERE status = 'running'")
+        self._db.commit()
+
+    def register(self, kind: str, handler, priority: int = PRIORITY_NORMAL, required=()):
+        """handler(params) -> JSON-serializable result; priority is the default for the kind.
+
+        required lists params that must be present; required=("a|b",) accepts either.
+        """
+        self._handlers[kind] = (handler, priority, required)
+
+    def client_priority(self, kind: str, value) -> int:
+        """Validate a client-requested priority for a kind.
+
+        Clients may only lower their job's priority: values are clamped to
+        between the kind's default and PRIORITY_LOW, so no caller can jump
+        the queue or take the worker kept for PRIORITY_HIGH jobs.
+        """
+        try:
+            requested = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"priority must be an integer between {PRIORITY_HIGH} and {PRIORITY_LOW}")
+        default = self._handlers[kind][1] if kind in self._handlers else PRIORITY_NORMAL
+        return min(PRIORITY_LOW, max(default, requested))
+
+    def submit(self, kind: str, params: dict, priority: int = None, callback_url: str = None) -> str:
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: '{kind}'. Must be one of: {', '.join(self._handlers)}")
+        missing = [name for name in self._handlers[kind][2]
+                   if not any(params.get(option) for option in name.split("|"))]
+        if missing:
+            raise ValueError(f"Missing parameter(s) for '{kind}' job: {', '.join(missing)}")
+        if callback_url:
+            check_callback_url(callback_url)
+        if priority is None:
+            priority = self._handlers[kind][1]
+        job_id = uuid.uuid4().hex
+        with self._wakeup:
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, params, priority, status, callback_url, created) VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, json.dumps(params), int(priority), callback_url, time.time())
+            )
+            self._db.commit()
+            self._wakeup.notify_all()
+        increment("jobs_submitted")
+        return job_id
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, kind, priority, status, result, error, created, started, finished FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+            position = None
+            if row is not None and row[3] == "queued":
+                position = self._db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND (priority < ? OR (priority = ? AND created < ?))",
+                    (row[2], row[2], row[6])
+                ).fetchone()[0]
+        if row is None:
+            return None
+        job = {
+            "jobId": row[0], "kind": row[1], "priority": row[2], "status": row[3],
+            "createdAt": row[6], "startedAt": row[7], "finishedAt": row[8],
+        }
+        if position is not None:
+            job["queuePosition"] = position
+        if row[4] is not None:
+            job["result"] = json.loads(row[4])
+        if row[5] is not None:
+            job["error"] = row[5]
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not started yet."""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id)
+            )
+            self._db.commit()
+        return cursor.rowcount > 0
+
+    def start(self):
+        """Start the worker threads (once); call at startup so requeued jobs run."""
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                max_priority = PRIORITY_HIGH if index == 0 and self.workers > 1 else None
+                thread = threading.Thread(target=self._work, args=(max_priority,), name=f"job-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _claim(self, max_priority=None):
+        with self._wakeup:
+            while True:
+                row = self._db.execute(
+                    "SELECT id, kind, params, callback_url, created FROM jobs WHERE status = 'queued' "
+                    "AND (? IS NULL OR priority <= ?) ORDER BY priority, created LIMIT 1",
+                    (max_priority, max_priority)
+                ).fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE jobs SET status = 'running', started = ? WHERE id = ?", (time.time(), row[0]))
+                    self._db.commit()
+                    return row
+                self._purge()
+                self._wakeup.wait(POLL_SECONDS)
+
+    def _purge(self):
+        self._db.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed', 'cancelled') AND finished < ?",
+            (time.time() - JOB_RETENTION_SECONDS,)
+        )
+        self._db.commit()
+
+    def _work(self, max_priority=None):
+        while True:
+            job_id, kind, params, callback_url, created = self._claim(max_priority)
+            handler = self._handlers.get(kind, (None,))[0]
+            # Jobs report metrics under their own pseudo-route
+            context = contextvars.copy_context()
+            context.run(current_route.set, f"job:{kind}")
+            observe("job_queue_wait", (time.time() - created) * 1000, route=f"job:{kind}")
+            started = time.perf_counter()
+            try:
+                if handler is None:
+                    raise ValueError(f"No handler registered for job kind '{kind}'")
+                result = context.run(handler, json.loads(params))
+                status, result_json, error = "done", json.dumps(result), None
+                print(f"Job {job_id} ({kind}) done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+            except Exception as e:
+                status, result_json, error = "failed", None, str(e)
+                print(f"Job {job_id} ({kind}) failed: {e}", file=sys.stderr)
+            observe("job_run", (time.perf_counter() - started) * 1000, route=f"job:{kind}")
+            increment(f"jobs_{status}", route=f"job:{kind}")
+            with self._lock:
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, result = ?, error = ?, finished = ? WHERE id = ?",
+                    (status, result_json, error, time.time(), job_id)
+                )
+                self._db.commit()
+            if callback_url:
+                self._send_callback(callback_url, job_id)
+
+    def _send_callback(self, url: str, job_id: str):
+        """POST the final job state to the client's callback URL, retrying with backoff."""
+        body = json.dumps(self.get(job_id)).encode("utf-8")
+        for attempt in range(CALLBACK_RETRIES):
+            try:
+                # Checked again at send time: DNS may have changed since submit
+                check_callback_url(url)
+                callback = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+                with _callback_opener.open(callback, timeout=CALLBACK_TIMEOUT_SECONDS):
+                    return
+            except ValueError as e:
+                print(f"Callback for job {job_id} refused: {e}", file=sys.stderr)
+                return
+            except Exception as e:
+                print(f"Callback for job {job_id} failed (attempt {attempt + 1}): {e}", file=sys.stderr)
+                time.sleep(2 ** attempt)
+
+
+queue = JobQueue()
@@ -0,0 +1,309 @@
+import os
+import sys
+import time
+import itertools
+import threading
+import contextvars
+from collections import defaultdict, Counter
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+import google.generativeai as genai
+from response_parser import parse_llm_response, scan_json_object, strip_code_fences, SCHEMAS
+from token_budget import estimate_tokens, prepare_input, record_tokens
+from metrics import span, increment, observe
+from governor import governor, error_status, RETRYABLE_STATUS
+
+load_dotenv()
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+# Point at a local fake_gemini.py server for load and throttling tests
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+
+MODEL_NAME = 'gemini-1.5-flash'
+MAX_REPAIR_RETRIES = 2
+BACKOFF_BASE_SECONDS = 0.5
+REPAIR_TAIL_CHARS = 2000
+
+_configured = False
+_model = None
+_model_lock = threading.Lock()
+_stats_lock = threading.Lock()
+REPAIR_STATS = defaultdict(Counter)
+
+
+def _configure():
+    global _configured
+    if not _configured:
+        print("Configuring Gemini API...", file=sys.stderr)
+        if GEMINI_API_ENDPOINT:
+            genai.configure(api_key=GOOGLE_API_KEY or "fake", transport="rest",
+                            client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+        else:
+            genai.configure(api_key=GOOGLE_API_KEY)
+        _configured = True
+
+
+def get_model(system_instruction: str = None):
+    """Configure Gemini once and reuse the default model across requests.
+
+    Passing a system_instruction returns a dedicated model carrying it, for
+    callers (such as tutor sessions) that keep one model per conversation.
+    """
+    global _model
+    with _model_lock:
+        _configure()
+        if system_instruction is not None:
+            return genai.GenerativeModel(MODEL_NAME, system_instruction=system_instruction)
+        if _model is None:
+            _model = genai.GenerativeModel(MODEL_NAME)
+        return _model
+
+
+def _record(endpoint, key, amount=1):
+    with _stats_lock:
+        REPAIR_STATS[endpoint][key] += amount
+
+
+def get_repair_stats() -> dict:
+    """Per-endpoint counters for JSON parse failures and repairs."""
+    with _stats_lock:
+        return {endpoint: dict(counts) for endpoint, counts in REPAIR_STATS.items()}
+
+
+def _call(model, prompt: str, endpoint: str, generation_config=None) -> str:
+    """Run one Gemini call through the governor and record its prompt/output token counts."""
+    def run():
+        with span("llm_wait"):
+            response = model.generate_content(prompt, generation_config=generation_config)
+            return response, response.text
+
+    estimate = estimate_tokens(prompt)
+    response, text = governor.call(endpoint, estimate, run)
+    _record_usage(endpoint, prompt, response, text, estimate)
+    return text
+
+
+def _record_usage(endpoint: str, prompt: str, response, text: str, charged: int = 0):
+    """Record token counts and debit the governor for what was not charged up front.
+
+    charged is the prompt estimate taken when the call was admitted; any
+    prompt tokens the API reports beyond it (e.g. chat history resent with
+    each turn) are debited along with the output tokens.
+    """
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) or estimate_tokens(prompt)
+    output_tokens = getattr(usage, "candidates_token_count", 0) or estimate_tokens(text)
+    record_tokens(endpoint, llm_calls=1, prompt_tokens=prompt_tokens, output_tokens=output_tokens)
+    governor.charge_tokens(output_tokens + max(0, prompt_tokens - charged))
+    increment("llm_calls")
+    increment("prompt_tokens", prompt_tokens)
+    increment("output_tokens", output_tokens)
+
+
+def send_chat_message(chat, message: str, endpoint: str) -> str:
+    """Send one turn on a Gemini chat session, with the same accounting as _call."""
+    def run():
+        with span("llm_wait"):
+            response = chat.send_message(message)
+            return response, response.text
+
+    # Only the new message is known up front; the resent history is charged after the call
+    estimate = estimate_tokens(message)
+    response, text = governor.call(endpoint, estimate, run)
+    _record_usage(endpoint, message, response, text, estimate)
+    return text.strip()
+
+
+def generate_text(prompt: str, endpoint: str) -> str:
+    """Plain-text Gemini call for endpoints that do not return JSON."""
+    text = _call(get_model(), prompt, endpoint)
+    print("Received response from Gemini", file=sys.stderr)
+    return text.strip()
+
+
+def stream_text(prompt: str, endpoint: str):
+    """Plain-text Gemini call that yields text pieces as the model produces them.
+
+    Closing the generator early (e.g. the client disconnected) stops reading
+    and cancels the upstream stream so unread output is not generated.
+    """
+    model = get_model()
+    pieces = []
+    finished = False
+    upstream_error = None
+    started = time.perf_counter()
+    estimate = estimate_tokens(prompt)
+
+    def open_stream():
+        # Read the first chunk inside the governor (the SDK also looks one
+        # chunk ahead), so throttling at the start of a stream is retried
+        response = model.generate_content(prompt, stream=True)
+        chunks = iter(response)
+        return response, chunks, next(chunks, None)
+
+    # The slot stays held while the stream is open
+    response, chunks, first = governor.call(endpoint, estimate, open_stream, hold=True)
+    try:
+        try:
+            for chunk in itertools.chain([first] if first is not None else [], chunks):
+                text = chunk.text
+                if text:
+                    pieces.append(text)
+                    yield text
+        except Exception as e:
+            upstream_error = e
+            # Text was already sent, so this cannot be retried; still back off
+            status = error_status(e)
+            if status in RETRYABLE_STATUS:
+                governor.record_throttle(status)
+            raise
+        finished = True
+    finally:
+        governor.release()
+        observe("llm_wait", (time.perf_counter() - started) * 1000)
+        if not finished:
+            # The SDK exposes no public cancel; closing the underlying
+            # response stream is what stops generation server-side.
+            upstream = getattr(response, "_iterator", None)
+            for method in ("cancel", "close"):
+                if hasattr(upstream, method):
+                    try:
+                        getattr(upstream, method)()
+                    except Exception as e:
+                        print(f"Failed to cancel upstream stream: {e}", file=sys.stderr)
+                    break
+            # An upstream failure is not a client disconnect; count them apart
+            if upstream_error is not None:
+                increment("llm_stream_errors")
+                print(f"Stream for {endpoint} failed after {len(pieces)} chunk(s): {upstream_error}", file=sys.stderr)
+            else:
+                increment("llm_streams_cancelled")
+                print(f"Stream for {endpoint} cancelled after {len(pieces)} chunk(s)", file=sys.stderr)
+        # Usage metadata only arrives with the last chunk; estimate otherwise
+        _record_usage(endpoint, prompt, response if finished else None, "".join(pieces), estimate)
+
+
+def _is_truncated(text: str) -> bool:
+    begin, end, _, _, _ = scan_json_object(strip_code_fences(text))
+    return begin is not None and end is None
+
+
+def _repair_prompt(broken_text: str, schema_name: str, error: Exception) -> tuple:
+    """Build a short repair prompt that never re-sends the original input.
+
+    Truncated output asks for only the missing tail; anything else asks the
+    model to fix the JSON it already produced.
+    """
+    if _is_truncated(broken_text):
+        tail = broken_text[-REPAIR_TAIL_CHARS:]
+        prompt = f"""
+The following JSON output was cut off before it finished. Continue it from EXACTLY where it stops.
+Output ONLY the missing characters needed to complete the JSON, with no explanation and no code fences.
+
+Output so far (last part):
+{tail}
+"""
+        return prompt, True
+
+    prompt = f"""
+The following text was supposed to be a single JSON object for a "{schema_name}" response but it is invalid ({error}).
+Return the corrected JSON object ONLY, keeping all of the existing content. No explanation and no code fences.
+
+Invalid output:
+{broken_text}
+"""
+    return prompt, False
+
+
+def generate_json(prompt: str, schema_name: str, endpoint: str = None) -> dict:
+    """Call Gemini in JSON mode and parse the response for the given schema.
+
+    If the response is malformed or truncated, runs up to MAX_REPAIR_RETRIES
+    cheap repair calls (continuation of the missing tail, or a fix-up of the
+    broken JSON) with exponential backoff between them, then falls back to
+    local truncation repair, instead of failing the request and making the
+    user pay for the full prompt again.
+    """
+    endpoint = endpoint or schema_name
+    model = get_model()
+    json_config = {"response_mime_type": "application/json"}
+
+    _record(endpoint, "calls")
+    response_text = _call(model, prompt, endpoint, json_config).strip()
+    print("Received response from Gemini", file=sys.stderr)
+
+    try:
+        with span("json_parse"):
+            return parse_llm_response(response_text, schema_name, repair=False)
+    except ValueError as e:
+        last_error = e
+        _record(endpoint, "parse_failures")
+        print(f"Malformed JSON from Gemini ({e}); attempting repair", file=sys.stderr)
+
+    for attempt in range(MAX_REPAIR_RETRIES):
+        if attempt:
+            time.sleep(BACKOFF_BASE_SECONDS * (2 ** (attempt - 1)))
+        repair_prompt, is_continuation = _repair_prompt(response_text, schema_name, last_error)
+        _record(endpoint, "repair_calls")
+        candidate = response_text
+        try:
+            repair_text = strip_code_fences(_call(
+                model, repair_prompt, endpoint,
+                None if is_continuation else json_config
+            ))
+            candidate = response_text + repair_text if is_continuation else repair_text
+            data = parse_llm_response(candidate, schema_name, repair=False)
+            _record(endpoint, "repairs_succeeded")
+            print(f"Repaired JSON response after {attempt + 1} attempt(s)", file=sys.stderr)
+            return data
+        except ValueError as e:
+            last_error = e
+            print(f"Repair attempt {attempt + 1} failed: {e}", file=sys.stderr)
+            if is_continuation and _is_truncated(candidate):
+                # Keep what the continuation added and ask for the rest next time
+                response_text = candidate
+        except Exception as e:
+            # The repair call itself failed (API error, overload); repair locally instead
+            _record(endpoint, "repair_call_errors")
+            print(f"Repair call {attempt + 1} failed upstream: {e}", file=sys.stderr)
+            break
+
+    # Last resort: close/trim the best text we have locally
+    try:
+        data = parse_llm_response(response_text, schema_name, repair=True)
+        _record(endpoint, "local_repairs")
+        return data
+    except ValueError:
+        _record(endpoint, "repairs_failed")
+        raise last_error
+
+
+def generate_json_chunked(build_prompt, text: str, schema_name: str, endpoint: str) -> dict:
+    """Fit text to the endpoint's token budget and generate JSON from it.
+
+    build_prompt(chunk) must return the full prompt for one piece of input.
+    Input within budget is a single call; larger input is split into
+    budget-sized chunks that are generated concurrently and merged, with
+    item ids renumbered.
+    """
+    with span("prompt_build"):
+        chunks = prepare_input(text, endpoint)
+        prompts = [build_prompt(chunk) for chunk in chunks]
+    if len(prompts) == 1:
+        return generate_json(prompts[0], schema_name, endpoint)
+
+    print(f"Generating {schema_name} from {len(prompts)} chunks...", file=sys.stderr)
+    # Copy the caller's context so worker threads report metrics under its route
+    contexts = [contextvars.copy_context() for _ in prompts]
+    with ThreadPoolExecutor(max_workers=len(prompts)) as pool:
+        results = list(pool.map(
+            lambda pair: pair[0].run(generate_json, pair[1], schema_name, endpoint),
+            zip(contexts, prompts)
+        ))
+
+    list_key = SCHEMAS[schema_name]["list_key"]
+    merged = results[0]
+    for result in results[1:]:
+        merged[list_key].extend(result[list_key])
+    for index, item in enumerate(merged[list_key], start=1):
+        item["id"] = index
+    return merged
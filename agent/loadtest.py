@@ -0,0 +1,217 @@
+"""End-to-end load test of the agent API against a fake Gemini backend.
+
+Starts fake_gemini.py and the Flask app in-process, generates sample
+inputs (transcript, text, PDF, image, flashcards), then drives every route
+at increasing concurrency and reports throughput and p50/p95/p99 latency.
+Results are saved as JSON and compared against a stored baseline so
+regressions show up as percentage changes.
+
+    python loadtest.py                          # run, save, compare to baseline if any
+    python loadtest.py --save-baseline          # also make this run the baseline
+    python loadtest.py --routes ask,quiz --concurrency 1,8,32 --requests 50
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+import urllib.error
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from tests.fixtures import SAMPLE_PARAGRAPHS
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "loadtest")
+BASELINE_PATH = os.path.join(RESULTS_DIR, "baseline.json")
+REGRESSION_THRESHOLD = 0.10
+
+
+def make_fixtures(directory: str) -> dict:
+    """Write the sample inputs every route needs and return their paths/contents."""
+    import fitz
+    from PIL import Image, ImageDraw, ImageFont
+
+    os.makedirs(directory, exist_ok=True)
+    transcript = " ".join(SAMPLE_PARAGRAPHS * 8)
+
+    pdf_path = os.path.join(directory, "sample.pdf")
+    doc = fitz.open()
+    for paragraph in SAMPLE_PARAGRAPHS:
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(72, 72, 540, 720), (paragraph + "\n\n") * 6, fontsize=11)
+    doc.save(pdf_path)
+    doc.close()
+
+    image_path = os.path.join(directory, "sample.png")
+    image = Image.new("RGB", (1400, 1000), "white")
+    draw = ImageDraw.Draw(image)
+    try:
+        font = ImageFont.load_default(size=28)
+    except TypeError:
+        font = ImageFont.load_default()
+    y = 40
+    for paragraph in SAMPLE_PARAGRAPHS[:2]:
+        words = paragraph.split()
+        for start in range(0, len(words), 9):
+            draw.text((40, y), " ".join(words[start:start + 9]), fill="black", font=font)
+            y += 44
+        y += 30
+    image.save(image_path)
+
+    flashcards = [{"id": i + 1, "title": f"Card {i + 1}", "content": paragraph}
+                  for i, paragraph in enumerate(SAMPLE_PARAGRAPHS * 2)]
+    return {"transcript": transcript, "pdf": pdf_path, "image": image_path, "flashcards": flashcards}
+
+
+def route_requests(fixtures: dict) -> dict:
+    """name -> (path, body(i)); bodies vary per request so answer caches do not short-circuit."""
+    return {
+        "flashcards": ("/api/flashcards", lambda i: {"transcript": fixtures["transcript"], "genre": "factual"}),
+        "text": ("/api/flashcards/text", lambda i: {"text": fixtures["transcript"], "genre": "conceptual"}),
+        "pdf": ("/api/flashcards/pdf", lambda i: {"pdfPath": fixtures["pdf"], "genre": "factual"}),
+        "image": ("/api/flashcards/image", lambda i: {"imagePath": fixtures["image"], "genre": "story"}),
+        "quiz": ("/api/quiz", lambda i: {"flashcards": fixtures["flashcards"]}),
+        "battle-quiz": ("/api/battle-quiz", lambda i: {"topic": "cell biology", "difficulty": "intermediate"}),
+        "ask": ("/api/flashcard-ask", lambda i: {"content": f"{SAMPLE_PARAGRAPHS[0]} (card {i})",
+                                                 "question": "Explain this more simply"}),
+        "highlight-pdf": ("/api/highlight-pdf", lambda i: {"pdfPath": fixtures["pdf"]}),
+    }
+
+
+def _post(base_url: str, path: str, body: dict, timeout: float):
+    request = urllib.request.Request(base_url + path, data=json.dumps(body).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            ok = response.status < 400
+    except (urllib.error.URLError, TimeoutError, ConnectionError):
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+def run_level(base_url: str, path: str, body, concurrency: int, requests: int, timeout: float) -> dict:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda i: _post(base_url, path, body(i), timeout), range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies = np.array([seconds for seconds, ok in results if ok]) * 1000
+    summary = {"requests": requests, "errors": sum(1 for _, ok in results if not ok),
+               "throughput_rps": round((requests - sum(1 for _, ok in results if not ok)) / elapsed, 2)}
+    for label, q in (("p50_ms", 50), ("p95_ms", 95), ("p99_ms", 99)):
+        summary[label] = round(float(np.percentile(latencies, q)), 1) if len(latencies) else None
+    return summary
+
+
+def compare(current: dict, baseline: dict, threshold: float = REGRESSION_THRESHOLD) -> list:
+    """Print per-route changes against a baseline run; return the regressions."""
+    regressions = []
+    print(f"\nCompared with baseline from {baseline.get('timestamp')} ({baseline.get('git_commit', '?')[:10]}):")
+    for route, levels in current["results"].items():
+        for level, now in levels.items():
+            before = baseline.get("results", {}).get(route, {}).get(level)
+            if not before or not before.get("p95_ms") or not now.get("p95_ms"):
+                continue
+            p95_change = now["p95_ms"] / before["p95_ms"] - 1
+            rps_change = now["throughput_rps"] / before["throughput_rps"] - 1 if before["throughput_rps"] else 0.0
+            regressed = p95_change > threshold or rps_change < -threshold or now["errors"] > before["errors"]
+            print(f"  {route:14s} c={level:>3s}  p95 {p95_change:+7.1%}  throughput {rps_change:+7.1%}"
+                  f"  errors {before['errors']}->{now['errors']}{'  REGRESSION' if regressed else ''}")
+            if regressed:
+                regressions.append((route, level))
+    return regressions
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the agent API against a fake Gemini backend")
+    parser.add_argument("--routes", default="all", help="comma-separated subset of routes (default: all)")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=20, help="requests per route per level")
+    parser.add_argument("--latency-ms", type=float, default=800, help="fake Gemini latency")
+    parser.add_argument("--jitter-ms", type=float, default=200, help="fake Gemini latency jitter")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of fake Gemini calls that 429")
+    parser.add_argument("--timeout", type=float, default=120, help="per-request timeout in seconds")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 if any route regressed")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="mindsnap_loadtest_")
+    # Keep caches and queues of the run isolated from the real ones
+    os.environ.setdefault("OCR_CACHE_PATH", os.path.join(workdir, "ocr_cache.sqlite3"))
+    os.environ.setdefault("JOBS_DB_PATH", os.path.join(workdir, "jobs.sqlite3"))
+    os.environ.setdefault("RETRIEVAL_INDEX_DIR", os.path.join(workdir, "retrieval"))
+
+    from fake_gemini import start_fake_gemini, FakeGeminiConfig
+    fake = start_fake_gemini(FakeGeminiConfig(args.latency_ms, args.jitter_ms, args.throttle_rate, seed=7))
+    os.environ["GEMINI_API_ENDPOINT"] = f"http://127.0.0.1:{fake.server_address[1]}"
+    os.environ.setdefault("GOOGLE_API_KEY", "loadtest")
+    # The fake has no quota unless --throttle-rate is set; do not let the
+    # production rate buckets make results depend on route order
+    os.environ.setdefault("LLM_RPM", "1000000")
+    os.environ.setdefault("LLM_TPM", "1000000000")
+
+    from werkzeug.serving import make_server
+    from app import app
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    import threading
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    routes = route_requests(make_fixtures(os.path.join(workdir, "fixtures")))
+    selected = list(routes) if args.routes == "all" else [name.strip() for name in args.routes.split(",")]
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    run = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "config": {"requests": args.requests, "concurrency": levels, "latency_ms": args.latency_ms,
+                   "jitter_ms": args.jitter_ms, "throttle_rate": args.throttle_rate},
+        "results": {},
+    }
+    print(f"{'route':14s} {'conc':>4s} {'rps':>8s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'errors':>6s}")
+    for name in selected:
+        path, body = routes[name]
+        _post(base_url, path, body(-1), args.timeout)  # warm-up (model loads, pools)
+        run["results"][name] = {}
+        for level in levels:
+            summary = run_level(base_url, path, body, level, args.requests, args.timeout)
+            run["results"][name][str(level)] = summary
+            print(f"{name:14s} {level:4d} {summary['throughput_rps']:8.2f} {summary['p50_ms'] or 0:9.1f} "
+                  f"{summary['p95_ms'] or 0:9.1f} {summary['p99_ms'] or 0:9.1f} {summary['errors']:6d}")
+
+    server.shutdown()
+    fake.shutdown()
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    result_path = os.path.join(RESULTS_DIR, run["timestamp"].replace(":", "") + ".json")
+    with open(result_path, "w") as handle:
+        json.dump(run, handle, indent=2)
+    print(f"\nResults saved to {result_path}")
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as handle:
+            regressions = compare(run, json.load(handle))
+    if args.save_baseline:
+        with open(args.baseline, "w") as handle:
+            json.dump(run, handle, indent=2)
+        print(f"Saved as baseline: {args.baseline}")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
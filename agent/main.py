@@ -4,6 +4,9 @@ from urllib.parse import urlparse, parse_qs
 from youtube_transcript_api import YouTubeTranscriptApi
 from transcriber import transcribe_audio
 from flashcard_agent import generate_flashcards
+from flashcard_multi import generate_multi_genre_flashcards
+from response_parser import parse_llm_response
+from metrics import timed
 
 def get_video_id(url: str) -> str:
     """Extract video ID from YouTube URL."""
@@ -15,6 +18,7 @@ def get_video_id(url: str) -> str:
             return parse_qs(parsed_url.query)['v'][0]
     raise ValueError("Invalid YouTube URL")
 
+@timed("transcript_fetch")
 def get_transcript(video_id: str) -> str:
     """Get transcript from YouTube or transcribe if not available."""
     try:
@@ -36,15 +40,17 @@ def get_transcript(video_id: str) -> str:
 
 def main():
     try:
-        # Read input as JSON: {"youtubeLink": ..., "genre": ...} or just a string
+        # Read input as JSON: {"youtubeLink": ..., "genre": ..., "genres": [...]} or just a string
         input_data = sys.stdin.read().strip()
         try:
             data = json.loads(input_data)
             youtube_link = data["youtubeLink"]
             genre = data.get("genre")
+            genres = data.get("genres")
         except Exception:
             youtube_link = input_data
             genre = None
+            genres = None
         
         if not youtube_link:
             print(json.dumps({"error": "No YouTube link provided"}))
@@ -59,24 +65,16 @@ def main():
         print(f"Transcript length: {len(transcript)} characters", file=sys.stderr)
         print(f"First 100 characters of transcript: {transcript[:100]}", file=sys.stderr)
 
-        # Generate flashcards from transcript
-        flashcards_json = generate_flashcards(transcript, genre)
+        # Generate flashcards from transcript (one deck per genre when several are requested)
+        if genres:
+            flashcards_json = generate_multi_genre_flashcards(transcript, genres, "transcript")
+        else:
+            flashcards_json = generate_flashcards(transcript, genre)
         
         # Print the JSON response without markdown formatting
         if isinstance(flashcards_json, str):
-            # If it's already a string, try to parse it to remove any markdown
-            try:
-                # Remove any markdown code block markers
-                clean_json = flashcards_json.replace("```json", "").replace("```", "").strip()
-                # Parse and re-stringify to ensure valid JSON
-                parsed = json.loads(clean_json)
-                print(json.dumps(parsed))
-            except json.JSONDecodeError:
-                # If parsing fails, just print the original
-                print(flashcards_json)
-        else:
-            # If it's already a dict, just stringify it
-            print(json.dumps(flashcards_json))
+            flashcards_json = parse_llm_response(flashcards_json, "flashcards")
+        print(json.dumps(flashcards_json))
             
         sys.exit(0)
         
@@ -0,0 +1,74 @@
+import os
+import sys
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SAMPLE_INTERVAL_SECONDS = 0.05
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes (0 when it cannot be read)."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is not None:
+        # ru_maxrss is a lifetime peak, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    return 0
+
+
+class PeakRSS:
+    """Sample RSS on a background thread and keep the highest value seen.
+
+    Use as a context manager around the code being measured; unlike
+    ru_maxrss the peak is scoped to the block, so several measurements can
+    run in one process.
+    """
+
+    __slots__ = ("interval", "start", "peak", "_stop", "_thread")
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.start = 0
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self.start = self.peak = current_rss()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name="peak-rss", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+        return False
+
+    @property
+    def growth(self) -> int:
+        """Bytes the peak rose above the RSS at entry."""
+        return max(0, self.peak - self.start)
+
+
+def format_bytes(size: int) -> str:
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+if __name__ == "__main__":
+    print(f"RSS: {format_bytes(current_rss())} (pid {os.getpid()})")
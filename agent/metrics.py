@@ -0,0 +1,132 @@
+import time
+import threading
+from bisect import bisect_left
+from collections import defaultdict, Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+# Histogram bucket upper bounds in milliseconds (the last bucket is +Inf)
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000)
+
+current_route = ContextVar("current_route", default="cli")
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = defaultdict(Counter)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram with approximate quantiles."""
+
+    __slots__ = ("buckets", "count", "total")
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value_ms: float):
+        self.buckets[bisect_left(BUCKETS_MS, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating inside the bucket that holds it."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = BUCKETS_MS[index - 1] if index else 0.0
+                upper = BUCKETS_MS[index] if index < len(BUCKETS_MS) else BUCKETS_MS[-1] * 2
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return float(BUCKETS_MS[-1])
+
+
+def observe(stage: str, value_ms: float, route: str = None):
+    """Record one timing for a stage under the current (or given) route."""
+    key = (route or current_route.get(), stage)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(value_ms)
+
+
+def increment(name: str, amount: int = 1, route: str = None):
+    """Add to a per-route counter such as llm_calls or prompt_tokens."""
+    with _lock:
+        _counters[route or current_route.get()][name] += amount
+
+
+@contextmanager
+def span(stage: str):
+    """Time the enclosed block as one stage of the current route."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, (time.perf_counter() - started) * 1000)
+
+
+def timed(stage: str):
+    """Decorator form of span()."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def snapshot() -> dict:
+    """JSON-friendly view of all stage timings and counters, keyed by route."""
+    with _lock:
+        routes = defaultdict(lambda: {"stages": {}, "counters": {}})
+        for (route, stage), histogram in sorted(_histograms.items()):
+            routes[route]["stages"][stage] = {
+                "count": histogram.count,
+                "mean_ms": round(histogram.total / histogram.count, 2) if histogram.count else 0.0,
+                "p50_ms": round(histogram.quantile(0.50), 2),
+                "p95_ms": round(histogram.quantile(0.95), 2),
+                "p99_ms": round(histogram.quantile(0.99), 2),
+            }
+        for route, counts in _counters.items():
+            routes[route]["counters"] = dict(counts)
+        return dict(routes)
+
+
+def render_prometheus() -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    lines = [
+        "# HELP mindsnap_stage_duration_ms Time spent in each processing stage.",
+        "# TYPE mindsnap_stage_duration_ms histogram",
+    ]
+    with _lock:
+        for (route, stage), histogram in sorted(_histograms.items()):
+            labels = f'route="{route}",stage="{stage}"'
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS_MS, histogram.buckets):
+                cumulative += bucket_count
+                lines.append(f'mindsnap_stage_duration_ms_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'mindsnap_stage_duration_ms_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"mindsnap_stage_duration_ms_sum{{{labels}}} {histogram.total:.3f}")
+            lines.append(f"mindsnap_stage_duration_ms_count{{{labels}}} {histogram.count}")
+
+        lines.append("# HELP mindsnap_route_total Per-route counters (LLM calls, tokens, ...).")
+        lines.append("# TYPE mindsnap_route_total counter")
+        for route, counts in sorted(_counters.items()):
+            for name, value in sorted(counts.items()):
+                lines.append(f'mindsnap_route_total{{route="{route}",name="{name}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Clear all recorded metrics."""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
@@ -0,0 +1,238 @@
+import os
+import sys
+import time
+import atexit
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image, ImageOps, ImageDraw, ImageFont
+import pytesseract
+from metrics import span
+
+# Optional dependency (commented out in requirements.txt): tesserocr keeps one
+# tesseract engine loaded per worker process; without it each tile costs a
+# tesseract subprocess through pytesseract.
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+TARGET_DPI = 300
+MAX_SIDE = 4200            # photos without a DPI tag are downscaled to at most this (legal page at 300 DPI)
+MIN_SIDE = 1000            # tiny screenshots are upscaled so glyphs are large enough
+TILE_HEIGHT = 600          # target tile height in preprocessed pixels
+TILE_PADDING = 8
+INK_ROW_FRACTION = 0.002   # a row with more dark pixels than this is part of a text line
+MIN_TILES_FOR_POOL = 2
+TESSERACT_CONFIG = "--psm 6"
+
+_pool = None
+_pool_lock = threading.Lock()
+_worker_api = None
+
+
+def _init_worker():
+    """Load one persistent tesseract engine per worker process when available."""
+    global _worker_api
+    if tesserocr is not None:
+        _worker_api = tesserocr.PyTessBaseAPI(psm=tesserocr.PSM.SINGLE_BLOCK)
+
+
+def _recognize_tile(tile: Image.Image) -> str:
+    if _worker_api is not None:
+        _worker_api.SetImage(tile)
+        return _worker_api.GetUTF8Text()
+    return pytesseract.image_to_string(tile, config=TESSERACT_CONFIG)
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = int(os.getenv("OCR_WORKERS", 0)) or os.cpu_count() or 1
+            _pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+            atexit.register(_pool.shutdown, wait=False)
+        return _pool
+
+
+def _otsu_threshold(gray: np.ndarray) -> int:
+    """Pick the global threshold that best separates ink from paper."""
+    histogram = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    probability = histogram / gray.size
+    background_weight = np.cumsum(probability)
+    cumulative_mean = np.cumsum(probability * np.arange(256))
+    global_mean = cumulative_mean[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (global_mean * background_weight - cumulative_mean) ** 2 / (
+            background_weight * (1 - background_weight))
+    return int(np.nanargmax(between))
+
+
+def preprocess_image(image: Image.Image) -> Image.Image:
+    """Auto-orient, resample towards TARGET_DPI and binarize an image for OCR."""
+    image = ImageOps.exif_transpose(image)
+    image = ImageOps.grayscale(image)
+
+    dpi = image.info.get("dpi", (0, 0))[0]
+    longest = max(image.size)
+    if dpi and dpi > TARGET_DPI:
+        scale = TARGET_DPI / dpi
+    elif dpi and longest >= MIN_SIDE:
+        scale = 1.0  # scans at or below the target resolution keep every pixel
+    elif longest > MAX_SIDE:
+        scale = MAX_SIDE / longest
+    elif longest < MIN_SIDE:
+        scale = MIN_SIDE / longest
+    else:
+        scale = 1.0
+    if scale != 1.0:
+        size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+        image = image.resize(size, Image.LANCZOS if scale < 1 else Image.BICUBIC)
+
+    image = ImageOps.autocontrast(image)
+    pixels = np.asarray(image)
+    threshold = _otsu_threshold(pixels)
+    return Image.fromarray(np.where(pixels > threshold, 255, 0).astype(np.uint8))
+
+
+def detect_text_tiles(binary: Image.Image) -> list:
+    """Split a binarized page into horizontal tiles that only cut through blank rows.
+
+    Returns (left, top, right, bottom) boxes in reading order, each cropped
+    to the ink it contains.
+    """
+    ink = np.asarray(binary) == 0
+    if not ink.any():
+        return []
+    row_ink = ink.sum(axis=1) > max(1, ink.shape[1] * INK_ROW_FRACTION)
+
+    # Runs of inked rows are text lines
+    lines = []
+    start = None
+    for y, has_ink in enumerate(row_ink):
+        if has_ink and start is None:
+            start = y
+        elif not has_ink and start is not None:
+            lines.append((start, y))
+            start = None
+    if start is not None:
+        lines.append((start, len(row_ink)))
+    if not lines:
+        return [(0, 0, binary.width, binary.height)]
+
+    # Pack consecutive lines into tiles of roughly TILE_HEIGHT
+    tiles = []
+    tile_top, tile_bottom = lines[0]
+    for top, bottom in lines[1:]:
+        if bottom - tile_top > TILE_HEIGHT:
+            tiles.append((tile_top, tile_bottom))
+            tile_top = top
+        tile_bottom = bottom
+    tiles.append((tile_top, tile_bottom))
+
+    boxes = []
+    for top, bottom in tiles:
+        columns = np.flatnonzero(ink[top:bottom].any(axis=0))
+        left, right = int(columns[0]), int(columns[-1]) + 1
+        boxes.append((
+            max(0, left - TILE_PADDING), max(0, top - TILE_PADDING),
+            min(binary.width, right + TILE_PADDING), min(binary.height, bottom + TILE_PADDING)
+        ))
+    return boxes
+
+
+def ocr_image(image: Image.Image) -> str:
+    """Run the full preprocessing + tiled parallel OCR pipeline on an image."""
+    with span("ocr_preprocess"):
+        binary = preprocess_image(image)
+    with span("ocr_regions"):
+        tiles = [binary.crop(box) for box in detect_text_tiles(binary)]
+    if not tiles:
+        return ""
+
+    with span("ocr_recognize"):
+        if len(tiles) < MIN_TILES_FOR_POOL:
+            texts = [_recognize_tile(tile) for tile in tiles]
+        else:
+            texts = list(_get_pool().map(_recognize_tile, tiles))
+    return "\n".join(text.strip() for text in texts if text.strip())
+
+
+def ocr_file(image_path: str) -> str:
+    """Open an image file and OCR it with the tiled pipeline."""
+    with Image.open(image_path) as image:
+        image.load()
+        return ocr_image(image)
+
+
+def _make_fixtures(directory: str, count: int = 6):
+    """Render synthetic note pages (with known text) at phone-photo sizes."""
+    os.makedirs(directory, exist_ok=True)
+    sentence = "The mitochondria is the powerhouse of the cell and produces ATP for energy"
+    try:
+        font = ImageFont.load_default(size=40)
+    except TypeError:
+        font = ImageFont.load_default()
+    for index in range(count):
+        width, height = (3000 + 500 * (index % 3), 4000)
+        page = Image.new("RGB", (width, height), (235, 232, 225))
+        draw = ImageDraw.Draw(page)
+        lines = [f"{index}.{n} {sentence}" for n in range(40 + 10 * index)]
+        y = 120
+        for line in lines:
+            draw.text((150, y), line, fill=(30, 30, 30), font=font)
+            y += (height - 240) // len(lines)
+        page.save(os.path.join(directory, f"page_{index}.jpg"), quality=85)
+        with open(os.path.join(directory, f"page_{index}.txt"), "w") as truth:
+            truth.write("\n".join(lines))
+
+
+def _baseline_ocr(path: str) -> str:
+    with Image.open(path) as image:
+        return pytesseract.image_to_string(image)
+
+
+def benchmark(directory: str):
+    """Compare latency and word accuracy of the baseline vs tiled pipeline.
+
+    Every image in the directory with a matching .txt file is used as a
+    fixture; run with --synthetic to generate a set first.
+    """
+    from difflib import SequenceMatcher
+
+    fixtures = sorted(
+        name for name in os.listdir(directory)
+        if name.lower().endswith((".png", ".jpg", ".jpeg", ".tif", ".tiff"))
+    )
+    _get_pool()  # start workers outside the timed region
+    totals = {"baseline": [0.0, 0.0], "pipeline": [0.0, 0.0]}
+    for name in fixtures:
+        path = os.path.join(directory, name)
+        truth_path = os.path.splitext(path)[0] + ".txt"
+        truth = None
+        if os.path.exists(truth_path):
+            with open(truth_path) as handle:
+                truth = handle.read().split()
+
+        for label, run in (("baseline", lambda: _baseline_ocr(path)),
+                           ("pipeline", lambda: ocr_file(path))):
+            started = time.perf_counter()
+            text = run()
+            elapsed = time.perf_counter() - started
+            accuracy = SequenceMatcher(None, truth, text.split()).ratio() if truth else float("nan")
+            totals[label][0] += elapsed
+            totals[label][1] += accuracy if truth else 0.0
+            print(f"{name:24s} {label:9s} {elapsed * 1000:8.0f} ms  word accuracy {accuracy:.3f}")
+
+    for label, (elapsed, accuracy) in totals.items():
+        count = max(1, len(fixtures))
+        print(f"{label:9s} mean {elapsed / count * 1000:8.0f} ms  mean accuracy {accuracy / count:.3f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python ocr.py <fixture_dir> [--synthetic]")
+        sys.exit(1)
+    if "--synthetic" in sys.argv:
+        _make_fixtures(sys.argv[1])
+    benchmark(sys.argv[1])
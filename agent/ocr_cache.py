@@ -0,0 +1,209 @@
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from PIL import Image, ImageOps
+from ocr import ocr_image
+from metrics import increment
+
+CACHE_PATH = os.getenv("OCR_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "ocr_cache.sqlite3"))
+MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", 2000))
+# Max differing bits (of 64) for two dHashes to count as the same picture.
+# Off (-1) by default: distinct text pages are often only a few bits apart,
+# so only exact content hashes are reused unless this is set explicitly.
+PHASH_DISTANCE = int(os.getenv("OCR_CACHE_PHASH_DISTANCE", -1))
+# A perceptual match must also agree on aspect ratio and on a 1024-bit dHash.
+DETAIL_DISTANCE = int(os.getenv("OCR_CACHE_DETAIL_DISTANCE", 2))
+ASPECT_TOLERANCE = 0.01
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def perceptual_hash(image: Image.Image, size: int = 8) -> int:
+    """size*size-bit difference hash: stable across re-compression and resizing."""
+    small = ImageOps.grayscale(image).resize((size + 1, size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(size):
+        for column in range(size):
+            left = pixels[row * (size + 1) + column]
+            right = pixels[row * (size + 1) + column + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def fingerprint(image: Image.Image) -> tuple:
+    """(aspect ratio, 64-bit dHash, 1024-bit dHash) used for perceptual matches."""
+    image = ImageOps.exif_transpose(image)
+    return image.width / image.height, perceptual_hash(image), perceptual_hash(image, 32)
+
+
+def _encode_fingerprint(signature) -> str:
+    if signature is None:
+        return None
+    aspect, coarse, detail = signature
+    return f"{aspect!r}:{coarse:x}:{detail:x}"
+
+
+def _decode_fingerprint(value: str):
+    # Rows written before fingerprints had a bare 64-bit hash; those never match
+    parts = value.split(":") if value else []
+    if len(parts) != 3:
+        return None
+    return float(parts[0]), int(parts[1], 16), int(parts[2], 16)
+
+
+def _distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _same_picture(a: tuple, b: tuple, distance: int) -> int:
+    """dHash distance when two fingerprints pass every check, else None."""
+    if abs(a[0] - b[0]) > ASPECT_TOLERANCE * max(a[0], b[0]):
+        return None
+    coarse = _distance(a[1], b[1])
+    if coarse > distance or _distance(a[2], b[2]) > DETAIL_DISTANCE:
+        return None
+    return coarse
+
+
+class OCRCache:
+    """LRU cache of OCR text keyed by content hash, with optional perceptual fallback.
+
+    Entries live in memory (for lookups) and in SQLite (so they survive
+    restarts). The least recently used entries are evicted beyond
+    max_entries. Perceptual matches (phash_distance >= 0) also require the
+    same aspect ratio and a close 1024-bit hash.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = MAX_ENTRIES,
+                 phash_distance: int = PHASH_DISTANCE):
+        self.max_entries = max_entries
+        self.phash_distance = phash_distance
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # content hash -> (fingerprint, text)
+        self.hits = 0
+        self.phash_hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""CREATE TABLE IF NOT EXISTS ocr_cache (
+            content_hash TEXT PRIMARY KEY, phash TEXT, text TEXT NOT NULL, last_used REAL NOT NULL)""")
+        rows = self._db.execute(
+            "SELECT content_hash, phash, text FROM ocr_cache ORDER BY last_used DESC LIMIT ?", (max_entries,)
+        ).fetchall()
+        for key, phash, text in reversed(rows):
+            self._entries[key] = (_decode_fingerprint(phash), text)
+
+    def get(self, key: str, signature: tuple = None, count_miss: bool = True):
+        """Return cached text for an exact or perceptually similar image, else None.
+
+        Pass count_miss=False for a cheap exact-only probe before the
+        fingerprint has been computed.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and signature is not None and self.phash_distance >= 0:
+                best = None
+                for other_key, (other_signature, _) in self._entries.items():
+                    if other_signature is None:
+                        continue
+                    distance = _same_picture(signature, other_signature, self.phash_distance)
+                    if distance is not None and (best is None or distance < best[0]):
+                        best = (distance, other_key)
+                if best is not None:
+                    key = best[1]
+                    entry = self._entries[key]
+                    self.phash_hits += 1
+            if entry is None:
+                if count_miss:
+                    self.misses += 1
+                    increment("ocr_cache_misses")
+                return None
+            self.hits += 1
+            increment("ocr_cache_hits")
+            self._entries.move_to_end(key)
+            self._db.execute("UPDATE ocr_cache SET last_used = ? WHERE content_hash = ?", (time.time(), key))
+            self._db.commit()
+            return entry[1]
+
+    def put(self, key: str, signature: tuple, text: str):
+        with self._lock:
+            self._entries[key] = (signature, text)
+            self._entries.move_to_end(key)
+            self._db.execute(
+                "INSERT OR REPLACE INTO ocr_cache (content_hash, phash, text, last_used) VALUES (?, ?, ?, ?)",
+                (key, _encode_fingerprint(signature), text, time.time())
+            )
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+            if evicted:
+                self._db.executemany("DELETE FROM ocr_cache WHERE content_hash = ?", [(k,) for k in evicted])
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "phash_hits": self.phash_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> OCRCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = OCRCache()
+        return _cache
+
+
+def cached_ocr_image(image: Image.Image, key: str = None, perceptual: bool = True) -> str:
+    """OCR an image through the cache; key defaults to a hash of its pixels.
+
+    perceptual=False limits reuse to exact matches (used for rasterized PDF
+    pages, where neighbouring pages of one document look alike).
+    """
+    cache = get_cache()
+    key = key or content_hash(image.tobytes())
+    signature = fingerprint(image) if perceptual and cache.phash_distance >= 0 else None
+    text = cache.get(key, signature)
+    if text is not None:
+        print("OCR cache hit", file=sys.stderr)
+        return text
+    text = ocr_image(image)
+    cache.put(key, signature, text)
+    return text
+
+
+def cached_ocr_file(image_path: str, key: str = None) -> str:
+    """OCR an image file through the cache, keyed by the file's bytes.
+
+    Pass key when the SHA-256 of the file is already known (e.g. computed
+    while streaming an upload) to avoid reading it twice.
+    """
+    if key is None:
+        with open(image_path, "rb") as handle:
+            key = content_hash(handle.read())
+    # Exact hits skip decoding the image entirely
+    text = get_cache().get(key, count_miss=False)
+    if text is not None:
+        print("OCR cache hit", file=sys.stderr)
+        return text
+    with Image.open(image_path) as image:
+        image.load()
+        return cached_ocr_image(image, key)
@@ -0,0 +1,152 @@
+"""Highlight-aware input for PDF flashcards: send the important lines, not the whole PDF.
+
+The highlighter's scoring runs first (batched similarity, extractive
+summary, document-consistent thresholds) and only high/medium lines plus
+PDF_FOCUS_CONTEXT_LINES neighbours on each side go to Gemini. Selections
+are cached on disk by the PDF's SHA-256 and the scoring settings, so a
+re-upload of the same file skips scoring. Each selection carries a report
+of the tokens the full text would have cost against what is sent.
+"""
+import os
+import sys
+import json
+import hashlib
+from pdf_stream import iter_pdf_pages
+from token_budget import estimate_tokens, compress_text, record_tokens
+from calibration import ScoreCalibration, get_calibration
+from metrics import span, increment
+import highlighter
+
+FOCUS_CACHE_DIR = os.getenv("PDF_FOCUS_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "pdf_focus"))
+FOCUS_CACHE_MAX_ENTRIES = int(os.getenv("PDF_FOCUS_CACHE_MAX_ENTRIES", 500))
+CONTEXT_LINES = int(os.getenv("PDF_FOCUS_CONTEXT_LINES", 1))
+FOCUS_TIERS = ("high", "medium")
+# Cheap scoring settings: the LLM does the summarizing, so BART is not needed here
+FOCUS_HIGHLIGHT_CONFIG = {
+    "similarity": "batched",
+    "summarizer": os.getenv("PDF_FOCUS_SUMMARIZER", "extractive"),
+    "thresholds": "document",
+}
+# With fewer lines kept than this, fall back to the full text (scoring found nothing useful)
+MIN_KEPT_LINES = 3
+GAP_MARKER = ""  # a blank line, so skipped lines read as a paragraph break
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_key(digest: str, context_lines: int) -> str:
+    settings = json.dumps({**highlighter.HIGHLIGHT_CONFIG, **FOCUS_HIGHLIGHT_CONFIG,
+                           "context": context_lines, "tiers": FOCUS_TIERS}, sort_keys=True)
+    return hashlib.sha256((digest + settings).encode()).hexdigest()
+
+
+def _cache_get(key: str):
+    path = os.path.join(FOCUS_CACHE_DIR, key + ".json")
+    try:
+        with open(path) as handle:
+            entry = json.load(handle)
+    except (FileNotFoundError, ValueError):
+        return None
+    os.utime(path)
+    return entry
+
+
+def _cache_put(key: str, entry: dict):
+    os.makedirs(FOCUS_CACHE_DIR, exist_ok=True)
+    path = os.path.join(FOCUS_CACHE_DIR, key + ".json")
+    with open(path + ".tmp", "w") as handle:
+        json.dump(entry, handle)
+    os.replace(path + ".tmp", path)
+    entries = sorted((os.path.getmtime(os.path.join(FOCUS_CACHE_DIR, name)), name)
+                     for name in os.listdir(FOCUS_CACHE_DIR) if name.endswith(".json"))
+    for _, name in entries[:max(0, len(entries) - FOCUS_CACHE_MAX_ENTRIES)]:
+        os.remove(os.path.join(FOCUS_CACHE_DIR, name))
+
+
+def _page_excerpt(lines: list, keep: list, context_lines: int) -> list:
+    """Kept lines with their neighbours, gaps between runs marked with GAP_MARKER."""
+    selected = set()
+    for index, kept in enumerate(keep):
+        if kept:
+            selected.update(range(max(0, index - context_lines), min(len(lines), index + context_lines + 1)))
+    excerpt = []
+    previous = None
+    for index in sorted(selected):
+        if previous is not None and index != previous + 1:
+            excerpt.append(GAP_MARKER)
+        excerpt.append(lines[index])
+        previous = index
+    return excerpt
+
+
+def select_important_text(pdf_path: str, digest: str = None, context_lines: int = CONTEXT_LINES) -> tuple:
+    """(text to send, report) for a PDF, keeping only high/medium lines plus context.
+
+    Pages the highlighter cannot score (too little text) are kept whole.
+    Falls back to the full text when scoring keeps almost nothing.
+    """
+    digest = digest or file_sha256(pdf_path)
+    key = _cache_key(digest, context_lines)
+    cached = _cache_get(key)
+    if cached is not None:
+        increment("pdf_focus_cache_hits")
+        print("PDF highlight selection cache hit", file=sys.stderr)
+        return cached["text"], {**cached["report"], "cached": True}
+
+    stored = get_calibration()
+    calibration = stored.copy() if stored is not None else ScoreCalibration()
+    full_pages = []
+    focused_pages = []
+    lines_total = lines_kept = 0
+    with span("pdf_focus_scoring"), highlighter.progress_to(sys.stderr):
+        for _, page in iter_pdf_pages(pdf_path):
+            page_text = page.get_text()
+            full_pages.append(page_text)
+            scored_page = highlighter.score_page(page, FOCUS_HIGHLIGHT_CONFIG, calibration)
+            if scored_page is None:
+                focused_pages.append(page_text.strip())
+                continue
+            calibration.update(scored_page["raw_scores"])
+            medium, high = scored_page["medium_threshold"], scored_page["high_threshold"]
+            lines = [text for text, _, _ in scored_page["scored_lines"]]
+            keep = [highlighter.score_tier(score, medium, high) in FOCUS_TIERS
+                    for _, _, score in scored_page["scored_lines"]]
+            lines_total += len(lines)
+            lines_kept += sum(keep)
+            focused_pages.append("\n".join(_page_excerpt(lines, keep, context_lines)))
+
+    # Both sides go through the same compression generation applies anyway
+    full_text = compress_text("\n".join(full_pages))
+    if not full_text.strip():
+        raise ValueError("PDF appears to be empty or contains no extractable text")
+    focused_text = compress_text("\n\n".join(page for page in focused_pages if page))
+    fallback = lines_kept < MIN_KEPT_LINES
+    if fallback:
+        print(f"Highlighting kept {lines_kept} lines; sending the full text", file=sys.stderr)
+        focused_text = full_text
+
+    tokens_full = estimate_tokens(full_text)
+    tokens_sent = estimate_tokens(focused_text)
+    report = {
+        "pages": len(full_pages),
+        "linesTotal": lines_total,
+        "linesKept": lines_kept,
+        "tokensFull": tokens_full,
+        "tokensSent": tokens_sent,
+        "tokensSaved": max(0, tokens_full - tokens_sent),
+        "savedRatio": round(1 - tokens_sent / tokens_full, 3) if tokens_full else 0.0,
+        "fallback": fallback,
+        "cached": False,
+    }
+    record_tokens("flashcards_pdf_focus", documents=1, input_tokens_full=tokens_full,
+                  input_tokens_selected=tokens_sent)
+    print(f"Highlight selection: {lines_kept}/{lines_total} lines, {tokens_sent} of {tokens_full} tokens "
+          f"({report['savedRatio']:.0%} saved)", file=sys.stderr)
+    _cache_put(key, {"text": focused_text, "report": report})
+    return focused_text, report
@@ -0,0 +1,143 @@
+"""Bounded-memory page iteration for very large PDFs.
+
+Pages are opened one at a time through PyMuPDF and dropped as soon as the
+caller is done with them. Every PDF_WINDOW_PAGES pages MuPDF's object
+store is emptied and a collection runs, which keeps a long document's
+footprint flat.
+
+PDF_MEMORY_CEILING_MB is a process-level guard, not a per-document
+budget: after each release the process RSS growth since the first window
+of this document is compared with the ceiling, and the document is
+rejected with MemoryCeilingExceeded instead of letting the instance run
+out of memory. RSS cannot be attributed to a document, so under
+concurrent requests the growth includes whatever the other requests
+allocated meanwhile, and the document that happens to hit the check is
+the one rejected. Size the ceiling for the worker's total headroom.
+
+    python pdf_stream.py 500        # compare peak RSS of eager vs streamed extraction
+"""
+import os
+import gc
+import sys
+import tempfile
+import fitz  # PyMuPDF
+from memory import current_rss, format_bytes
+from metrics import increment
+
+WINDOW_PAGES = int(os.getenv("PDF_WINDOW_PAGES", 8))
+# Max process RSS growth while a document streams (process-level, see above)
+MEMORY_CEILING_BYTES = int(os.getenv("PDF_MEMORY_CEILING_MB", 1024)) * 1024 * 1024
+# PDFs with more pages than this are read through the streaming path
+STREAM_MIN_PAGES = int(os.getenv("PDF_STREAM_MIN_PAGES", 50))
+
+
+class MemoryCeilingExceeded(MemoryError):
+    """Raised when process RSS growth is above the configured ceiling while streaming a PDF."""
+
+
+def page_count(pdf_path: str) -> int:
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+
+def release_memory():
+    """Drop MuPDF's cached objects and run a collection."""
+    fitz.TOOLS.store_shrink(100)
+    gc.collect()
+
+
+def iter_pdf_pages(pdf_path: str, window: int = WINDOW_PAGES, ceiling: int = MEMORY_CEILING_BYTES, pages=None):
+    """Yield (page_number, page) for each page, keeping at most a window of pages resident.
+
+    The page object is only valid until the next iteration. pages limits
+    the walk to a range or list of page numbers. The ceiling applies to
+    process RSS growth after the first window, so models a caller loads
+    lazily while handling the first page are not counted.
+    """
+    with fitz.open(pdf_path) as doc:
+        numbers = range(doc.page_count) if pages is None else pages
+        since_check = 0
+        baseline = None
+        for number in numbers:
+            page = doc.load_page(number)
+            try:
+                yield number, page
+            finally:
+                del page
+            since_check += 1
+            if since_check >= window:
+                since_check = 0
+                if baseline is None:
+                    release_memory()
+                    baseline = current_rss()
+                    continue
+                enforce_ceiling(ceiling, baseline)
+
+
+def enforce_ceiling(ceiling: int, baseline: int = 0):
+    """Free cached memory, then raise if process RSS growth is still over the ceiling."""
+    release_memory()
+    if not ceiling:
+        return
+    growth = current_rss() - baseline
+    if growth <= ceiling:
+        return
+    print(f"RSS grew {format_bytes(growth)} while streaming a PDF, over the {format_bytes(ceiling)} ceiling",
+          file=sys.stderr)
+    increment("pdf_memory_ceiling_exceeded")
+    raise MemoryCeilingExceeded(
+        f"Server memory grew {format_bytes(growth)} while processing this PDF, "
+        f"over the {format_bytes(ceiling)} ceiling; try again later or upload a smaller file"
+    )
+
+
+def extract_text_streaming(pdf_path: str, window: int = WINDOW_PAGES, ceiling: int = MEMORY_CEILING_BYTES) -> str:
+    """Extract page texts in a bounded window; only the text itself is kept."""
+    texts = []
+    for _, page in iter_pdf_pages(pdf_path, window, ceiling):
+        text = page.get_text()
+        if text:
+            texts.append(text)
+    return "\n".join(texts) + "\n" if texts else ""
+
+
+def _measure(label: str, fn):
+    """Run fn in a child process and report its peak RSS."""
+    import multiprocessing
+
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        characters, peak, start = pool.apply(_measured_call, (fn,))
+    print(f"{label:10s} {characters:10d} chars  peak RSS {format_bytes(peak)} (+{format_bytes(peak - start)})")
+    return peak
+
+
+def _measured_call(fn):
+    from memory import PeakRSS
+
+    with PeakRSS() as rss:
+        text = fn()
+    return len(text), rss.peak, rss.start
+
+
+def _eager_extract(pdf_path):
+    """The previous PyPDF2 reader, which keeps every parsed page alive."""
+    import PyPDF2
+
+    with open(pdf_path, "rb") as handle:
+        reader = PyPDF2.PdfReader(handle)
+        return "".join(page.extract_text() + "\n" for page in reader.pages)
+
+
+if __name__ == "__main__":
+    import functools
+    from tests.fixtures import make_large_pdf
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with tempfile.TemporaryDirectory(prefix="mindsnap_pdfstream_") as directory:
+        path = os.path.join(directory, "large.pdf")
+        make_large_pdf(path, count)
+        print(f"{count} pages, {format_bytes(os.path.getsize(path))} on disk")
+        eager = _measure("eager", functools.partial(_eager_extract, path))
+        streamed = _measure("streamed", functools.partial(extract_text_streaming, path))
+        print(f"streamed peak is {streamed / eager:.0%} of eager")
@@ -0,0 +1,152 @@
+import hashlib
+import threading
+
+# Bump when the shared template wording changes; per-genre instruction edits
+# are picked up automatically through the template hash.
+PROMPT_VERSION = 2
+
+GENRE_INSTRUCTIONS = {
+    "factual": """Write 4-6 flashcards that focus on direct, concrete facts, dates, names, and specific information.
+- Be clear, concise, and objective.
+- Avoid speculation or narrative.
+- Each card should deliver a standalone fact or data point.""",
+    "conceptual": """Write 4-6 flashcards that explain scientific, technical, or theoretical concepts in depth.
+- Focus on principles, mechanisms, relationships, and "how/why" explanations.
+-Do NOT use bold text or headings (using "**Concept:**" or "**Explanation:**" is not allowed).
+- Use analogies or diagrams if helpful.
+- Cards should help the learner understand the underlying ideas, not just memorize facts.""",
+    "genz": """Write 4-6 flashcards in a Gen-Z style:
+- Use memes, slang, and pop culture references (but do NOT use emojis).
+- Make it funny, relatable, and surprising.
+- Each card should have a playful, energetic vibe and spark curiosity.
+- Think TikTok, not textbook.
+- Do NOT use emojis.""",
+    "story": """Write 4-6 flashcards that present the content as a vivid, engaging story or narrative.
+- Use storytelling techniques: characters, conflict, suspense, or a journey.
+- Each card should feel like a scene or plot point.
+- End with a cliffhanger or emotional beat (except the last card, which should conclude the story)."""
+}
+
+# How the input is labelled in the prompt for each kind of source
+SOURCE_LABELS = {
+    "transcript": "Transcript",
+    "text": "Input Text",
+    "pdf": "Transcript",
+    "image": "Input Text",
+}
+
+FLASHCARD_OUTPUT_FORMAT = """Return your output in the following JSON format. For each flashcard, you must provide a "title" that is a 2-3 word catchy phrase summarizing the card's content, and the "content" of the flashcard.
+{
+  "flashcards": [
+    {
+      "id": 1,
+      "title": "A Catchy Title",
+      "content": "..."
+    },
+    ...
+  ]
+}"""
+
+MULTI_GENRE_OUTPUT_FORMAT = """Return your output in the following JSON format, with the flashcards for every style in ONE "flashcards" list. For each flashcard, you must provide the "genre" it was written for (exactly one of the style names above, in lowercase), a "title" that is a 2-3 word catchy phrase summarizing the card's content, and the "content" of the flashcard.
+{
+  "flashcards": [
+    {
+      "id": 1,
+      "genre": "style name",
+      "title": "A Catchy Title",
+      "content": "..."
+    },
+    ...
+  ]
+}"""
+
+
+class PromptTemplate:
+    """A prompt split into a static prefix and the variable input.
+
+    Everything that does not depend on the input (style rules and output
+    format) comes first, so identical prefixes across requests can be
+    served from the provider's prefix cache. Rendering is a single string
+    concatenation.
+    """
+
+    __slots__ = ("name", "prefix", "version")
+
+    def __init__(self, name: str, prefix: str):
+        self.name = name
+        self.prefix = prefix
+        digest = hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:8]
+        self.version = f"{name}@v{PROMPT_VERSION}-{digest}"
+
+    def render(self, text: str) -> str:
+        return self.prefix + text + "\n"
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def get_genre_prompt(genre: str) -> str:
+    if genre not in GENRE_INSTRUCTIONS:
+        raise ValueError(f"Unknown genre: '{genre}'. Must be one of: {', '.join(GENRE_INSTRUCTIONS.keys())}")
+    return GENRE_INSTRUCTIONS[genre]
+
+
+def register_genre(genre: str, instructions: str):
+    """Add (or replace) a genre; every source type picks it up."""
+    genre = genre.strip().lower()
+    with _templates_lock:
+        GENRE_INSTRUCTIONS[genre] = instructions
+        for key in [key for key in _templates if genre in key[0].split("+")]:
+            del _templates[key]
+
+
+def get_flashcard_template(genre: str, source: str) -> PromptTemplate:
+    """Compiled flashcard prompt for a (genre, source type) pair, built once."""
+    genre = genre.strip().lower()
+    key = (genre, source)
+    with _templates_lock:
+        template = _templates.get(key)
+        if template is None:
+            if source not in SOURCE_LABELS:
+                raise ValueError(f"Unknown source type: '{source}'. Must be one of: {', '.join(SOURCE_LABELS)}")
+            prefix = f"""IMPORTANT: You must write the flashcards in the **{genre.upper()}** style ONLY. Do NOT mix with other styles. Follow the instructions for this style exactly.
+
+GENRE INSTRUCTION:
+{get_genre_prompt(genre)}
+
+---
+{FLASHCARD_OUTPUT_FORMAT}
+
+---
+{SOURCE_LABELS[source]}:
+"""
+            template = _templates[key] = PromptTemplate(f"flashcards/{genre}/{source}", prefix)
+        return template
+
+
+def get_multi_genre_template(genres: list, source: str) -> PromptTemplate:
+    """Compiled prompt that writes one separate set of flashcards per genre from the same input."""
+    genres = [genre.strip().lower() for genre in genres]
+    key = ("+".join(genres), source)
+    with _templates_lock:
+        template = _templates.get(key)
+        if template is None:
+            if source not in SOURCE_LABELS:
+                raise ValueError(f"Unknown source type: '{source}'. Must be one of: {', '.join(SOURCE_LABELS)}")
+            sections = "\n\n".join(
+                f"STYLE \"{genre}\":\n{get_genre_prompt(genre)}" for genre in genres
+            )
+            prefix = f"""IMPORTANT: You must write a SEPARATE set of flashcards for EACH of these styles: {", ".join(genre.upper() for genre in genres)}. Each set follows ONLY its own style's instructions exactly; do NOT mix styles within a set. All sets cover the same input.
+
+GENRE INSTRUCTIONS:
+{sections}
+
+---
+{MULTI_GENRE_OUTPUT_FORMAT}
+
+---
+{SOURCE_LABELS[source]}:
+"""
+            template = _templates[key] = PromptTemplate(f"flashcards/{key[0]}/{source}", prefix)
+        return template
@@ -1,20 +1,29 @@
-import os
 import json
 import sys
-from dotenv import load_dotenv
-import google.generativeai as genai
-import re
+from llm_client import generate_json
+from token_budget import fit_items_to_budget
+from quiz_local import generate_local_quiz, can_build_local_quiz
 
-load_dotenv()
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+QUIZ_MODES = ("llm", "local", "auto")
 
-def generate_quiz(flashcards: list) -> dict:
+def generate_quiz(flashcards: list, mode: str = "llm", related_flashcards: list = None) -> dict:
+    """Generate quiz questions from flashcards.
+
+    mode="llm" always uses Gemini, mode="local" builds the quiz from the
+    flashcards themselves, and mode="auto" tries the local builder first and
+    falls back to Gemini when the deck is too small for it.
+    """
+    if mode not in QUIZ_MODES:
+        raise ValueError(f"Unknown quiz mode: '{mode}'. Must be one of: {', '.join(QUIZ_MODES)}")
+    if mode == "local":
+        return generate_local_quiz(flashcards, related_flashcards)
+    if mode == "auto" and can_build_local_quiz(flashcards, related_flashcards):
+        return generate_local_quiz(flashcards, related_flashcards)
+    return generate_llm_quiz(flashcards)
+
+def generate_llm_quiz(flashcards: list) -> dict:
     """Generate quiz questions from flashcards using Gemini."""
     try:
-        print("Configuring Gemini API...", file=sys.stderr)
-        genai.configure(api_key=GOOGLE_API_KEY)
-        model = genai.GenerativeModel('gemini-1.5-flash')
-
         # Prepare the prompt
         prompt = f"""
 You are an expert quiz creator. Given the following flashcards, generate a set of 4-6 multiple-choice quiz questions that test understanding of the material. Each question should:
@@ -39,34 +48,13 @@ Return your output in the following JSON format:
 }}
 
 Flashcards:
-{json.dumps(flashcards, ensure_ascii=False)}
+{fit_items_to_budget(flashcards, "quiz")}
 """
 
         print("Generating quiz with Gemini...", file=sys.stderr)
-        response = model.generate_content(prompt)
-        response_text = response.text.strip()
-        print("Received response from Gemini", file=sys.stderr)
-
-        # Try to parse the response as JSON
-        try:
-            quiz_data = json.loads(response_text)
-            if not isinstance(quiz_data, dict) or 'quiz' not in quiz_data:
-                raise ValueError("Invalid response format")
-            print(f"Successfully generated {len(quiz_data['quiz'])} quiz questions", file=sys.stderr)
-            return quiz_data
-        except json.JSONDecodeError:
-            # If JSON parsing fails, try to extract JSON from the text
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                try:
-                    quiz_data = json.loads(json_match.group())
-                    if not isinstance(quiz_data, dict) or 'quiz' not in quiz_data:
-                        raise ValueError("Invalid response format")
-                    print(f"Successfully generated {len(quiz_data['quiz'])} quiz questions", file=sys.stderr)
-                    return quiz_data
-                except json.JSONDecodeError:
-                    raise ValueError("Could not parse JSON from response")
-            raise ValueError("No JSON found in response")
+        quiz_data = generate_json(prompt, "quiz", endpoint="quiz")
+        print(f"Successfully generated {len(quiz_data['quiz'])} quiz questions", file=sys.stderr)
+        return quiz_data
     except Exception as e:
         print(f"Error generating quiz: {str(e)}", file=sys.stderr)
         raise
@@ -88,9 +76,11 @@ if __name__ == "__main__":
         input_data = sys.stdin.read().strip()
         flashcards_json = json.loads(input_data)
         flashcards = flashcards_json["flashcards"] if "flashcards" in flashcards_json else flashcards_json
+        mode = flashcards_json.get("mode", "llm") if isinstance(flashcards_json, dict) else "llm"
+        related = flashcards_json.get("relatedFlashcards") if isinstance(flashcards_json, dict) else None
         print(f"Received {len(flashcards)} flashcards", file=sys.stderr)
 
-        quiz = generate_quiz(flashcards)
+        quiz = generate_quiz(flashcards, mode, related)
         quiz_clean = clean_surrogates(quiz)
         # Always encode with errors="replace" to avoid surrogate errors
         sys.stdout.buffer.write(json.dumps(quiz_clean, ensure_ascii=False).encode("utf-8", errors="replace"))
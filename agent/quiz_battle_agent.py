@@ -2,8 +2,8 @@ import os
 import json
 import sys
 from dotenv import load_dotenv
-import google.generativeai as genai
-import re
+from llm_client import generate_json
+from token_budget import trim_to_budget
 
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
@@ -11,9 +11,7 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 def generate_battle_quiz(topic: str, difficulty: str = "intermediate", num_questions: int = 5) -> dict:
     """Generate battle quiz questions for a specific topic using Gemini."""
     try:
-        print(f"Configuring Gemini API for topic: {topic}", file=sys.stderr)
-        genai.configure(api_key=GOOGLE_API_KEY)
-        model = genai.GenerativeModel('gemini-1.5-flash')
+        topic = trim_to_budget(topic, "battle_quiz")
 
         # Prepare the prompt
         prompt = f"""
@@ -58,30 +56,9 @@ Number of questions: {num_questions}
 """
 
         print("Generating battle quiz with Gemini...", file=sys.stderr)
-        response = model.generate_content(prompt)
-        response_text = response.text.strip()
-        print("Received response from Gemini", file=sys.stderr)
-
-        # Try to parse the response as JSON
-        try:
-            quiz_data = json.loads(response_text)
-            if not isinstance(quiz_data, dict) or 'quiz' not in quiz_data:
-                raise ValueError("Invalid response format")
-            print(f"Successfully generated {len(quiz_data['quiz'])} battle quiz questions", file=sys.stderr)
-            return quiz_data
-        except json.JSONDecodeError:
-            # If JSON parsing fails, try to extract JSON from the text
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                try:
-                    quiz_data = json.loads(json_match.group())
-                    if not isinstance(quiz_data, dict) or 'quiz' not in quiz_data:
-                        raise ValueError("Invalid response format")
-                    print(f"Successfully generated {len(quiz_data['quiz'])} battle quiz questions", file=sys.stderr)
-                    return quiz_data
-                except json.JSONDecodeError:
-                    raise ValueError("Could not parse JSON from response")
-            raise ValueError("No JSON found in response")
+        quiz_data = generate_json(prompt, "battle_quiz", endpoint="battle_quiz")
+        print(f"Successfully generated {len(quiz_data['quiz'])} battle quiz questions", file=sys.stderr)
+        return quiz_data
     except Exception as e:
         print(f"Error generating battle quiz: {str(e)}", file=sys.stderr)
         raise
@@ -0,0 +1,104 @@
+import re
+import sys
+import random
+import hashlib
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+from metrics import timed
+
+MAX_QUESTIONS = 6
+NUM_OPTIONS = 4
+MAX_SNIPPET_CHARS = 220
+
+
+def _card_text(card):
+    """Combine a flashcard's title and content into one string for vectorizing."""
+    return f"{card.get('title', '')} {card.get('content', '')}".strip()
+
+
+def _describe(card):
+    """Build the question stem from the card content, hiding the title words."""
+    content = re.sub(r'\s+', ' ', card.get("content", "")).strip()
+    title = card.get("title", "").strip()
+    for word in sorted(set(re.findall(r'\w{4,}', title)), key=len, reverse=True):
+        content = re.sub(rf'\b{re.escape(word)}\b', '_____', content, flags=re.IGNORECASE)
+    if len(content) > MAX_SNIPPET_CHARS:
+        content = content[:MAX_SNIPPET_CHARS].rsplit(' ', 1)[0] + '...'
+    return content
+
+
+def _seed_for(card):
+    """Stable per-card seed so the same deck always yields the same quiz."""
+    return int(hashlib.sha1(_card_text(card).encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _usable(cards):
+    """Keep only cards that have both a title and content, de-duplicated by title."""
+    seen = set()
+    usable = []
+    for card in cards or []:
+        if not isinstance(card, dict):
+            continue
+        title = str(card.get("title", "")).strip()
+        content = str(card.get("content", "")).strip()
+        if not title or not content or title.lower() in seen:
+            continue
+        seen.add(title.lower())
+        usable.append({"title": title, "content": content})
+    return usable
+
+
+def can_build_local_quiz(flashcards, related_flashcards=None):
+    """Return True when there are enough titled cards to build a local quiz."""
+    deck = _usable(flashcards)
+    pool = _usable(list(flashcards or []) + list(related_flashcards or []))
+    return bool(deck) and len(pool) >= NUM_OPTIONS
+
+
+@timed("local_quiz")
+def generate_local_quiz(flashcards: list, related_flashcards: list = None) -> dict:
+    """Build a multiple-choice quiz from flashcards without calling the LLM.
+
+    Each question shows a card's content (with its title words blanked out)
+    and asks for the matching title. Distractors are the titles of the most
+    TF-IDF-similar cards in the deck, plus any ``related_flashcards`` from
+    the user's other decks.
+    """
+    deck = _usable(flashcards)
+    deck_titles = {card["title"].lower() for card in deck}
+    extra = [card for card in _usable(related_flashcards) if card["title"].lower() not in deck_titles]
+    pool = deck + extra
+
+    if not deck or len(pool) < NUM_OPTIONS:
+        raise ValueError(f"Need at least {NUM_OPTIONS} titled flashcards to build a local quiz")
+
+    print(f"Building local quiz from {len(deck)} flashcards ({len(extra)} related)...", file=sys.stderr)
+
+    vectorizer = TfidfVectorizer(stop_words='english', ngram_range=(1, 2), sublinear_tf=True)
+    try:
+        matrix = vectorizer.fit_transform([_card_text(card) for card in pool])
+        similarity = cosine_similarity(matrix[:len(deck)], matrix)
+    except ValueError:
+        # Every card was made of stop words; fall back to uniform similarity
+        similarity = [[0.0] * len(pool) for _ in deck]
+
+    quiz = []
+    for index, card in enumerate(deck[:MAX_QUESTIONS]):
+        ranked = sorted(
+            (j for j in range(len(pool)) if j != index),
+            key=lambda j: (-float(similarity[index][j]), pool[j]["title"].lower())
+        )
+        distractors = [pool[j]["title"] for j in ranked[:NUM_OPTIONS - 1]]
+
+        options = [card["title"]] + distractors
+        random.Random(_seed_for(card)).shuffle(options)
+
+        quiz.append({
+            "id": index + 1,
+            "question": f"Which concept does this describe? \"{_describe(card)}\"",
+            "options": options,
+            "correct_answer": options.index(card["title"])
+        })
+
+    print(f"Successfully generated {len(quiz)} local quiz questions", file=sys.stderr)
+    return {"quiz": quiz, "source": "local"}
@@ -0,0 +1,222 @@
+import json
+import re
+import sys
+import time
+from collections import deque
+
+# Per-endpoint response schemas: the top-level list key and, for each item,
+# the fields it must carry and the type they must have.
+SCHEMAS = {
+    "flashcards": {
+        "list_key": "flashcards",
+        "item_fields": {"content": str},
+    },
+    "quiz": {
+        "list_key": "quiz",
+        "item_fields": {"question": str, "options": list, "correct_answer": int},
+    },
+    "battle_quiz": {
+        "list_key": "quiz",
+        "item_fields": {"question": str, "options": list, "correct_answer": int},
+    },
+}
+
+MAX_REPAIR_ATTEMPTS = 8
+CLOSERS = {"{": "}", "[": "]"}
+DECODER = json.JSONDecoder()
+STRUCTURAL_CHARS = re.compile(r'[{}\[\]",\\]')
+
+
+def strip_code_fences(text: str) -> str:
+    """Remove a surrounding ```json ... ``` (or bare ```) fence if present."""
+    text = text.strip()
+    if not text.startswith("```"):
+        return text
+    newline = text.find("\n")
+    text = text[newline + 1:] if newline != -1 else text[3:]
+    if text.rstrip().endswith("```"):
+        text = text.rstrip()[:-3]
+    return text.strip()
+
+
+def scan_json_object(text: str, start: int = 0):
+    """Linear brace scan for the JSON object starting at the first '{' at/after start.
+
+    Returns (begin, end, stack, in_string, cut_points). When the object is
+    complete, end is the index just past its closing brace and stack is empty.
+    When the text runs out first, end is None and stack/in_string describe
+    what is still open. cut_points keeps (index, stack) for the last few
+    commas outside a string (relative to begin), which the repair step uses
+    to drop a partial element.
+    """
+    begin = text.find("{", start)
+    if begin == -1:
+        return None, None, [], False, deque()
+
+    stack = []
+    cut_points = deque(maxlen=MAX_REPAIR_ATTEMPTS)
+    in_string = False
+    escaped_until = -1
+    # Jump straight between structural characters instead of walking every char
+    for match in STRUCTURAL_CHARS.finditer(text, begin):
+        index = match.start()
+        if index < escaped_until:
+            continue
+        char = match.group()
+        if in_string:
+            if char == "\\":
+                escaped_until = index + 2
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in CLOSERS:
+            stack.append(char)
+        elif char in "}]":
+            if not stack or CLOSERS[stack[-1]] != char:
+                # Mismatched bracket: treat everything so far as the object
+                return begin, index, stack, False, cut_points
+            stack.pop()
+            if not stack:
+                return begin, index + 1, [], False, cut_points
+        elif char == ",":
+            cut_points.append((index - begin, tuple(stack)))
+    return begin, None, stack, in_string, cut_points
+
+
+def _close(stack) -> str:
+    return "".join(CLOSERS[opener] for opener in reversed(stack))
+
+
+def repair_truncated_json(fragment: str, stack, in_string: bool, cut_points):
+    """Try to turn a truncated JSON object into a parseable one.
+
+    First closes any open string and brackets as-is; if that is not valid
+    (e.g. the text stopped after a key or mid-number), cuts back to the most
+    recent commas and closes from there, dropping the partial element.
+    Returns the parsed object or None.
+    """
+    candidates = [fragment + ('"' if in_string else "") + _close(stack)]
+    for index, cut_stack in reversed(cut_points):
+        candidates.append(fragment[:index] + _close(cut_stack))
+
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def extract_json_object(text: str, repair: bool = True) -> dict:
+    """Parse the outermost JSON object out of an LLM response.
+
+    Handles code fences, surrounding prose and (optionally) truncated output.
+    Complete objects are decoded in place with raw_decode, so nothing is
+    sliced, re-dumped or re-parsed; the brace scanner only runs when the
+    decoder hits the end of the text.
+    """
+    text = strip_code_fences(text)
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            return data
+    except json.JSONDecodeError:
+        pass
+
+    start = 0
+    for _ in range(MAX_REPAIR_ATTEMPTS):
+        begin = text.find("{", start)
+        if begin == -1:
+            break
+        try:
+            # C-speed decode of a complete object; also tells us where it ends
+            data, _ = DECODER.raw_decode(text, begin)
+            if isinstance(data, dict):
+                return data
+        except json.JSONDecodeError:
+            begin, end, stack, in_string, cut_points = scan_json_object(text, begin)
+            if end is None:
+                if repair:
+                    data = repair_truncated_json(text[begin:], stack, in_string, cut_points)
+                    if isinstance(data, dict):
+                        print("Repaired truncated JSON response", file=sys.stderr)
+                        return data
+                break
+        # Not a valid object (e.g. braces in prose); keep looking after it
+        start = begin + 1
+
+    raise ValueError("No JSON found in response")
+
+
+def validate_response(data: dict, schema_name: str) -> dict:
+    """Check parsed data against the endpoint schema, dropping malformed items.
+
+    Raises ValueError when the top-level shape is wrong or no valid item
+    survives.
+    """
+    schema = SCHEMAS[schema_name]
+    list_key = schema["list_key"]
+    if not isinstance(data, dict) or not isinstance(data.get(list_key), list):
+        raise ValueError(f"Invalid response format (missing '{list_key}')")
+
+    valid_items = []
+    for item in data[list_key]:
+        if not isinstance(item, dict):
+            continue
+        if not all(isinstance(item.get(field), kind) for field, kind in schema["item_fields"].items()):
+            continue
+        if "options" in item and not 0 <= item["correct_answer"] < len(item["options"]):
+            continue
+        valid_items.append(item)
+
+    if not valid_items:
+        raise ValueError(f"Response contained no valid '{list_key}' entries")
+    dropped = len(data[list_key]) - len(valid_items)
+    if dropped:
+        print(f"Dropped {dropped} malformed '{list_key}' entries", file=sys.stderr)
+    data[list_key] = valid_items
+    return data
+
+
+def parse_llm_response(response_text: str, schema_name: str, repair: bool = True) -> dict:
+    """Extract, repair and validate a JSON response for the given endpoint."""
+    if schema_name not in SCHEMAS:
+        raise ValueError(f"Unknown schema: '{schema_name}'. Must be one of: {', '.join(SCHEMAS.keys())}")
+    return validate_response(extract_json_object(response_text, repair), schema_name)
+
+
+def _benchmark(num_cards=20000, rounds=5):
+    """Compare this parser against the old regex fallback on a large response."""
+    cards = [{"id": i, "title": f"Card {i}", "content": "Some {braced} text, with \"quotes\". " * 4}
+             for i in range(num_cards)]
+    body = json.dumps({"flashcards": cards})
+    samples = {
+        "clean": body,
+        "fenced+prose": "Here you go:\n```json\n" + body + "\n```\nLet me know {if} you need more.",
+        "truncated": body[:int(len(body) * 0.9)],
+    }
+    print(f"Response size: {len(body) / 1e6:.1f} MB, {num_cards} cards")
+    for label, sample in samples.items():
+        started = time.perf_counter()
+        for _ in range(rounds):
+            result = parse_llm_response(sample, "flashcards")
+        elapsed = (time.perf_counter() - started) / rounds
+        print(f"  {label:14s} shared parser: {elapsed * 1000:8.1f} ms ({len(result['flashcards'])} cards)")
+
+        started = time.perf_counter()
+        try:
+            for _ in range(rounds):
+                try:
+                    json.loads(sample)
+                except json.JSONDecodeError:
+                    json.loads(re.search(r'\{.*\}', sample, re.DOTALL).group())
+            elapsed = (time.perf_counter() - started) / rounds
+            print(f"  {label:14s} regex fallback: {elapsed * 1000:7.1f} ms")
+        except (json.JSONDecodeError, AttributeError):
+            print(f"  {label:14s} regex fallback: failed")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,185 @@
+import os
+import re
+import sys
+import json
+import hashlib
+import threading
+import numpy as np
+from embeddings import embed, EMBEDDING_DIMENSION
+from metrics import span, increment
+
+INDEX_DIR = os.getenv("RETRIEVAL_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "retrieval"))
+TOP_K = int(os.getenv("RETRIEVAL_TOP_K", 5))
+PASSAGE_WORDS = 120
+PASSAGE_OVERLAP_WORDS = 20
+MIN_SCORE = 0.2
+DECK_ID_PATTERN = re.compile(r"[\w-]{1,64}")
+
+
+def _passage_id(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def split_passages(text: str) -> list:
+    """Split a transcript or document into overlapping word windows."""
+    words = text.split()
+    if not words:
+        return []
+    step = PASSAGE_WORDS - PASSAGE_OVERLAP_WORDS
+    return [" ".join(words[start:start + PASSAGE_WORDS])
+            for start in range(0, max(1, len(words) - PASSAGE_OVERLAP_WORDS), step)]
+
+
+def flashcard_passage(card: dict) -> str:
+    if card.get("question"):
+        return f"Q: {card['question']}\nA: {card.get('answer', '')}"
+    return f"{card.get('title', '')}\n{card.get('content', '')}".strip()
+
+
+class DeckIndex:
+    """Embedding index for one deck, stored on disk as an append-only matrix.
+
+    vectors.f16 holds one float16 row per passage and passages.jsonl the
+    matching text and source on the same line; both are only ever appended
+    to. The matrix is held in memory as float32 for fast search. Passages
+    are deduplicated by content hash, so re-indexing a deck only embeds
+    what is new.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.vectors_path = os.path.join(directory, "vectors.f16")
+        self.passages_path = os.path.join(directory, "passages.jsonl")
+        self._lock = threading.Lock()
+        self._passages = []
+        self._ids = set()
+        self._vectors = np.zeros((0, EMBEDDING_DIMENSION), dtype=np.float32)
+        if os.path.exists(self.passages_path) and os.path.exists(self.vectors_path):
+            passages = []
+            damaged = False
+            with open(self.passages_path, encoding="utf-8") as handle:
+                for line in handle:
+                    try:
+                        passages.append(json.loads(line))
+                    except ValueError:
+                        damaged = True
+                        break
+            vectors = np.fromfile(self.vectors_path, dtype=np.float16)
+            rows = min(len(passages), len(vectors) // EMBEDDING_DIMENSION)
+            self._passages = passages[:rows]
+            self._ids = {passage["id"] for passage in self._passages}
+            self._vectors = vectors[:rows * EMBEDDING_DIMENSION].reshape(rows, EMBEDDING_DIMENSION).astype(np.float32)
+            # An interrupted append can leave a partial line or extra vectors behind
+            if damaged or rows != len(passages) or rows * EMBEDDING_DIMENSION != len(vectors):
+                self._rewrite()
+
+    def add(self, passages: list) -> int:
+        """Embed and append passages ({"text", "source"}) not already indexed."""
+        with self._lock:
+            new = []
+            batch_ids = set()
+            for passage in passages:
+                text = passage["text"].strip()
+                passage_id = _passage_id(text)
+                if text and passage_id not in self._ids and passage_id not in batch_ids:
+                    batch_ids.add(passage_id)
+                    new.append({"id": passage_id, "text": text, "source": passage.get("source", "")})
+            if not new:
+                return 0
+
+            vectors = embed(passage["text"] for passage in new).astype(np.float16)
+            os.makedirs(self.directory, exist_ok=True)
+            sizes = [os.path.getsize(path) if os.path.exists(path) else 0
+                     for path in (self.vectors_path, self.passages_path)]
+            try:
+                with open(self.vectors_path, "ab") as handle:
+                    handle.write(vectors.tobytes())
+                with open(self.passages_path, "a", encoding="utf-8") as handle:
+                    for passage in new:
+                        handle.write(json.dumps(passage, ensure_ascii=False) + "\n")
+            except OSError:
+                # Roll both files back so they stay aligned with what is in memory
+                for path, size in zip((self.vectors_path, self.passages_path), sizes):
+                    if os.path.exists(path):
+                        os.truncate(path, size)
+                raise
+            # Ids are only recorded once the vectors are saved, so a failed add is retried
+            self._ids |= batch_ids
+            # Replace rather than mutate so concurrent searches keep a consistent view
+            self._passages = self._passages + new
+            self._vectors = np.vstack([self._vectors, vectors.astype(np.float32)])
+            return len(new)
+
+    def _rewrite(self):
+        """Drop rows left over from an interrupted append so both files line up again."""
+        print(f"Repairing retrieval index at {self.directory} ({len(self._passages)} passages)", file=sys.stderr)
+        self._vectors.astype(np.float16).tofile(self.vectors_path)
+        with open(self.passages_path, "w", encoding="utf-8") as handle:
+            for passage in self._passages:
+                handle.write(json.dumps(passage, ensure_ascii=False) + "\n")
+
+    def search(self, query: str, k: int = TOP_K, min_score: float = MIN_SCORE) -> list:
+        """Top-k passages by cosine similarity to the query, best first."""
+        with self._lock:
+            vectors = self._vectors
+            passages = self._passages
+        if not len(passages):
+            return []
+        query_vector = embed([query])[0]
+        with span("retrieval_search"):
+            scores = vectors @ query_vector
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+        return [
+            {"text": passages[i]["text"], "source": passages[i]["source"], "score": round(float(scores[i]), 3)}
+            for i in top if scores[i] >= min_score
+        ]
+
+    def __len__(self):
+        return len(self._passages)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def check_deck_id(deck_id: str):
+    if not DECK_ID_PATTERN.fullmatch(deck_id or ""):
+        raise ValueError("deckId must be 1-64 letters, digits, '_' or '-'")
+
+
+def get_index(deck_id: str) -> DeckIndex:
+    check_deck_id(deck_id)
+    with _indexes_lock:
+        index = _indexes.get(deck_id)
+        if index is None:
+            index = _indexes[deck_id] = DeckIndex(os.path.join(INDEX_DIR, deck_id))
+        return index
+
+
+def index_deck(deck_id: str, flashcards=None, sources=None) -> dict:
+    """Add a deck's flashcards and source texts (transcript/PDF) to its index.
+
+    sources is a list of {"text", "source"} where source labels the origin
+    (e.g. "transcript" or a file name); long texts are split into passages.
+    """
+    passages = [{"text": flashcard_passage(card), "source": "flashcard"} for card in flashcards or []]
+    for source in sources or []:
+        label = source.get("source", "source")
+        passages.extend({"text": text, "source": label} for text in split_passages(source.get("text", "")))
+    index = get_index(deck_id)
+    added = index.add(passages)
+    print(f"Indexed deck {deck_id}: {added} new passage(s), {len(index)} total", file=sys.stderr)
+    return {"deckId": deck_id, "added": added, "total": len(index)}
+
+
+def index_version(deck_id: str) -> int:
+    """Changes whenever passages are added to the deck (the index is append-only)."""
+    return len(get_index(deck_id))
+
+
+def retrieve(deck_id: str, query: str, k: int = TOP_K) -> list:
+    results = get_index(deck_id).search(query, k)
+    increment("retrieval_queries")
+    return results
@@ -0,0 +1,147 @@
+import os
+import re
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+from embeddings import embed
+from metrics import increment
+
+SIMILARITY_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.88))
+MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 5000))
+TTL_SECONDS = int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", 24 * 3600))
+
+# Languages students ask for by name; a request for one never matches another
+LANGUAGE_NAMES = (
+    "english", "hindi", "bengali", "bangla", "tamil", "telugu", "marathi", "gujarati", "kannada",
+    "malayalam", "punjabi", "urdu", "odia", "spanish", "french", "german", "italian", "portuguese",
+    "russian", "arabic", "chinese", "mandarin", "japanese", "korean", "indonesian", "turkish",
+)
+LANGUAGE_ALIASES = {"bangla": "bengali", "mandarin": "chinese"}
+LANGUAGE_PATTERN = re.compile(r"\b(" + "|".join(LANGUAGE_NAMES) + r")\b", re.IGNORECASE)
+
+
+def content_key(content: str, deck_id: str = None, deck_version: int = 0) -> str:
+    """Cache key for answers about content; deck_version changes whenever the deck is re-indexed."""
+    return hashlib.sha256(f"{deck_id or ''}\0{deck_version}\0{content}".encode("utf-8")).hexdigest()
+
+
+def question_language(question: str) -> str:
+    """Language bucket for a question: the language it asks for, else the script it is written in."""
+    match = LANGUAGE_PATTERN.search(question)
+    if match:
+        name = match.group(1).lower()
+        return LANGUAGE_ALIASES.get(name, name)
+    for char in question:
+        if char.isalpha() and ord(char) > 0x24F:
+            # e.g. "BENGALI LETTER KA" -> "bengali-script"
+            return unicodedata.name(char, "OTHER").split()[0].lower() + "-script"
+    return "default"
+
+
+def _normalize(question: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+
+
+class SemanticCache:
+    """Tutor answers keyed by content and question meaning.
+
+    Entries are grouped by (content hash, language); inside a group each
+    question's embedding is a row of a small matrix, so a lookup is one
+    matrix-vector product. A question whose cosine similarity to a cached
+    one is at least threshold reuses that answer. The oldest entries are
+    evicted beyond max_entries, and entries expire after ttl_seconds.
+    """
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD, max_entries: int = MAX_ENTRIES,
+                 ttl_seconds: int = TTL_SECONDS):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._groups = OrderedDict()  # (content key, language) -> {"vectors", "answers", "questions", "created"}
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key: str, question: str):
+        """Return (answer or None, question vector); pass the vector back to store()."""
+        group_key = (key, question_language(question))
+        normalized = _normalize(question)
+        with self._lock:
+            group = self._groups.get(group_key)
+            if group is not None:
+                self._expire(group_key, group)
+                group = self._groups.get(group_key)
+            if group is not None and normalized in group["questions"]:
+                # Same words: no need to embed the question at all
+                return self._hit(group_key, group["answers"][group["questions"].index(normalized)]), None
+
+        vector = embed([normalized])[0]
+        with self._lock:
+            group = self._groups.get(group_key)
+            if group is not None and len(group["answers"]):
+                scores = group["vectors"] @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    return self._hit(group_key, group["answers"][best]), vector
+            self.misses += 1
+        increment("semantic_cache_misses")
+        return None, vector
+
+    def store(self, key: str, question: str, answer: str, vector=None):
+        group_key = (key, question_language(question))
+        normalized = _normalize(question)
+        if vector is None:
+            vector = embed([normalized])[0]
+        with self._lock:
+            group = self._groups.get(group_key)
+            if group is None:
+                group = self._groups[group_key] = {
+                    "vectors": np.zeros((0, len(vector)), dtype=np.float32),
+                    "answers": [], "questions": [], "created": [],
+                }
+            group["vectors"] = np.vstack([group["vectors"], vector[None, :]])
+            group["answers"].append(answer)
+            group["questions"].append(normalized)
+            group["created"].append(time.monotonic())
+            self._groups.move_to_end(group_key)
+            self._size += 1
+            while self._size > self.max_entries and self._groups:
+                _, evicted = self._groups.popitem(last=False)
+                self._size -= len(evicted["answers"])
+
+    def _hit(self, group_key, answer: str) -> str:
+        self.hits += 1
+        self._groups.move_to_end(group_key)
+        increment("semantic_cache_hits")
+        return answer
+
+    def _expire(self, group_key, group):
+        cutoff = time.monotonic() - self.ttl_seconds
+        keep = [i for i, created in enumerate(group["created"]) if created >= cutoff]
+        if len(keep) == len(group["created"]):
+            return
+        self._size -= len(group["created"]) - len(keep)
+        if not keep:
+            del self._groups[group_key]
+            return
+        group["vectors"] = group["vectors"][keep]
+        for field in ("answers", "questions", "created"):
+            group[field] = [group[field][i] for i in keep]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._size,
+                "groups": len(self._groups),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+cache = SemanticCache()
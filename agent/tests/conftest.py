@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The agent modules are flat scripts run from agent/, so make them importable
+# the same way when pytest runs from the repository root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,50 @@
+"""Sample inputs shared by the tests, the load test and the benchmarks.
+
+Run from agent/, so scripts import them as tests.fixtures.
+"""
+import os
+
+SAMPLE_PARAGRAPHS = [
+    "The mitochondria is the powerhouse of the cell. It converts glucose and oxygen into ATP through cellular "
+    "respiration, which takes place in three stages: glycolysis, the Krebs cycle and the electron transport chain.",
+    "The French Revolution began in 1789 with the storming of the Bastille. Economic hardship, Enlightenment ideas "
+    "and the debts of the monarchy led to the end of absolute rule and the rise of Napoleon Bonaparte.",
+    "Newton's second law states that force equals mass times acceleration. A larger force produces a larger "
+    "acceleration, while a heavier object needs more force to reach the same acceleration.",
+    "Photosynthesis happens in the chloroplasts of plant cells. Light energy splits water molecules, releasing "
+    "oxygen, and the captured energy is used to turn carbon dioxide into glucose in the Calvin cycle.",
+]
+
+
+def make_sample_pdfs(directory: str, count: int) -> list:
+    """Write count multi-paragraph text PDFs and return their paths."""
+    import fitz
+
+    paths = []
+    for index in range(count):
+        path = os.path.join(directory, f"sample_{index}.pdf")
+        with fitz.open() as doc:
+            page = doc.new_page()
+            paragraphs = SAMPLE_PARAGRAPHS[index % len(SAMPLE_PARAGRAPHS):] + SAMPLE_PARAGRAPHS
+            text = "\n\n".join(paragraphs * 2)
+            page.insert_textbox(fitz.Rect(50, 50, 545, 800), text, fontsize=10)
+            doc.save(path)
+        paths.append(path)
+    return paths
+
+
+def make_large_pdf(path: str, pages: int):
+    """Write a text PDF with a raster image on every page, like a scanned textbook."""
+    import io
+    import fitz
+    from PIL import Image
+
+    sentence = "The mitochondria is the powerhouse of the cell and produces ATP for energy. "
+    with fitz.open() as doc:
+        for number in range(pages):
+            buffer = io.BytesIO()
+            Image.effect_noise((600, 800), 32 + number % 64).save(buffer, format="JPEG", quality=70)
+            page = doc.new_page()
+            page.insert_image(fitz.Rect(0, 0, 595, 842), stream=buffer.getvalue())
+            page.insert_textbox(fitz.Rect(40, 40, 555, 800), f"Page {number + 1}. " + sentence * 30, fontsize=9)
+        doc.save(path)
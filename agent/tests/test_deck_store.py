@@ -0,0 +1,22 @@
+import pytest
+
+from deck_store import Deck
+
+CARDS = {"flashcards": [{"content": "ATP powers the cell.", "title": "ATP", "hint": "energy"}]}
+
+
+def test_round_trip_keeps_extra_fields():
+    deck = Deck.from_result("biology", "flashcards", CARDS, source_hash="abc", genre="factual")
+    assert Deck.decode(deck.encode()).to_result() == CARDS
+
+
+@pytest.mark.parametrize("kind, result", [
+    ("flashcards", {"flashcards": ["ATP powers the cell."]}),
+    ("flashcards", {"flashcards": [None]}),
+    ("flashcards", {"flashcards": "ATP"}),
+    ("flashcards", ["not", "a", "result"]),
+    ("summary", {"summary": []}),
+])
+def test_invalid_results_raise_value_error(kind, result):
+    with pytest.raises(ValueError):
+        Deck.from_result("biology", kind, result)
@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip("sentence_transformers")  # semantic_cache and retrieval embed locally
+
+import flashcard_ask
+from semantic_cache import SemanticCache
+
+
+@pytest.fixture
+def ask(monkeypatch):
+    calls = []
+    deck = {"version": 3}
+    monkeypatch.setattr(flashcard_ask, "answer_cache", SemanticCache())
+    monkeypatch.setattr(flashcard_ask, "index_version", lambda deck_id: deck["version"])
+    monkeypatch.setattr(flashcard_ask, "retrieve", lambda deck_id, question: [{"text": "ATP powers the cell."}])
+
+    def generate_text(prompt, endpoint):
+        calls.append(prompt)
+        return f"answer {len(calls)}"
+
+    monkeypatch.setattr(flashcard_ask, "generate_text", generate_text)
+    return calls, deck
+
+
+def test_repeated_question_is_cached(ask):
+    calls, _ = ask
+    first = flashcard_ask.answer_flashcard_question("Mitochondria", "What is ATP?", "biology")
+    second = flashcard_ask.answer_flashcard_question("Mitochondria", "What is ATP?", "biology")
+    assert first == second
+    assert len(calls) == 1
+
+
+def test_reindexing_the_deck_invalidates_answers(ask):
+    calls, deck = ask
+    first = flashcard_ask.answer_flashcard_question("Mitochondria", "What is ATP?", "biology")
+    deck["version"] += 5
+    second = flashcard_ask.answer_flashcard_question("Mitochondria", "What is ATP?", "biology")
+    assert first != second
+    assert len(calls) == 2
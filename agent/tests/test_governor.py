@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+from governor import Governor, LLMOverloaded
+
+
+class UpstreamError(Exception):
+    def __init__(self, code):
+        super().__init__(f"status {code}")
+        self.code = code
+
+
+def make_governor(**kwargs):
+    governor = Governor(rpm=60000, tpm=10 ** 9, **kwargs)
+    governor.backoff = lambda attempt: 0
+    return governor
+
+
+def test_call_returns_result_and_frees_slot():
+    governor = make_governor(max_concurrency=2)
+    assert governor.call("quiz", 10, lambda: "ok") == "ok"
+    assert governor.stats()["active"] == 0
+
+
+def test_retries_throttling_then_gives_up():
+    governor = make_governor(max_concurrency=8, max_retries=2)
+    attempts = []
+
+    def throttled():
+        attempts.append(1)
+        raise UpstreamError(429)
+
+    with pytest.raises(LLMOverloaded):
+        governor.call("quiz", 10, throttled)
+    assert len(attempts) == 3
+    assert governor.stats()["concurrency_limit"] == 1
+    assert governor.stats()["active"] == 0
+
+
+def test_recovers_after_transient_throttle():
+    governor = make_governor(max_concurrency=4)
+    outcomes = iter([UpstreamError(503), "ok"])
+
+    def flaky():
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert governor.call("flashcard_ask", 10, flaky) == "ok"
+
+
+def test_client_errors_are_not_retried():
+    governor = make_governor()
+    attempts = []
+
+    def bad_request():
+        attempts.append(1)
+        raise UpstreamError(400)
+
+    with pytest.raises(UpstreamError):
+        governor.call("quiz", 10, bad_request)
+    assert len(attempts) == 1
+
+
+def test_concurrency_limit_is_enforced():
+    governor = make_governor(max_concurrency=2)
+    lock = threading.Lock()
+    running = [0, 0]  # current, peak
+    release = threading.Event()
+
+    def work():
+        with lock:
+            running[0] += 1
+            running[1] = max(running[1], running[0])
+        release.wait(0.2)
+        with lock:
+            running[0] -= 1
+
+    threads = [threading.Thread(target=governor.call, args=("quiz", 1, work)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert running[1] <= 2
+    assert governor.stats()["active"] == 0
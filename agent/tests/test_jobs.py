@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+from jobs import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, JobQueue
+
+
+def wait_for(queue, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in ("done", "failed", "cancelled"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(path=str(tmp_path / "jobs.sqlite3"), workers=1)
+    queue.register("echo", lambda params: {"echo": params["text"]}, required=("text",))
+    queue.register("boom", lambda params: 1 / 0)
+    return queue
+
+
+def test_runs_jobs_to_completion(queue):
+    queue.start()
+    done = wait_for(queue, queue.submit("echo", {"text": "hi"}))
+    assert done["status"] == "done"
+    assert done["result"] == {"echo": "hi"}
+    failed = wait_for(queue, queue.submit("boom", {}))
+    assert failed["status"] == "failed"
+    assert "division" in failed["error"]
+
+
+def test_rejects_unknown_kind_and_missing_params(queue):
+    with pytest.raises(ValueError):
+        queue.submit("nope", {})
+    with pytest.raises(ValueError):
+        queue.submit("echo", {})
+
+
+def test_queue_position_and_cancel(queue):
+    first = queue.submit("echo", {"text": "a"})
+    second = queue.submit("echo", {"text": "b"})
+    urgent = queue.submit("echo", {"text": "c"}, priority=PRIORITY_HIGH)
+    assert queue.get(urgent)["queuePosition"] == 0
+    assert queue.get(second)["queuePosition"] == 2
+    assert queue.cancel(first)
+    assert queue.get(first)["status"] == "cancelled"
+    assert not queue.cancel(first)
+
+
+def test_client_priority_is_clamped(queue):
+    assert queue.client_priority("echo", 0) == PRIORITY_NORMAL
+    assert queue.client_priority("echo", "99") == PRIORITY_LOW
+    with pytest.raises(ValueError):
+        queue.client_priority("echo", "soon")
+
+
+def test_running_jobs_are_requeued_on_restart(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    queue = JobQueue(path=path, workers=1)
+    queue.register("echo", lambda params: params)
+    job_id = queue.submit("echo", {"text": "x"})
+    queue._db.execute("UPDATE jobs SET status = 'running' WHERE id = ?", (job_id,))
+    queue._db.commit()
+    assert JobQueue(path=path, workers=1).get(job_id)["status"] == "queued"
@@ -0,0 +1,37 @@
+import pytest
+
+import pdf_stream
+from memory import PeakRSS
+from tests.fixtures import make_large_pdf
+
+PAGES = 150
+CEILING = 256 * 1024 * 1024
+
+
+@pytest.fixture(scope="module")
+def large_pdf(tmp_path_factory):
+    path = tmp_path_factory.mktemp("pdf_stream") / "large.pdf"
+    make_large_pdf(str(path), PAGES)
+    return str(path)
+
+
+def test_streaming_stays_under_ceiling(large_pdf):
+    with PeakRSS(interval=0.01) as rss:
+        text = pdf_stream.extract_text_streaming(large_pdf, window=8, ceiling=CEILING)
+    assert text.count("powerhouse of the cell") >= PAGES
+    assert f"Page {PAGES}." in text
+    assert rss.growth < CEILING
+
+
+def test_growth_over_ceiling_rejects_document(large_pdf, monkeypatch):
+    readings = iter(range(0, 10 ** 12, 64 * 1024 * 1024))
+    monkeypatch.setattr(pdf_stream, "current_rss", lambda: next(readings))
+    with pytest.raises(pdf_stream.MemoryCeilingExceeded):
+        pdf_stream.extract_text_streaming(large_pdf, window=4, ceiling=100 * 1024 * 1024)
+
+
+def test_zero_ceiling_disables_guard(large_pdf, monkeypatch):
+    readings = iter(range(0, 10 ** 12, 1024 * 1024 * 1024))
+    monkeypatch.setattr(pdf_stream, "current_rss", lambda: next(readings))
+    text = pdf_stream.extract_text_streaming(large_pdf, window=4, ceiling=0)
+    assert f"Page {PAGES}." in text
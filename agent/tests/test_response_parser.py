@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from response_parser import extract_json_object, parse_llm_response
+
+CARDS = {"flashcards": [{"content": "ATP is made in the mitochondria."}, {"content": "Newton's second law."}]}
+
+
+def test_parses_fenced_json_with_prose():
+    text = "Here you go:\n```json\n" + json.dumps(CARDS) + "\n```\nLet me know!"
+    assert parse_llm_response(text, "flashcards") == CARDS
+
+
+def test_repairs_truncated_output():
+    text = json.dumps(CARDS)[:-20]
+    data = parse_llm_response(text, "flashcards")
+    assert data["flashcards"][0]["content"] == "ATP is made in the mitochondria."
+
+
+def test_drops_malformed_items():
+    quiz = {"quiz": [
+        {"question": "2 + 2?", "options": ["3", "4"], "correct_answer": 1},
+        {"question": "Out of range", "options": ["a"], "correct_answer": 3},
+        "not an object",
+    ]}
+    assert parse_llm_response(json.dumps(quiz), "quiz")["quiz"] == quiz["quiz"][:1]
+
+
+def test_rejects_missing_list_and_unknown_schema():
+    with pytest.raises(ValueError):
+        parse_llm_response('{"cards": []}', "flashcards")
+    with pytest.raises(ValueError):
+        parse_llm_response(json.dumps(CARDS), "summary")
+
+
+def test_no_json():
+    with pytest.raises(ValueError):
+        extract_json_object("The model refused to answer.")
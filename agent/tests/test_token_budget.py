@@ -0,0 +1,37 @@
+from tests.fixtures import SAMPLE_PARAGRAPHS
+from token_budget import (compress_text, estimate_tokens, get_budget, prepare_input, split_to_budget,
+                          trim_to_budget)
+
+TEXT = "\n\n".join(SAMPLE_PARAGRAPHS * 20)
+
+
+def test_budget_env_override(monkeypatch):
+    monkeypatch.setenv("TOKEN_BUDGET_QUIZ", "123")
+    assert get_budget("quiz") == 123
+    assert get_budget("no_such_endpoint") == get_budget("flashcards")
+
+
+def test_split_respects_budget():
+    chunks = split_to_budget(TEXT, 200)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 200 for chunk in chunks)
+
+
+def test_compress_strips_boilerplate_but_never_empties():
+    text = "Page 3 of 10\n" + SAMPLE_PARAGRAPHS[0] + "\n[Music]\n12:04"
+    assert compress_text(text) == SAMPLE_PARAGRAPHS[0]
+    assert compress_text("Page 1 of 2") == "Page 1 of 2"
+
+
+def test_prepare_input_chunks_long_documents(monkeypatch):
+    monkeypatch.setenv("TOKEN_BUDGET_FLASHCARDS_PDF", "300")
+    chunks = prepare_input(TEXT, "flashcards_pdf", max_chunks=3)
+    assert len(chunks) == 3
+    assert all(estimate_tokens(chunk) <= 300 for chunk in chunks)
+
+
+def test_trim_keeps_the_start(monkeypatch):
+    monkeypatch.setenv("TOKEN_BUDGET_FLASHCARD_ASK", "50")
+    trimmed = trim_to_budget(TEXT, "flashcard_ask")
+    assert estimate_tokens(trimmed) <= 50
+    assert TEXT.startswith(trimmed)
@@ -0,0 +1,88 @@
+import types
+
+import pytest
+
+pytest.importorskip("sentence_transformers")  # flashcard_ask pulls in retrieval
+
+import tutor_sessions
+from token_budget import estimate_tokens, get_budget
+
+
+class FakeModel:
+    def __init__(self, system_instruction=None, cached_content=None):
+        self.system_instruction = system_instruction
+        self.cached_content = cached_content
+
+    def start_chat(self):
+        return types.SimpleNamespace(history=[])
+
+
+class FakeCachedContent:
+    created = []
+    fail = False
+
+    def __init__(self, system_instruction):
+        self.system_instruction = system_instruction
+        self.deleted = False
+
+    @classmethod
+    def create(cls, model, system_instruction, ttl):
+        if cls.fail:
+            raise RuntimeError("caching not enabled for this key")
+        cached = cls(system_instruction)
+        cls.created.append(cached)
+        return cached
+
+    def delete(self):
+        self.deleted = True
+
+
+@pytest.fixture
+def fake_genai(monkeypatch):
+    FakeCachedContent.created = []
+    FakeCachedContent.fail = False
+    genai = types.SimpleNamespace(
+        caching=types.SimpleNamespace(CachedContent=FakeCachedContent),
+        GenerativeModel=types.SimpleNamespace(
+            from_cached_content=lambda cached: FakeModel(cached_content=cached)
+        ),
+    )
+    monkeypatch.setattr(tutor_sessions, "genai", genai)
+    monkeypatch.setattr(tutor_sessions, "get_model", lambda system_instruction=None: FakeModel(system_instruction))
+    return genai
+
+
+def _content(tokens: int) -> str:
+    paragraph = "Photosynthesis converts light energy into chemical energy in the chloroplast. " * 10
+    text = paragraph
+    while estimate_tokens(text) < tokens:
+        text += "\n\n" + paragraph
+    return text
+
+
+def test_session_budget_reaches_context_cache():
+    assert get_budget("tutor_session") >= tutor_sessions.CONTEXT_CACHE_MIN_TOKENS
+
+
+def test_small_content_uses_system_instruction(fake_genai):
+    store = tutor_sessions.SessionStore()
+    session = store.create(_content(500))
+    assert session.cached_content is None
+    assert FakeCachedContent.created == []
+    assert "Photosynthesis" in session.content
+
+
+def test_large_content_uses_context_cache(fake_genai):
+    store = tutor_sessions.SessionStore()
+    session = store.create(_content(tutor_sessions.CONTEXT_CACHE_MIN_TOKENS + 2000))
+    assert estimate_tokens(session.content) >= tutor_sessions.CONTEXT_CACHE_MIN_TOKENS
+    assert session.cached_content is FakeCachedContent.created[0]
+    assert store.close(session.session_id)
+    assert FakeCachedContent.created[0].deleted
+
+
+def test_cache_failure_falls_back_to_system_instruction(fake_genai):
+    FakeCachedContent.fail = True
+    store = tutor_sessions.SessionStore()
+    session = store.create(_content(tutor_sessions.CONTEXT_CACHE_MIN_TOKENS + 2000))
+    assert session.cached_content is None
@@ -0,0 +1,60 @@
+import io
+import os
+
+import pytest
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+import uploads
+from uploads import UploadTooLarge, spooled_upload, upload_suffix
+
+PDF = b"%PDF-1.4\n" + b"0" * 100
+PNG = b"\x89PNG\r\n\x1a\n" + b"0" * 100
+
+
+def raw_request(body, content_type="application/octet-stream", headers=None, query=None):
+    return Request(EnvironBuilder(method="POST", data=body, content_type=content_type, headers=headers,
+                                  query_string=query).get_environ())
+
+
+@pytest.mark.parametrize("filename, mimetype, head, expected", [
+    ("notes.PDF", "application/octet-stream", PNG, ".pdf"),
+    (None, "image/png", PDF, ".png"),
+    (None, "application/octet-stream", PDF, ".pdf"),
+    ("scan", "application/octet-stream", b"\xff\xd8\xff\xe0", ".jpg"),
+    (None, "application/octet-stream", b"RIFF\x00\x00\x00\x00WEBPVP8 ", ".webp"),
+    ("../../etc/passwd", "", b"plain text", ".png"),
+    ("bad.p\x00df", "", b"plain text", ".png"),
+])
+def test_upload_suffix(filename, mimetype, head, expected):
+    assert upload_suffix(filename, mimetype, head, ".png") == expected
+
+
+def test_raw_body_keeps_named_extension_and_is_removed():
+    request = raw_request(PNG, headers={"X-Filename": "diagram.png"})
+    with spooled_upload(request, ".pdf") as (path, digest):
+        assert path.endswith(".png")
+        with open(path, "rb") as handle:
+            assert handle.read() == PNG
+    assert not os.path.exists(path)
+
+
+def test_raw_octet_stream_is_sniffed():
+    with spooled_upload(raw_request(PDF), ".png") as (path, _):
+        assert path.endswith(".pdf")
+
+
+def test_multipart_upload():
+    request = Request(EnvironBuilder(method="POST", data={"file": (io.BytesIO(PDF), "lecture.pdf")}).get_environ())
+    with spooled_upload(request, ".png") as (path, _):
+        assert path.endswith(".pdf")
+
+
+def test_empty_and_oversized_bodies(monkeypatch):
+    with pytest.raises(ValueError):
+        with spooled_upload(raw_request(b"")):
+            pass
+    monkeypatch.setattr(uploads, "MAX_UPLOAD_BYTES", 50)
+    with pytest.raises(UploadTooLarge):
+        with spooled_upload(raw_request(PDF)):
+            pass
@@ -0,0 +1,205 @@
+import os
+import re
+import json
+import sys
+import threading
+from collections import defaultdict, Counter
+
+# Rough local tokenizer: words are split into <=4 character pieces and each
+# punctuation mark counts on its own, which tracks Gemini's SentencePiece
+# counts closely enough for budgeting without a network round trip.
+TOKEN_PATTERN = re.compile(r"\w{1,4}|[^\w\s]")
+
+# Per-endpoint input budgets (tokens of user-supplied input per LLM call).
+# Override with e.g. TOKEN_BUDGET_FLASHCARDS=20000 in the environment.
+DEFAULT_BUDGETS = {
+    "flashcards": 12000,
+    "flashcards_text": 12000,
+    "flashcards_pdf": 12000,
+    "flashcards_image": 12000,
+    "quiz": 6000,
+    "battle_quiz": 200,
+    "flashcard_ask": 3000,
+    # Tutor sessions send their content once; large decks go to a provider-side
+    # context cache, so this must stay above tutor_sessions.CONTEXT_CACHE_MIN_TOKENS
+    "tutor_session": 100000,
+}
+DEFAULT_MAX_CHUNKS = 4
+# Endpoints fed by extracted documents (transcripts, PDF text, OCR). Only
+# these get boilerplate stripping; typed text, topics and questions are
+# never filtered, only cut to budget.
+EXTRACTED_ENDPOINTS = {"flashcards", "flashcards_pdf", "flashcards_image"}
+
+BOILERPLATE_PATTERNS = [
+    re.compile(r'^\s*(page\s*)?\d{1,4}(\s*(of|/)\s*\d{1,4})?\s*$', re.IGNORECASE),  # page numbers
+    re.compile(r'^\s*\[(music|applause|laughter|inaudible)\]\s*$', re.IGNORECASE),   # transcript cues
+    re.compile(r'^\s*(\d{1,2}:)?\d{1,2}:\d{2}\s*$'),                                    # bare timestamps
+    re.compile(r'^\s*(copyright|©|all rights reserved)\b.*$', re.IGNORECASE),
+]
+INLINE_CUES = re.compile(r'\[(music|applause|laughter|inaudible)\]', re.IGNORECASE)
+
+_stats_lock = threading.Lock()
+TOKEN_STATS = defaultdict(Counter)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of text locally."""
+    return len(TOKEN_PATTERN.findall(text or ""))
+
+
+def get_budget(endpoint: str) -> int:
+    """Input token budget for an endpoint, honouring TOKEN_BUDGET_<ENDPOINT>."""
+    override = os.getenv(f"TOKEN_BUDGET_{endpoint.upper()}")
+    if override and override.isdigit():
+        return int(override)
+    return DEFAULT_BUDGETS.get(endpoint, DEFAULT_BUDGETS["flashcards"])
+
+
+def _normalize_whitespace(text: str) -> str:
+    return "\n".join(re.sub(r'[ \t]+', ' ', line).strip() for line in (text or "").splitlines()).strip()
+
+
+def compress_text(text: str, strip_boilerplate: bool = True) -> str:
+    """Drop boilerplate lines, repeated headers/footers and redundant whitespace.
+
+    With strip_boilerplate=False only whitespace and consecutive duplicate
+    lines are removed. Non-empty input never compresses to empty output.
+    """
+    lines = [line.strip() for line in (text or "").splitlines()]
+    counts = Counter(line for line in lines if line)
+
+    kept = []
+    seen_repeated = set()
+    previous = None
+    for line in lines:
+        if not line:
+            if kept and kept[-1] != "":
+                kept.append("")
+            continue
+        if strip_boilerplate:
+            if any(pattern.match(line) for pattern in BOILERPLATE_PATTERNS):
+                continue
+            # Short lines repeated on many pages are running headers/footers
+            if counts[line] >= 3 and len(line) < 80:
+                if line in seen_repeated:
+                    continue
+                seen_repeated.add(line)
+        if line == previous:
+            continue
+        kept.append(re.sub(r'[ \t]+', ' ', INLINE_CUES.sub('', line) if strip_boilerplate else line).strip())
+        previous = line
+    compressed = "\n".join(kept).strip()
+    return compressed or _normalize_whitespace(text)
+
+
+def _paragraphs(text: str):
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = paragraph.strip()
+        if paragraph:
+            yield paragraph
+
+
+def split_to_budget(text: str, budget: int) -> list:
+    """Pack paragraphs/sentences into chunks of at most budget tokens each."""
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            chunks.append("\n\n".join(current))
+        current, current_tokens = [], 0
+
+    for paragraph in _paragraphs(text):
+        pieces = [paragraph]
+        if estimate_tokens(paragraph) > budget:
+            pieces = re.split(r'(?<=[.!?])\s+', paragraph)
+        for piece in pieces:
+            tokens = estimate_tokens(piece)
+            if tokens > budget:
+                # A single run-on sentence: hard split on characters
+                flush()
+                step = max(1, budget * 4)
+                chunks.extend(piece[i:i + step] for i in range(0, len(piece), step))
+                continue
+            if current_tokens + tokens > budget:
+                flush()
+            current.append(piece)
+            current_tokens += tokens
+    flush()
+    return chunks
+
+
+def record_tokens(endpoint: str, **counts):
+    """Add token/request counters for an endpoint."""
+    with _stats_lock:
+        for key, value in counts.items():
+            TOKEN_STATS[endpoint][key] += value
+
+
+def get_token_stats() -> dict:
+    """Per-endpoint token counters recorded so far."""
+    with _stats_lock:
+        return {endpoint: dict(counts) for endpoint, counts in TOKEN_STATS.items()}
+
+
+def prepare_input(text: str, endpoint: str, max_chunks: int = DEFAULT_MAX_CHUNKS) -> list:
+    """Compress text and split it into budget-sized chunks for generation.
+
+    Returns a list with a single element when the input fits the budget.
+    Input beyond max_chunks chunks is dropped (and logged) rather than
+    sent, so one huge document cannot stall the endpoint. Boilerplate is
+    only stripped for EXTRACTED_ENDPOINTS.
+    """
+    budget = get_budget(endpoint)
+    raw_tokens = estimate_tokens(text)
+    compressed = compress_text(text, strip_boilerplate=endpoint in EXTRACTED_ENDPOINTS)
+    compressed_tokens = estimate_tokens(compressed)
+
+    chunks = [compressed] if compressed_tokens <= budget else split_to_budget(compressed, budget)
+    if len(chunks) > max_chunks:
+        print(f"Input for {endpoint} needs {len(chunks)} chunks; keeping the first {max_chunks}", file=sys.stderr)
+        chunks = chunks[:max_chunks]
+
+    sent_tokens = sum(estimate_tokens(chunk) for chunk in chunks)
+    record_tokens(endpoint, requests=1, input_tokens_raw=raw_tokens,
+                  input_tokens_sent=sent_tokens, chunks=len(chunks))
+    print(f"Input tokens for {endpoint}: {raw_tokens} raw, {sent_tokens} sent in {len(chunks)} chunk(s)",
+          file=sys.stderr)
+    return chunks
+
+
+def fit_items_to_budget(items: list, endpoint: str) -> str:
+    """Serialize items as compact JSON, dropping any that would push it over budget."""
+    budget = get_budget(endpoint)
+    raw_tokens = 0
+    kept = []
+    used = 2  # surrounding brackets
+    for item in items:
+        encoded = json.dumps(item, ensure_ascii=False, separators=(",", ":"))
+        tokens = estimate_tokens(encoded) + 1
+        raw_tokens += tokens
+        if used + tokens <= budget:
+            kept.append(encoded)
+            used += tokens
+    if len(kept) < len(items):
+        print(f"Input for {endpoint} over budget; sending {len(kept)} of {len(items)} items", file=sys.stderr)
+    record_tokens(endpoint, requests=1, input_tokens_raw=raw_tokens + 2, input_tokens_sent=used, chunks=1)
+    return "[" + ",".join(kept) + "]"
+
+
+def trim_to_budget(text: str, endpoint: str) -> str:
+    """Cut short user input (a topic, a question's context) to the endpoint budget.
+
+    Only whitespace is normalized and the tail dropped; nothing is filtered.
+    """
+    text = _normalize_whitespace(text)
+    if not text:
+        return ""
+    budget = get_budget(endpoint)
+    raw_tokens = estimate_tokens(text)
+    trimmed = text if raw_tokens <= budget else split_to_budget(text, budget)[0]
+    record_tokens(endpoint, requests=1, input_tokens_raw=raw_tokens,
+                  input_tokens_sent=estimate_tokens(trimmed), chunks=1)
+    return trimmed
@@ -0,0 +1,134 @@
+import os
+import sys
+import time
+import uuid
+import threading
+from collections import OrderedDict
+import google.generativeai as genai
+from flashcard_ask import TUTOR_INSTRUCTIONS
+from llm_client import get_model, send_chat_message
+from token_budget import estimate_tokens, trim_to_budget
+from metrics import increment
+
+SESSION_IDLE_SECONDS = int(os.getenv("TUTOR_SESSION_IDLE_SECONDS", 900))
+SESSION_MEMORY_BYTES = int(os.getenv("TUTOR_SESSION_MEMORY_MB", 64)) * 1024 * 1024
+MAX_HISTORY_TURNS = 6
+# Provider-side context caching only pays off (and is only allowed) for large contexts
+CONTEXT_CACHE_MIN_TOKENS = 32768
+CONTEXT_CACHE_MODEL = 'models/gemini-1.5-flash-001'
+
+
+class TutorSession:
+    """One student's conversation about one piece of flashcard content."""
+
+    __slots__ = ("session_id", "content", "chat", "cached_content", "last_used", "lock")
+
+    def __init__(self, content: str):
+        self.session_id = uuid.uuid4().hex
+        self.content = content
+        self.cached_content = None
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+        # The rules and content go in once, as the system instruction (or a
+        # provider-side cache for very large content); turns only carry the
+        # new question.
+        system_instruction = f'{TUTOR_INSTRUCTIONS}\n\nFlashcard Content:\n"""\n{content}\n"""'
+        if estimate_tokens(system_instruction) >= CONTEXT_CACHE_MIN_TOKENS:
+            try:
+                get_model()  # make sure the API is configured
+                self.cached_content = genai.caching.CachedContent.create(
+                    model=CONTEXT_CACHE_MODEL,
+                    system_instruction=system_instruction,
+                    ttl=SESSION_IDLE_SECONDS
+                )
+                model = genai.GenerativeModel.from_cached_content(self.cached_content)
+            except Exception as e:
+                print(f"Context caching unavailable, using system instruction: {e}", file=sys.stderr)
+                self.cached_content = None
+                model = get_model(system_instruction)
+        else:
+            model = get_model(system_instruction)
+        self.chat = model.start_chat()
+
+    def size_bytes(self) -> int:
+        """Approximate memory held by this session (content plus chat history)."""
+        history = sum(len(str(message)) for message in self.chat.history)
+        return len(self.content) * 2 + history
+
+    def ask(self, question: str) -> str:
+        with self.lock:
+            self.last_used = time.monotonic()
+            answer = send_chat_message(self.chat, question, "flashcard_ask_session")
+            # Keep only the most recent turns so follow-ups stay cheap
+            if len(self.chat.history) > MAX_HISTORY_TURNS * 2:
+                self.chat.history = self.chat.history[-MAX_HISTORY_TURNS * 2:]
+            self.last_used = time.monotonic()
+            return answer
+
+    def close(self):
+        if self.cached_content is not None:
+            try:
+                self.cached_content.delete()
+            except Exception as e:
+                print(f"Failed to delete cached context: {e}", file=sys.stderr)
+            self.cached_content = None
+
+
+class SessionStore:
+    """Tutor sessions evicted by idle time and by a total memory budget (LRU)."""
+
+    def __init__(self, idle_seconds: int = SESSION_IDLE_SECONDS, memory_bytes: int = SESSION_MEMORY_BYTES):
+        self.idle_seconds = idle_seconds
+        self.memory_bytes = memory_bytes
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, content: str) -> TutorSession:
+        session = TutorSession(trim_to_budget(content, "tutor_session"))
+        with self._lock:
+            self._sessions[session.session_id] = session
+        increment("tutor_sessions_created")
+        self.evict()
+        return session
+
+    def get(self, session_id: str):
+        self.evict()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def close(self, session_id: str) -> bool:
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        session.close()
+        return True
+
+    def evict(self):
+        """Drop idle sessions, then least recently used ones until under the memory budget."""
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            for session_id, session in list(self._sessions.items()):
+                if now - session.last_used > self.idle_seconds:
+                    evicted.append(self._sessions.pop(session_id))
+            total = sum(session.size_bytes() for session in self._sessions.values())
+            while self._sessions and total > self.memory_bytes:
+                _, session = self._sessions.popitem(last=False)
+                total -= session.size_bytes()
+                evicted.append(session)
+        for session in evicted:
+            session.close()
+        if evicted:
+            increment("tutor_sessions_evicted", len(evicted))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+sessions = SessionStore()
@@ -0,0 +1,146 @@
+import os
+import re
+import hashlib
+import mimetypes
+import tempfile
+from contextlib import contextmanager
+from werkzeug.exceptions import RequestEntityTooLarge
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", 25)) * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+SUFFIX_PATTERN = re.compile(r"\.[A-Za-z0-9]{1,8}")
+# Content types that say nothing about the file format
+GENERIC_MIMETYPES = {"", "application/octet-stream", "binary/octet-stream", "application/x-www-form-urlencoded"}
+MAGIC_SUFFIXES = [
+    (b"%PDF", ".pdf"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+    (b"II*\x00", ".tif"),
+    (b"MM\x00*", ".tif"),
+    (b"BM", ".bmp"),
+]
+
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload goes over MAX_UPLOAD_BYTES."""
+
+
+def _too_large() -> UploadTooLarge:
+    return UploadTooLarge(f"Upload exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit")
+
+
+def limit_upload_size(request):
+    """Apply MAX_UPLOAD_BYTES to this request only; JSON routes are not capped.
+
+    A declared Content-Length over the cap is refused before the body is
+    read, and Werkzeug stops multipart parsing at the cap.
+    """
+    if request.content_length is not None and request.content_length > MAX_UPLOAD_BYTES:
+        raise _too_large()
+    try:
+        request.max_content_length = MAX_UPLOAD_BYTES
+    except AttributeError:
+        pass  # Flask < 3.1: chunked bodies are still capped while spooling
+
+
+def is_upload(request) -> bool:
+    """True when the request carries a file (multipart or raw body) rather than JSON.
+
+    Call before anything reads the body: it also applies the upload size cap.
+    """
+    limit_upload_size(request)
+    try:
+        if request.files:
+            return True
+    except RequestEntityTooLarge:
+        raise _too_large()
+    if request.is_json:
+        return False
+    chunked = request.headers.get("Transfer-Encoding", "").lower() == "chunked"
+    return bool(request.content_length) or chunked
+
+
+def upload_params(request) -> dict:
+    """Form fields for multipart uploads, query parameters for raw-body uploads."""
+    params = dict(request.args)
+    params.update(request.form)
+    return params
+
+
+def _filename_suffix(filename: str) -> str:
+    suffix = os.path.splitext(os.path.basename(filename or ""))[1]
+    return suffix.lower() if SUFFIX_PATTERN.fullmatch(suffix) else ""
+
+
+def sniff_suffix(head: bytes) -> str:
+    """File extension implied by the first bytes of a file ("" when unknown)."""
+    for magic, suffix in MAGIC_SUFFIXES:
+        if head.startswith(magic):
+            return suffix
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return ""
+
+
+def upload_suffix(filename: str, mimetype: str, head: bytes, default_suffix: str = "") -> str:
+    """Pick the temp file extension: the client's file name, then a specific
+    Content-Type, then the file's magic bytes, then default_suffix."""
+    suffix = _filename_suffix(filename)
+    if not suffix and (mimetype or "") not in GENERIC_MIMETYPES:
+        suffix = mimetypes.guess_extension(mimetype) or ""
+    return suffix or sniff_suffix(head) or default_suffix
+
+
+@contextmanager
+def spooled_upload(request, default_suffix: str = ""):
+    """Stream an uploaded file to a temp file in chunks, enforcing the size cap.
+
+    Accepts a multipart part named "file" (or the first file part) or a raw
+    request body. Yields (path, sha256 hex digest); the temp file is removed
+    on exit. The digest is computed while writing so caches do not need to
+    read the file again. Raw bodies can name the file in an X-Filename
+    header or a filename query parameter so the temp file keeps its
+    extension.
+    """
+    limit_upload_size(request)
+    try:
+        files = request.files
+    except RequestEntityTooLarge:
+        raise _too_large()
+    if files:
+        upload = files.get("file") or next(iter(files.values()))
+        stream = upload.stream
+        filename, mimetype = upload.filename, upload.mimetype
+    else:
+        stream = request.stream
+        filename = request.headers.get("X-Filename") or request.args.get("filename")
+        mimetype = request.mimetype
+
+    def read():
+        try:
+            return stream.read(CHUNK_SIZE)
+        except RequestEntityTooLarge:
+            raise _too_large()
+
+    # The first chunk is read up front so the extension can come from its magic bytes
+    chunk = read()
+    suffix = upload_suffix(filename, mimetype, chunk, default_suffix)
+    digest = hashlib.sha256()
+    size = 0
+    handle = tempfile.NamedTemporaryFile(prefix="mindsnap_upload_", suffix=suffix, delete=False)
+    try:
+        with handle:
+            while chunk:
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise _too_large()
+                digest.update(chunk)
+                handle.write(chunk)
+                chunk = read()
+        if not size:
+            raise ValueError("Uploaded file is empty")
+        yield handle.name, digest.hexdigest()
+    finally:
+        os.remove(handle.name)
@@ -1,11 +1,7 @@
 import { NextRequest, NextResponse } from "next/server";
 import { getApiUrl, API_ENDPOINTS } from '../../../lib/config';
-import { writeFile, rm } from "fs/promises";
-import { join } from "path";
-import { tmpdir } from "os";
 
 export async function POST(request: NextRequest): Promise<NextResponse> {
-  let tempFilePath: string | null = null;
   try {
     const formData = await request.formData();
     const file = formData.get("file") as File;
@@ -19,25 +15,20 @@ export async function POST(request: NextRequest): Promise<NextResponse> {
       return NextResponse.json({ error: "File must be an image" }, { status: 400 });
     }
 
-    tempFilePath = join(tmpdir(), `upload_${Date.now()}_${file.name}`);
-    const buffer = Buffer.from(await file.arrayBuffer());
-    await writeFile(tempFilePath, buffer);
-
     const normalizedGenre = genre ? genre.toLowerCase().trim() : 'factual';
 
     // Make request to hosted Render API
     const apiUrl = getApiUrl(API_ENDPOINTS.FLASHCARDS_IMAGE);
     console.log("Making request to:", apiUrl);
 
+    // Stream the file to the agent as multipart so it needs no shared disk
+    const upstreamForm = new FormData();
+    upstreamForm.append("file", file, file.name);
+    upstreamForm.append("genre", normalizedGenre);
+
     const response = await fetch(apiUrl, {
       method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify({
-        imagePath: tempFilePath,
-        genre: normalizedGenre
-      }),
+      body: upstreamForm,
     });
 
     if (!response.ok) {
@@ -74,13 +65,5 @@ export async function POST(request: NextRequest): Promise<NextResponse> {
       { error: "Internal server error", details: errorMessage },
       { status: 500 }
     );
-  } finally {
-    if (tempFilePath) {
-      try {
-        await rm(tempFilePath);
-      } catch (cleanupError) {
-        console.error("Failed to remove temporary file:", cleanupError);
-      }
-    }
   }
 } 
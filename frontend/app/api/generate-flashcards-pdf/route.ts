@@ -1,8 +1,5 @@
 import { NextRequest, NextResponse } from "next/server"
 import { getApiUrl, API_ENDPOINTS } from '../../../lib/config'
-import { writeFile } from "fs/promises"
-import { join } from "path"
-import { tmpdir } from "os"
 
 export async function POST(request: NextRequest): Promise<NextResponse> {
   try {
@@ -18,11 +15,6 @@ export async function POST(request: NextRequest): Promise<NextResponse> {
       return NextResponse.json({ error: "File must be a PDF" }, { status: 400 })
     }
 
-    const tempFilePath = join(tmpdir(), file.name)
-    const buffer = Buffer.from(await file.arrayBuffer())
-    await writeFile(tempFilePath, buffer)
-    console.log("PDF written to temp file:", tempFilePath)
-
     const normalizedGenre = genre ? genre.toLowerCase().trim() : 'factual'
     console.log("Genre:", normalizedGenre)
 
@@ -30,15 +22,14 @@ export async function POST(request: NextRequest): Promise<NextResponse> {
     const apiUrl = getApiUrl(API_ENDPOINTS.FLASHCARDS_PDF)
     console.log("Making request to:", apiUrl)
 
+    // Stream the file to the agent as multipart so it needs no shared disk
+    const upstreamForm = new FormData()
+    upstreamForm.append("file", file, file.name)
+    upstreamForm.append("genre", normalizedGenre)
+
     const response = await fetch(apiUrl, {
       method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify({
-        pdfPath: tempFilePath,
-        genre: normalizedGenre
-      }),
+      body: upstreamForm,
     })
 
     if (!response.ok) {